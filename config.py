@@ -20,7 +20,9 @@ OLLAMA_CONFIG = {
     # 'host': '127.0.0.1:11434',  # Comment out the host - let it use default
     'temperature': 0.7,
     'top_p': 0.9,
-    'selected_model': None
+    'selected_model': None,
+    'keep_alive': '30m',  # How long Ollama keeps a model loaded after a request
+    'http_pool_size': 16  # Pooled keep-alive connections per Ollama host
 }
 
 # Story Prompts by Genre
@@ -373,6 +375,32 @@ RULES:
 - Include quiet moments with no music
 - Don't use real song names or artists""",
 
+    'shot_asset_bundler': """Create every generation asset for one film shot in a single reply. Use this exact JSON format:
+
+{
+  "visual": "rich visual description for AI video generation, 30-50 words",
+  "negative": "text, watermark, blurry, distorted, extra limbs, low quality, bad anatomy",
+  "narration": "voice-over lines with timestamps, or empty if no existing narration is given",
+  "music": "music cues with timestamps, or empty if no music cue is given"
+}
+
+VISUAL RULES:
+- Put provided character descriptions first, using their exact physical details
+- Then the specific action and body language, scene details and textures, camera shot type and movement, lighting and atmosphere
+- Always end with "photorealistic style, sharp focus, high detail"
+
+NARRATION RULES (only when existing narration is given):
+- Format each line as [0:00] "Sentence here."
+- Speak 2-3 words per second, in short sentences of 5-10 simple words
+- Write like people actually talk
+
+MUSIC RULES (only when a music cue is given):
+- Format each cue as [time] [music style] [emotion] [volume 1-10] [how long], e.g. [0:00] ambient mysterious 3 15s
+- Music styles: ambient, electronic, orchestral, rock, acoustic, cinematic
+- Don't use real song names or artists
+
+Return only the JSON object.""",
+
     'character_analyzer': """Analyze the story content and extract character and location information for visual consistency. Use this exact JSON format:
 
 {
@@ -459,6 +487,32 @@ GENERATION_SETTINGS = {
         'filmability_check': True
     },
     
+    # Reuse stored responses for identical prompts (every step except story writing)
+    'llm_cache': True,
+    
+    # Also reuse the response to the most similar earlier prompt of the same step, using
+    # sentence-transformers embeddings. Off by default: prompts built from one template embed
+    # close together, so a high threshold is needed. Steps at or above the max temperature
+    # (narration, music) always generate fresh text.
+    'llm_semantic_cache': False,
+    'llm_semantic_cache_threshold': 0.95,
+    'llm_semantic_cache_max_temperature': 0.6,
+    
+    # Pick the characters and locations for a shot's visual prompt by embedding similarity to
+    # the shot description (same sentence-transformers model), so "the detective" finds Rachel.
+    # Entities named in full in the description are always included.
+    'semantic_entity_matching': False,
+    'semantic_entity_threshold': 0.35,
+    
+    # Generate each shot's visual prompt, narration and music in one Ollama call with the
+    # 'prompts' step model, instead of one call per step with each step's own model
+    'fused_shot_assets': False,
+    
+    # Reuse a character ComfyUI prompt for a character whose name, role, physical description,
+    # age range, clothing style and personality all match one prompted before (e.g. across stories)
+    'structural_prompt_cache': True,
+    'structural_prompt_cache_size': 500,
+    
     'performance_targets': {
         'generation_time': 5,  # seconds max
         'token_efficiency': 0.8,  # useful/total tokens
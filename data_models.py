@@ -5,7 +5,7 @@ Data models and structures for Film Generator App
 from dataclasses import dataclass
 from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class StoryConfig:
     """Configuration for story generation"""
     prompt: str
@@ -20,7 +20,7 @@ class StoryConfig:
     auto_style: bool = False
     parts: int = 0  # Number of story parts - calculated from length
 
-@dataclass
+@dataclass(slots=True)
 class Shot:
     """Represents a single shot in a story"""
     shot_number: int
@@ -96,7 +96,7 @@ class VisualStyle:
     cinematography: str
     era_setting: str
 
-@dataclass
+@dataclass(slots=True)
 class QueueItem:
     """Story queue item"""
     id: Optional[int]
@@ -115,8 +115,9 @@ class QueueItem:
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
     estimated_completion: Optional[str] = None
+    not_before: Optional[float] = None
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class QueueConfig:
     """Queue configuration settings"""
     continuous_enabled: bool = False
@@ -3,14 +3,56 @@ Database management for Film Generator App
 Handles all SQLite operations
 """
 
+import re
 import sqlite3
+import threading
+import time
 import json
-from typing import List, Dict, Optional, Any
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Any, Tuple
 from dataclasses import asdict
+from pathlib import Path
 from datetime import datetime, timedelta
 from config import DB_PATH, estimate_total_time
 from data_models import StoryConfig, Shot
 
+# Queue progress data holds whole finished stories with their shots; orjson encodes it much faster
+try:
+    import orjson
+    
+    def _progress_json(progress_data: Dict) -> str:
+        return orjson.dumps(progress_data).decode('utf-8')
+except ImportError:
+    def _progress_json(progress_data: Dict) -> str:
+        return json.dumps(progress_data)
+
+# Status update for a story queue item; processing marks the start (once) and refreshes the
+# ETA, completed / failed mark the end and clear it
+UPDATE_QUEUE_ITEM_STATUS_SQL = '''
+    UPDATE story_queue 
+    SET status = :status,
+        current_step = COALESCE(:current_step, current_step),
+        progress_data = COALESCE(:progress_data, progress_data),
+        story_id = COALESCE(:story_id, story_id),
+        error_message = COALESCE(:error, error_message),
+        started_at = CASE WHEN :status = 'processing' THEN COALESCE(started_at, CURRENT_TIMESTAMP)
+                          ELSE started_at END,
+        completed_at = CASE WHEN :status IN ('completed', 'failed') THEN CURRENT_TIMESTAMP
+                            ELSE completed_at END,
+        estimated_completion = CASE WHEN :status IN ('completed', 'failed') THEN NULL
+                                    ELSE COALESCE(:eta, estimated_completion) END
+    WHERE id = :id
+'''
+
+# Finished story queue rows deleted per transaction when clearing the queue
+QUEUE_DELETE_CHUNK = 500
+
+# Ids bound per "IN (...)" query, kept under SQLite's host parameter limit
+SQL_IN_CHUNK = 500
+
+# Shot asset -> column holding the hash of the shot content its last generation produced
+SHOT_ASSET_HASH_COLUMNS = {'narration': 'narration_hash', 'music': 'music_hash'}
+
 def init_database():
     """Initialize database with required tables"""
     try:
@@ -46,6 +88,8 @@ def init_database():
                 wan_prompt TEXT,
                 narration TEXT,
                 music_cue TEXT,
+                narration_hash TEXT,
+                music_hash TEXT,
                 status TEXT DEFAULT 'pending',
                 render_path TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -53,6 +97,7 @@ def init_database():
                 FOREIGN KEY (story_id) REFERENCES stories (id)
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_shots_story_id ON shots(story_id)')
         
         # Videos table
         cursor.execute('''
@@ -190,6 +235,7 @@ def init_database():
                 FOREIGN KEY (source_trend_id) REFERENCES trend_analysis (id)
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_research_prompts_genre ON research_prompts(genre)')
         
         # Story characters table - Character consistency for ComfyUI
         cursor.execute('''
@@ -229,6 +275,41 @@ def init_database():
             )
         ''')
         
+        # Full-text indexes over the terms that tie characters and locations to shots
+        for table, columns in (('story_characters', 'name, role'),
+                               ('story_locations', 'name, environment_type')):
+            fts = f"{table}_fts"
+            try:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,))
+                is_new = cursor.fetchone() is None
+                cursor.execute(f'''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {fts}
+                    USING fts5({columns}, content='{table}', content_rowid='id')
+                ''')
+                new_values = ', '.join(f"new.{column}" for column in columns.split(', '))
+                old_values = ', '.join(f"old.{column}" for column in columns.split(', '))
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                        INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new_values});
+                    END
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                        INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                    END
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE ON {table} BEGIN
+                        INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                        INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new_values});
+                    END
+                ''')
+                if is_new:
+                    # Index rows saved before the index existed
+                    cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            except sqlite3.OperationalError as e:
+                print(f"Full-text index {fts} not available: {e}")
+        
         # Style reference cards table - Generated style cards for ComfyUI workflows
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS style_references (
@@ -293,9 +374,14 @@ def init_database():
                 started_at TIMESTAMP,
                 completed_at TIMESTAMP,
                 estimated_completion TIMESTAMP,
+                not_before REAL,
                 FOREIGN KEY (story_id) REFERENCES stories (id)
             )
         ''')
+        # Dequeue order is status, then priority, then position
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_story_queue_status_priority '
+                       'ON story_queue(status, priority DESC, queue_position)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_story_queue_story_id ON story_queue(story_id)')
 
         # Queue configuration table - Settings for continuous generation
         cursor.execute('''
@@ -330,6 +416,28 @@ def init_database():
             )
         ''')
         
+        # LLM response cache - keyed on a hash of model, prompts and temperature
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                step TEXT,
+                embedding BLOB,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Character prompt templates shared by structurally similar characters
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS structural_prompt_cache (
+                sig_hash TEXT PRIMARY KEY,
+                template_response TEXT NOT NULL,
+                cached_name TEXT NOT NULL,
+                hit_count INTEGER DEFAULT 0,
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         # Clean up any corrupted JSON data on startup
         try:
             self.cleanup_corrupted_json()
@@ -381,24 +489,91 @@ def init_database():
         print(f"Error initializing database: {e}")
         raise
 
+class _Connection(sqlite3.Connection):
+    """Connection whose commit() waits while a DatabaseManager.transaction() is open on it"""
+    transaction_depth = 0
+    
+    def commit(self):
+        if not self.transaction_depth:
+            super().commit()
+
+
 class DatabaseManager:
     """Handles all database operations"""
     
     def __init__(self):
-        self.conn = None
+        # Each thread gets its own connection, so one thread's statements and transactions
+        # don't queue behind (or interleave with) another's; WAL lets them read while one writes
+        self._local = threading.local()
+        self._connections = {}  # thread ident -> connection, so close() can reach them all
+        self._connections_lock = threading.Lock()
         self.connect()
         self._run_migrations()
         # Clean up any corrupted JSON data on startup
         self.cleanup_corrupted_json()
     
-    def connect(self):
-        """Establish database connection"""
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The calling thread's database connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        return conn if conn is not None else self.connect()
+    
+    def connect(self) -> sqlite3.Connection:
+        """Establish the calling thread's database connection"""
         try:
-            self.conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row
+            # Keep every statement this module issues compiled across calls (default cache is 128);
+            # wait for other threads' write transactions instead of failing with "database is locked"
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256, timeout=30,
+                                   factory=_Connection)
+            conn.row_factory = sqlite3.Row
+            # WAL lets readers run alongside the writer; NORMAL only fsyncs at checkpoints
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
         except sqlite3.OperationalError as e:
             print(f"Error connecting to database: {e}")
             raise
+        
+        self._local.conn = conn
+        with self._connections_lock:
+            # Close connections left behind by threads that have finished
+            alive = {thread.ident for thread in threading.enumerate()}
+            for ident in [ident for ident in self._connections if ident not in alive]:
+                self._connections.pop(ident).close()
+            stale = self._connections.get(threading.get_ident())  # a finished thread's, ident reused
+            if stale is not None:
+                stale.close()
+            self._connections[threading.get_ident()] = conn
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """Commit the calling thread's writes once at the end of the block (rolled back on error)"""
+        # Writes inside must commit through conn.commit() or a nested transaction(), never `with conn:`,
+        # whose exit commits at the C level and would end this transaction early
+        conn = self.conn
+        conn.transaction_depth += 1
+        try:
+            yield conn
+        except BaseException:
+            conn.transaction_depth -= 1
+            if not conn.transaction_depth:
+                conn.rollback()
+            raise
+        conn.transaction_depth -= 1
+        if not conn.transaction_depth:
+            conn.commit()
+    
+    def open_read_only_connection(self) -> sqlite3.Connection:
+        """Open a separate read-only connection, for callers that only query (e.g. the GUI)"""
+        # Autocommit, so a stray statement can never leave it pinned to an old snapshot
+        conn = sqlite3.connect(f"{Path(DB_PATH).resolve().as_uri()}?mode=ro", uri=True, isolation_level=None,
+                               check_same_thread=False, cached_statements=256, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        return conn
     
     def _run_migrations(self):
         """Run database schema migrations for existing databases"""
@@ -418,12 +593,50 @@ class DatabaseManager:
         except Exception as e:
             print(f"Migration warning: Could not add frames column: {e}")
         
+        # Migration: Add generated-content hash columns to shots table
+        try:
+            cursor.execute("PRAGMA table_info(shots)")
+            columns = [column[1] for column in cursor.fetchall()]
+            for column in SHOT_ASSET_HASH_COLUMNS.values():
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE shots ADD COLUMN {column} TEXT")
+                    self.conn.commit()
+                    print(f"Migration: Added {column} column to shots table")
+        except Exception as e:
+            print(f"Migration warning: Could not add shot hash columns: {e}")
+        
+        # Migration: Add retry backoff column to story_queue table
+        try:
+            cursor.execute("PRAGMA table_info(story_queue)")
+            columns = [column[1] for column in cursor.fetchall()]
+            if columns and 'not_before' not in columns:
+                cursor.execute("ALTER TABLE story_queue ADD COLUMN not_before REAL")
+                self.conn.commit()
+                print("Migration: Added not_before column to story_queue table")
+        except Exception as e:
+            print(f"Migration warning: Could not add not_before column: {e}")
+        
+        # Migration: Add step and embedding columns to llm_cache for the semantic cache
+        try:
+            cursor.execute("PRAGMA table_info(llm_cache)")
+            columns = [column[1] for column in cursor.fetchall()]
+            if columns and 'embedding' not in columns:
+                cursor.execute("ALTER TABLE llm_cache ADD COLUMN step TEXT")
+                cursor.execute("ALTER TABLE llm_cache ADD COLUMN embedding BLOB")
+                self.conn.commit()
+                print("Migration: Added step and embedding columns to llm_cache table")
+        except Exception as e:
+            print(f"Migration warning: Could not add llm_cache columns: {e}")
+        
         cursor.close()
     
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        """Close every thread's database connection"""
+        with self._connections_lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
     
     def save_story(self, story: Dict) -> str:
         """Save story to database"""
@@ -448,6 +661,56 @@ class DatabaseManager:
         self.conn.commit()
         return cursor.lastrowid
     
+    def _insert_shots(self, cursor, shots: List[Shot]):
+        """Insert shots that have no id yet and set their ids"""
+        # One execute per row: executemany leaves lastrowid unset
+        for shot in shots:
+            if shot.id is None:
+                cursor.execute('''
+                    INSERT INTO shots (story_id, shot_number, description, duration, frames,
+                                     wan_prompt, narration, music_cue, status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (shot.story_id, shot.shot_number, shot.description, shot.duration, shot.frames,
+                      shot.wan_prompt, shot.narration, shot.music_cue, shot.status))
+                shot.id = cursor.lastrowid
+    
+    def save_shots_bulk(self, shots: List[Shot]) -> List[int]:
+        """Save shots in one transaction and return their ids"""
+        with self.transaction():
+            self._insert_shots(self.conn.cursor(), shots)
+        return [shot.id for shot in shots]
+    
+    def save_ready_shots(self, shots: List[Shot]):
+        """Store generated prompts, mark shots ready and queue them for rendering in one transaction"""
+        with self.transaction():
+            cursor = self.conn.cursor()
+            self._insert_shots(cursor, shots)
+            
+            cursor.executemany('''
+                UPDATE shots 
+                SET wan_prompt = ?, narration = ?, music_cue = ?, status = 'ready'
+                WHERE id = ?
+            ''', [(shot.wan_prompt, shot.narration, shot.music_cue, shot.id) for shot in shots])
+            
+            # First shot renders first
+            cursor.executemany('''
+                INSERT INTO render_queue (shot_id, priority, status)
+                VALUES (?, ?, 'queued')
+            ''', [(shot.id, 10 if shot.shot_number == 1 else 5) for shot in shots])
+    
+    def get_shot_asset_hash(self, shot_id: int, asset: str) -> Optional[str]:
+        """Get the content hash recorded when a shot's narration or music was last generated"""
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT {SHOT_ASSET_HASH_COLUMNS[asset]} FROM shots WHERE id = ?', (shot_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def set_shot_asset_hash(self, shot_id: int, asset: str, content_hash: str):
+        """Record the content hash of a shot's freshly generated narration or music"""
+        cursor = self.conn.cursor()
+        cursor.execute(f'UPDATE shots SET {SHOT_ASSET_HASH_COLUMNS[asset]} = ? WHERE id = ?', (content_hash, shot_id))
+        self.conn.commit()
+    
     def update_shot_status(self, shot_id: int, status: str, render_path: str = None):
         """Update shot rendering status"""
         cursor = self.conn.cursor()
@@ -470,6 +733,14 @@ class DatabaseManager:
         ''', (shot_id, priority))
         self.conn.commit()
     
+    def add_shots_to_render_queue(self, shot_ids: List[int], priority: int = 5):
+        """Add several shots to the render queue in one transaction"""
+        with self.transaction():
+            self.conn.executemany('''
+                INSERT INTO render_queue (shot_id, priority, status)
+                VALUES (?, ?, 'queued')
+            ''', [(shot_id, priority) for shot_id in shot_ids])
+    
     def get_next_render_item(self) -> Optional[Dict]:
         """Get next item from render queue"""
         cursor = self.conn.cursor()
@@ -575,6 +846,17 @@ class DatabaseManager:
         ''', (limit,))
         return [dict(row) for row in cursor.fetchall()]
     
+    def get_story_titles(self, story_ids: List[str], conn: Optional[sqlite3.Connection] = None) -> Dict[str, str]:
+        """Get the titles of several stories keyed by story id, optionally over another connection"""
+        cursor = (conn or self.conn).cursor()
+        titles = {}
+        story_ids = list(story_ids)
+        for start in range(0, len(story_ids), SQL_IN_CHUNK):
+            chunk = story_ids[start:start + SQL_IN_CHUNK]
+            cursor.execute(f'SELECT id, title FROM stories WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+            titles.update((row[0], row[1]) for row in cursor.fetchall())
+        return titles
+    
     def get_render_queue_status(self) -> Dict:
         """Get render queue statistics"""
         cursor = self.conn.cursor()
@@ -634,6 +916,35 @@ class DatabaseManager:
         ''', (limit,))
         return [row['prompt'] for row in cursor.fetchall()]
     
+    def get_prompt_candidates(self, genre: str = None, trending_limit: int = 3,
+                              performance_limit: int = 5) -> List[Dict]:
+        """Get top weighted research prompts and best performing story prompts in one query.
+        
+        Each row has id (None for performance rows), prompt and source ('trending' or 'performance').
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT id, prompt, 'trending' AS source FROM (
+                SELECT id, prompt
+                FROM research_prompts
+                WHERE (:genre IS NULL OR genre = :genre)
+                ORDER BY (COALESCE(expected_performance, 0.5) * 0.7 + COALESCE(success_rate, 0.5) * 0.3 +
+                          CASE WHEN COALESCE(usage_count, 0) < 3 THEN 0.1 ELSE 0.0 END) DESC
+                LIMIT :trending_limit
+            )
+            UNION ALL
+            SELECT NULL, prompt, 'performance' FROM (
+                SELECT s.prompt, AVG(sp.avg_engagement) AS avg_performance
+                FROM stories s
+                JOIN story_performance sp ON s.id = sp.story_id
+                WHERE sp.total_views > 100
+                GROUP BY s.prompt
+                ORDER BY avg_performance DESC
+                LIMIT :performance_limit
+            )
+        ''', {'genre': genre, 'trending_limit': trending_limit, 'performance_limit': performance_limit})
+        return [dict(row) for row in cursor.fetchall()]
+    
     # Research System Methods
     
     def create_research_session(self, platforms: List[str]) -> str:
@@ -773,6 +1084,20 @@ class DatabaseManager:
             ''', (limit,))
         return [dict(row) for row in cursor.fetchall()]
     
+    def get_top_weighted_prompts(self, genre: str = None, limit: int = 3) -> List[Dict]:
+        """Get the highest weighted research prompts (performance and success rate, favouring less-used ones)"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT id, prompt, expected_performance, success_rate, usage_count,
+                   (COALESCE(expected_performance, 0.5) * 0.7 + COALESCE(success_rate, 0.5) * 0.3 +
+                    CASE WHEN COALESCE(usage_count, 0) < 3 THEN 0.1 ELSE 0.0 END) AS weight
+            FROM research_prompts
+            WHERE (:genre IS NULL OR genre = :genre)
+            ORDER BY weight DESC
+            LIMIT :limit
+        ''', {'genre': genre, 'limit': limit})
+        return [dict(row) for row in cursor.fetchall()]
+    
     def update_prompt_usage(self, prompt_id: int, success: bool = True):
         """Update prompt usage statistics"""
         cursor = self.conn.cursor()
@@ -878,6 +1203,43 @@ class DatabaseManager:
         ''', (story_id,))
         return [dict(row) for row in cursor.fetchall()]
     
+    def _find_relevant(self, table: str, type_field: str, story_id: str, description: str) -> Optional[List[Dict]]:
+        """Get a story's rows whose name words or whole type_field appear in description, or None without the index"""
+        desc_lower = description.lower()
+        words = set(re.findall(r'\w+', desc_lower))
+        if not words:
+            return []
+        match_query = ' OR '.join(f'"{word}"' for word in words)
+        
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f'''
+                SELECT t.* FROM {table} t
+                JOIN {table}_fts ON {table}_fts.rowid = t.id
+                WHERE {table}_fts MATCH ? AND t.story_id = ?
+                ORDER BY t.importance_level DESC, t.created_at ASC
+            ''', (match_query, story_id))
+        except sqlite3.OperationalError:
+            return None
+        
+        # The index finds rows sharing any word with the description; a multi-word type only
+        # counts when the whole of it appears, as with the in-memory matcher
+        rows = []
+        for row in map(dict, cursor.fetchall()):
+            name_words = set(re.findall(r'\w+', (row['name'] or '').lower()))
+            type_value = (row[type_field] or '').lower()
+            if name_words & words or (type_value and type_value in desc_lower):
+                rows.append(row)
+        return rows
+    
+    def find_relevant_characters(self, story_id: str, description: str) -> Optional[List[Dict]]:
+        """Get the story's characters whose name words or whole role appear in a shot description"""
+        return self._find_relevant('story_characters', 'role', story_id, description)
+    
+    def find_relevant_locations(self, story_id: str, description: str) -> Optional[List[Dict]]:
+        """Get the story's locations whose name words or whole environment type appear in a shot description"""
+        return self._find_relevant('story_locations', 'environment_type', story_id, description)
+    
     def get_style_references(self, story_id: str, reference_type: str = None) -> List[Dict]:
         """Get style references for a story, optionally filtered by type"""
         cursor = self.conn.cursor()
@@ -1128,15 +1490,40 @@ class DatabaseManager:
         self.conn.commit()
         return cursor.lastrowid
     
+    def add_to_story_queue_bulk(self, story_configs: List[Dict], priority: int = 5, continuous: bool = False) -> int:
+        """Add several stories to the generation queue in one transaction"""
+        cursor = self.conn.cursor()
+        
+        # They go to the back of the queue, in order
+        cursor.execute('SELECT MAX(queue_position) FROM story_queue WHERE status = "queued"')
+        first_position = (cursor.fetchone()[0] or 0) + 1
+        
+        rows = [(position, json.dumps(story_config), priority, continuous, 'pending',
+                 self._calculate_eta_for_queue_item(priority, position, story_config))
+                for position, story_config in enumerate(story_configs, first_position)]
+        with self.transaction():
+            cursor.executemany('''
+                INSERT INTO story_queue (
+                    queue_position, story_config, priority, continuous_generation, current_step, estimated_completion
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+        return len(rows)
+    
+    def get_average_shots_per_story(self) -> Optional[float]:
+        """Get the average number of shots in a story, or None before any shots exist"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT CAST(COUNT(*) AS REAL) / COUNT(DISTINCT story_id) FROM shots')
+        return cursor.fetchone()[0]
+    
     def get_next_queue_item(self) -> Optional[Dict]:
-        """Get next item from story queue"""
+        """Get next item from story queue, skipping retries that are still backing off"""
         cursor = self.conn.cursor()
         cursor.execute('''
             SELECT * FROM story_queue 
-            WHERE status = 'queued'
+            WHERE status = 'queued' AND (not_before IS NULL OR not_before <= ?)
             ORDER BY priority DESC, queue_position ASC
             LIMIT 1
-        ''')
+        ''', (time.time(),))
         result = cursor.fetchone()
         if result:
             item = dict(result)
@@ -1145,64 +1532,92 @@ class DatabaseManager:
             return item
         return None
     
+    def schedule_queue_retry(self, queue_id: int, not_before: float, error: str = None):
+        """Requeue a failed story queue item one priority step lower, to run no earlier than not_before"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE story_queue 
+            SET status = 'queued', current_step = 'retry_pending', error_message = ?,
+                not_before = ?, priority = MAX(1, priority - 1)
+            WHERE id = ?
+        ''', (error, not_before, queue_id))
+        self.conn.commit()
+    
+    def claim_queue_item(self, queue_id: int, current_step: str = 'story_generation') -> bool:
+        """Mark a queued story queue item as processing; False if it is no longer queued"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE story_queue 
+            SET status = 'processing', current_step = ?, started_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'queued'
+        ''', (current_step, queue_id))
+        self.conn.commit()
+        return cursor.rowcount == 1
+    
     def update_queue_item_status(self, queue_id: int, status: str, current_step: str = None, 
                                 progress_data: Dict = None, story_id: str = None, error: str = None):
         """Update queue item status and progress"""
-        # Use a transaction to prevent corruption from concurrent updates
-        cursor = self.conn.cursor()
-        cursor.execute('BEGIN IMMEDIATE TRANSACTION')
-        
-        update_fields = ['status = ?']
-        update_values = [status]
-        
-        if current_step:
-            update_fields.append('current_step = ?')
-            update_values.append(current_step)
-        
+        json_data = None
         if progress_data:
-            update_fields.append('progress_data = ?')
             try:
-                json_data = json.dumps(progress_data)
-                update_values.append(json_data)
+                json_data = _progress_json(progress_data)
             except (TypeError, ValueError) as e:
                 print(f"Warning: Failed to serialize progress_data for queue item {queue_id}: {e}")
                 print(f"Progress data: {progress_data}")
-                update_values.append('{}')  # Fallback to empty JSON
-        
-        if story_id:
-            update_fields.append('story_id = ?')
-            update_values.append(story_id)
+                json_data = '{}'  # Fallback to empty JSON
         
-        if error:
-            update_fields.append('error_message = ?')
-            update_values.append(error)
-        
-        if status == 'processing':
-            update_fields.append('started_at = CURRENT_TIMESTAMP')
-            # Update ETA when processing starts
-            eta = self._calculate_processing_eta(queue_id, progress_data)
-            if eta:
-                update_fields.append('estimated_completion = ?')
-                update_values.insert(-1, eta)  # Insert before queue_id
-        elif status in ['completed', 'failed']:
-            update_fields.append('completed_at = CURRENT_TIMESTAMP')
-            update_fields.append('estimated_completion = NULL')
-        
-        update_values.append(queue_id)
+        # Update ETA while processing
+        eta = self._calculate_processing_eta(queue_id, progress_data) if status == 'processing' else None
         
+        # Use a transaction to prevent corruption from concurrent updates
+        conn = self.conn
         try:
-            cursor.execute(f'''
-                UPDATE story_queue 
-                SET {', '.join(update_fields)}
-                WHERE id = ?
-            ''', update_values)
-            
-            self.conn.commit()
+            with self.transaction():
+                if not conn.in_transaction:
+                    conn.execute('BEGIN IMMEDIATE TRANSACTION')
+                # One statement text for every call, so the connection's statement cache reuses it;
+                # fields passed as None keep their stored values
+                conn.execute(UPDATE_QUEUE_ITEM_STATUS_SQL, {
+                    'id': queue_id, 'status': status, 'current_step': current_step or None,
+                    'progress_data': json_data, 'story_id': story_id or None, 'error': error or None, 'eta': eta
+                })
         except Exception as e:
-            self.conn.rollback()
             print(f"Error updating queue item {queue_id}: {e}")
             raise
     
+    def _queue_item_from_row(self, row) -> Dict:
+        """Turn a story_queue row into a dict with its JSON columns parsed"""
+        item = dict(row)
+        
+        try:
+            item['story_config'] = json.loads(item['story_config'])
+        except json.JSONDecodeError as e:
+            print(f"WARNING: Invalid JSON in story_config for item {item.get('id')}: {e}")
+            item['story_config'] = {}
+        
+        try:
+            if item['progress_data'] and item['progress_data'].strip():
+                # Check if it looks like valid JSON before parsing
+                progress_str = item['progress_data'].strip()
+                if progress_str.startswith('{') and progress_str.endswith('}'):
+                    item['progress_data'] = json.loads(progress_str)
+                else:
+                    print(f"WARNING: Invalid JSON format in progress_data for item {item.get('id')}: {progress_str[:50]}...")
+                    item['progress_data'] = {}
+                    # Clean up the corrupted data
+                    self.conn.execute('UPDATE story_queue SET progress_data = ? WHERE id = ?', ('{}', item.get('id')))
+                    self.conn.commit()
+            else:
+                item['progress_data'] = {}
+        except json.JSONDecodeError as e:
+            print(f"WARNING: Invalid JSON in progress_data for item {item.get('id')}: {e}")
+            item['progress_data'] = {}
+            # Clean up the corrupted data
+            self.conn.execute('UPDATE story_queue SET progress_data = ? WHERE id = ?', ('{}', item.get('id')))
+            self.conn.commit()
+        
+        return item
+    
     def get_queue_items(self, status: str = None, limit: int = None) -> List[Dict]:
         """Get queue items, optionally filtered by status"""
         cursor = self.conn.cursor()
@@ -1222,41 +1637,14 @@ class DatabaseManager:
         
         cursor.execute(query, params)
         
-        items = []
-        rows = cursor.fetchall()
-        for row in rows:
-            item = dict(row)
-            
-            try:
-                item['story_config'] = json.loads(item['story_config'])
-            except json.JSONDecodeError as e:
-                print(f"WARNING: Invalid JSON in story_config for item {item.get('id')}: {e}")
-                item['story_config'] = {}
-            
-            try:
-                if item['progress_data'] and item['progress_data'].strip():
-                    # Check if it looks like valid JSON before parsing
-                    progress_str = item['progress_data'].strip()
-                    if progress_str.startswith('{') and progress_str.endswith('}'):
-                        item['progress_data'] = json.loads(progress_str)
-                    else:
-                        print(f"WARNING: Invalid JSON format in progress_data for item {item.get('id')}: {progress_str[:50]}...")
-                        item['progress_data'] = {}
-                        # Clean up the corrupted data
-                        self.conn.execute('UPDATE story_queue SET progress_data = ? WHERE id = ?', ('{}', item.get('id')))
-                        self.conn.commit()
-                else:
-                    item['progress_data'] = {}
-            except json.JSONDecodeError as e:
-                print(f"WARNING: Invalid JSON in progress_data for item {item.get('id')}: {e}")
-                item['progress_data'] = {}
-                # Clean up the corrupted data
-                self.conn.execute('UPDATE story_queue SET progress_data = ? WHERE id = ?', ('{}', item.get('id')))
-                self.conn.commit()
-            
-            items.append(item)
-        
-        return items
+        return [self._queue_item_from_row(row) for row in cursor.fetchall()]
+    
+    def get_queue_item_by_story_id(self, story_id: str) -> Optional[Dict]:
+        """Get the story queue item that produced a story"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM story_queue WHERE story_id = ? LIMIT 1', (story_id,))
+        row = cursor.fetchone()
+        return self._queue_item_from_row(row) if row else None
     
     def get_queue_statistics(self) -> Dict:
         """Get queue statistics"""
@@ -1329,16 +1717,29 @@ class DatabaseManager:
         self.conn.commit()
         return True
     
-    def clear_completed_queue_items(self, older_than_days: int = 7):
-        """Clear old completed queue items"""
+    def clear_completed_queue_items(self, older_than_days: Optional[int] = 7):
+        """Clear completed queue items (all of them when older_than_days is None)
+        
+        Rows are deleted in chunks, one commit each, so queue status updates aren't
+        locked out for the whole clear.
+        """
+        age_filter = '' if older_than_days is None else "AND completed_at < datetime('now', ?)"
+        params = () if older_than_days is None else (f'-{int(older_than_days)} days',)
+        
         cursor = self.conn.cursor()
-        cursor.execute('''
-            DELETE FROM story_queue 
-            WHERE status IN ('completed', 'failed') 
-            AND completed_at < datetime('now', '-{} days')
-        '''.format(older_than_days))
-        self.conn.commit()
-        return cursor.rowcount
+        cleared = 0
+        while True:
+            cursor.execute(f'''
+                DELETE FROM story_queue WHERE id IN (
+                    SELECT id FROM story_queue
+                    WHERE status IN ('completed', 'failed') {age_filter}
+                    LIMIT {QUEUE_DELETE_CHUNK}
+                )
+            ''', params)
+            self.conn.commit()
+            if cursor.rowcount <= 0:
+                return cleared
+            cleared += cursor.rowcount
     
     # Queue Configuration Methods
     
@@ -1558,6 +1959,63 @@ class DatabaseManager:
             messages.append(message_dict)
         return messages
     
+    def get_llm_cache(self, key: str) -> Optional[str]:
+        """Get a cached LLM response, or None on a miss"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT response FROM llm_cache WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def save_llm_cache(self, key: str, response: str, step: str = None, embedding: bytes = None):
+        """Store an LLM response in the cache, with its prompt embedding if there is one"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO llm_cache (key, response, step, embedding, created_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (key, response, step, embedding))
+        self.conn.commit()
+    
+    def get_llm_cache_embeddings(self, step: str) -> List[Tuple[bytes, str]]:
+        """Get (prompt embedding, response) for every cached response of a step that has an embedding"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT embedding, response FROM llm_cache
+            WHERE step = ? AND embedding IS NOT NULL
+        ''', (step,))
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+    
+    def get_structural_prompt(self, sig_hash: str) -> Optional[str]:
+        """Get a cached character prompt template and record the hit, or None on a miss"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT template_response FROM structural_prompt_cache WHERE sig_hash = ?', (sig_hash,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        cursor.execute('''
+            UPDATE structural_prompt_cache
+            SET hit_count = hit_count + 1, last_used = CURRENT_TIMESTAMP
+            WHERE sig_hash = ?
+        ''', (sig_hash,))
+        self.conn.commit()
+        return row[0]
+    
+    def save_structural_prompt(self, sig_hash: str, template_response: str, cached_name: str,
+                               max_entries: int = 500):
+        """Store a character prompt template, evicting the least recently used beyond max_entries"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO structural_prompt_cache (sig_hash, template_response, cached_name)
+            VALUES (?, ?, ?)
+        ''', (sig_hash, template_response, cached_name))
+        cursor.execute('''
+            DELETE FROM structural_prompt_cache
+            WHERE sig_hash NOT IN (
+                SELECT sig_hash FROM structural_prompt_cache ORDER BY last_used DESC LIMIT ?
+            )
+        ''', (max_entries,))
+        self.conn.commit()
+    
     def clear_ai_chat_messages(self, story_id: str):
         """Clear all AI chat messages for a story"""
         cursor = self.conn.cursor()
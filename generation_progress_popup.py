@@ -7,10 +7,28 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext
 import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, Callable, Optional
 from config import estimate_step_time, estimate_total_time, format_time_estimate
 
+# Worker-thread UI updates are applied in one Tk callback at most this often
+UI_BATCH_INTERVAL_MS = 50
+
+# Longest text shown per AI chat message (the full text is still saved to the database)
+AI_CHAT_DISPLAY_CHARS = 8192
+AI_THINK_DISPLAY_CHARS = 2048
+
+
+def _clip(text: str, limit: int, keep_end: bool = False) -> str:
+    """Shorten text for display, noting how much was left out"""
+    if not isinstance(text, str) or len(text) <= limit:
+        return text
+    omitted = len(text) - limit
+    if keep_end:
+        return f"[... {omitted} earlier characters]\n{text[-limit:]}"
+    return f"{text[:limit]}\n[... {omitted} more characters]"
+
 
 class GenerationProgressWindow:
     """Dynamic progress window for story generation"""
@@ -52,6 +70,11 @@ class GenerationProgressWindow:
         self.remaining_time_label = None
         self.elapsed_time_label = None
         
+        # Batched UI updates (key -> callback); a keyed update replaces a pending one with the same key
+        self._pending_updates = OrderedDict()
+        self._updates_lock = threading.Lock()
+        self._drain_scheduled = False
+        
         # Create the window
         self.create_window()
         
@@ -568,36 +591,7 @@ class GenerationProgressWindow:
                 time_display = timestamp_str[-8:] if len(timestamp_str) >= 8 else "--:--:--"
             
             # Add to chat display using existing formatting logic
-            self.ai_chat.insert(tk.END, f"[{time_display}] ", 'timestamp')
-            
-            # Add step indicator if provided
-            if step:
-                self.ai_chat.insert(tk.END, f"[{step.upper()}] ", 'system')
-            
-            # Add message based on type
-            if message_type == 'request':
-                self.ai_chat.insert(tk.END, "🤖 AI Request: ", 'ai_request')
-                self.ai_chat.insert(tk.END, f"{content}\n\n", 'ai_request')
-            elif message_type == 'response':
-                # Parse response for <think> tags
-                think_content, actual_content = self.parse_ai_response(content)
-                
-                if think_content:
-                    # Display thinking process
-                    self.ai_chat.insert(tk.END, "🧠 AI Thinking: ", 'ai_think')
-                    self.ai_chat.insert(tk.END, f"{think_content}\n\n", 'ai_think')
-                
-                # Display actual response
-                self.ai_chat.insert(tk.END, "💬 AI Response: ", 'ai_response')
-                self.ai_chat.insert(tk.END, f"{actual_content}\n\n", 'ai_response')
-            elif message_type == 'error':
-                self.ai_chat.insert(tk.END, "❌ Error: ", 'error')
-                self.ai_chat.insert(tk.END, f"{content}\n\n", 'error')
-            elif message_type == 'success':
-                self.ai_chat.insert(tk.END, "✅ Success: ", 'success')
-                self.ai_chat.insert(tk.END, f"{content}\n\n", 'success')
-            else:
-                self.ai_chat.insert(tk.END, f"{content}\n\n")
+            self._insert_chat_message(time_display, message_type, content, step)
             
         except Exception as e:
             print(f"Error displaying historical message: {e}")
@@ -629,7 +623,33 @@ class GenerationProgressWindow:
         self.ai_chat.tag_config('success', foreground='#009900', font=('Consolas', 9, 'bold'))
     
     
-    def update_step(self, step_key: str, progress: int, status: str, details: str = ""):
+    def _post_ui(self, update: Callable, key=None):
+        """Queue a UI update to be applied in the next batch on the Tk thread"""
+        if not self.window:
+            return
+        
+        with self._updates_lock:
+            self._pending_updates[key if key is not None else object()] = update
+            if self._drain_scheduled:
+                return
+            self._drain_scheduled = True
+        self.window.after(UI_BATCH_INTERVAL_MS, self._drain_ui_updates)
+    
+    def _drain_ui_updates(self):
+        """Apply all queued UI updates in a single Tk callback"""
+        with self._updates_lock:
+            updates = list(self._pending_updates.values())
+            self._pending_updates.clear()
+            self._drain_scheduled = False
+        
+        for update in updates:
+            try:
+                update()
+            except Exception as e:
+                print(f"Error applying UI update: {e}")
+    
+    def update_step(self, step_key: str, progress: int, status: str, details: str = "",
+                    refresh_overall: bool = True):
         """Update a specific step's progress with time tracking"""
         if not self.is_open or step_key not in self.step_progress:
             return
@@ -686,8 +706,9 @@ class GenerationProgressWindow:
                     actual_time = self.actual_step_times[step_key]
                     self.step_progress[step_key]['time_label'].config(text=f"Took: {format_time_estimate(int(actual_time))}")
             
-            # Update overall progress
-            self.update_overall_progress()
+            # Update overall progress (callers updating several steps do this once at the end)
+            if refresh_overall:
+                self.update_overall_progress()
             
             # Store step data
             self.step_progress[step_key].update({
@@ -696,8 +717,7 @@ class GenerationProgressWindow:
                 'details': details
             })
         
-        if self.window:
-            self.window.after(0, update_ui)
+        self._post_ui(update_ui)
     
     def update_step_estimates(self, shot_count: int = None, character_count: int = None):
         """Update time estimates based on actual story/shot data"""
@@ -752,8 +772,7 @@ class GenerationProgressWindow:
             # Update the label
             self.step_progress[step_key]['node_info_label'].config(text=node_text)
         
-        if self.window:
-            self.window.after(0, update_node_info)
+        self._post_ui(update_node_info, ('node_info', step_key))
     
     def initialize_time_estimates(self):
         """Initialize time estimates for each step based on configuration"""
@@ -940,6 +959,39 @@ class GenerationProgressWindow:
         
         return think_content, actual_content
     
+    def _insert_chat_message(self, time_display: str, message_type: str, content: str, step: str = ""):
+        """Insert one formatted message into the AI chat, clipping long text for display"""
+        self.ai_chat.insert(tk.END, f"[{time_display}] ", 'timestamp')
+        
+        # Add step indicator if provided
+        if step:
+            self.ai_chat.insert(tk.END, f"[{step.upper()}] ", 'system')
+        
+        # Add message based on type
+        if message_type == 'request':
+            self.ai_chat.insert(tk.END, "🤖 AI Request: ", 'ai_request')
+            self.ai_chat.insert(tk.END, f"{_clip(content, AI_CHAT_DISPLAY_CHARS)}\n\n", 'ai_request')
+        elif message_type == 'response':
+            # Parse response for <think> tags
+            think_content, actual_content = self.parse_ai_response(content)
+            
+            if think_content:
+                # Display the end of the thinking process, where it reaches its conclusion
+                self.ai_chat.insert(tk.END, "🧠 AI Thinking: ", 'ai_think')
+                self.ai_chat.insert(tk.END, f"{_clip(think_content, AI_THINK_DISPLAY_CHARS, keep_end=True)}\n\n", 'ai_think')
+            
+            # Display actual response
+            self.ai_chat.insert(tk.END, "💬 AI Response: ", 'ai_response')
+            self.ai_chat.insert(tk.END, f"{_clip(actual_content, AI_CHAT_DISPLAY_CHARS)}\n\n", 'ai_response')
+        elif message_type == 'error':
+            self.ai_chat.insert(tk.END, "❌ Error: ", 'error')
+            self.ai_chat.insert(tk.END, f"{_clip(content, AI_CHAT_DISPLAY_CHARS)}\n\n", 'error')
+        elif message_type == 'success':
+            self.ai_chat.insert(tk.END, "✅ Success: ", 'success')
+            self.ai_chat.insert(tk.END, f"{_clip(content, AI_CHAT_DISPLAY_CHARS)}\n\n", 'success')
+        else:
+            self.ai_chat.insert(tk.END, f"{_clip(content, AI_CHAT_DISPLAY_CHARS)}\n\n")
+    
     def add_ai_message(self, message_type: str, content: str, step: str = ""):
         """Add full message to AI chat section with <think> tag handling"""
         if not self.is_open:
@@ -954,45 +1006,11 @@ class GenerationProgressWindow:
         
         def add_message():
             self.ai_chat.config(state='normal')
-            
-            # Add timestamp
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            self.ai_chat.insert(tk.END, f"[{timestamp}] ", 'timestamp')
-            
-            # Add step indicator if provided
-            if step:
-                self.ai_chat.insert(tk.END, f"[{step.upper()}] ", 'system')
-            
-            # Add message based on type
-            if message_type == 'request':
-                self.ai_chat.insert(tk.END, "🤖 AI Request: ", 'ai_request')
-                self.ai_chat.insert(tk.END, f"{content}\n\n", 'ai_request')
-            elif message_type == 'response':
-                # Parse response for <think> tags
-                think_content, actual_content = self.parse_ai_response(content)
-                
-                if think_content:
-                    # Display thinking process
-                    self.ai_chat.insert(tk.END, "🧠 AI Thinking: ", 'ai_think')
-                    self.ai_chat.insert(tk.END, f"{think_content}\n\n", 'ai_think')
-                
-                # Display actual response
-                self.ai_chat.insert(tk.END, "💬 AI Response: ", 'ai_response')
-                self.ai_chat.insert(tk.END, f"{actual_content}\n\n", 'ai_response')
-            elif message_type == 'error':
-                self.ai_chat.insert(tk.END, "❌ Error: ", 'error')
-                self.ai_chat.insert(tk.END, f"{content}\n\n", 'error')
-            elif message_type == 'success':
-                self.ai_chat.insert(tk.END, "✅ Success: ", 'success')
-                self.ai_chat.insert(tk.END, f"{content}\n\n", 'success')
-            else:
-                self.ai_chat.insert(tk.END, f"{content}\n\n")
-            
+            self._insert_chat_message(datetime.now().strftime("%H:%M:%S"), message_type, content, step)
             self.ai_chat.config(state='disabled')
             self.ai_chat.see(tk.END)
         
-        if self.window:
-            self.window.after(0, add_message)
+        self._post_ui(add_message)
     
     def get_cleaned_ai_response(self, content: str):
         """Get AI response with <think> tags removed for actual use"""
@@ -1009,8 +1027,7 @@ class GenerationProgressWindow:
             self.title_label.config(text=title)
             self.window.title(f"Generating: {title}")
         
-        if self.window:
-            self.window.after(0, update_title)
+        self._post_ui(update_title, 'title')
     
     
     def load_existing_content(self):
@@ -1075,9 +1092,15 @@ class GenerationProgressWindow:
     
     def set_completed_state(self):
         """Set all progress bars to completed state"""
-        steps = ['story', 'shots', 'characters', 'style', 'prompts', 'narration', 'music', 'queue']
-        for step in steps:
-            self.update_step(step, 100, 'completed', f'{step.title()} generation complete')
+        for step in self.step_progress:
+            self.update_step(step, 100, 'completed', f'{step.title()} generation complete', refresh_overall=False)
+        self._post_ui(self.update_overall_progress)
+    
+    def mark_all_completed(self, details: str = ""):
+        """Mark every step completed, recomputing the overall progress once rather than per step"""
+        for step in self.step_progress:
+            self.update_step(step, 100, 'completed', details, refresh_overall=False)
+        self._post_ui(self.update_overall_progress)
     
     def estimate_current_progress(self, story_data, shots, characters):
         """Estimate current progress based on available data"""
@@ -1150,8 +1173,7 @@ class GenerationProgressWindow:
             
             self.story_content.config(state='disabled')
         
-        if self.window:
-            self.window.after(0, update_content)
+        self._post_ui(update_content, 'story_content')
     
     def format_and_insert_story(self, content: str, story_data: dict):
         """Format and insert story content with proper styling"""
@@ -1209,8 +1231,7 @@ class GenerationProgressWindow:
             self.storyboard_scrollable_frame.update_idletasks()
             self.storyboard_canvas.configure(scrollregion=self.storyboard_canvas.bbox("all"))
         
-        if self.window:
-            self.window.after(0, update_shots)
+        self._post_ui(update_shots, 'shot_list')
     
     def create_shot_card(self, shot, index: int):
         """Create a shot card for the storyboard"""
@@ -1445,8 +1466,7 @@ class GenerationProgressWindow:
             negative_widget.insert(tk.END, negative)
             negative_widget.config(state='disabled')
         
-        if self.window:
-            self.window.after(0, update_prompts)
+        self._post_ui(update_prompts, ('shot_prompts', shot_number))
     
     def update_shot_narration(self, shot_number: int, narration: str):
         """Update narration for a specific shot (future-proof for real-time updates)"""
@@ -1470,8 +1490,7 @@ class GenerationProgressWindow:
                 narration_widget.insert(tk.END, narration)
                 narration_widget.config(state='disabled')
         
-        if self.window:
-            self.window.after(0, update_narration)
+        self._post_ui(update_narration, ('shot_narration', shot_number))
     
     def update_shot_music(self, shot_number: int, music_cue: str):
         """Update music cue for a specific shot (future-proof for real-time updates)"""
@@ -1495,8 +1514,7 @@ class GenerationProgressWindow:
                 music_widget.insert(tk.END, music_cue)
                 music_widget.config(state='disabled')
         
-        if self.window:
-            self.window.after(0, update_music)
+        self._post_ui(update_music, ('shot_music', shot_number))
     
     def update_shot_render_progress(self, shot_number: int, progress: float):
         """Update render progress for a specific shot (future ComfyUI integration)"""
@@ -1507,8 +1525,7 @@ class GenerationProgressWindow:
             progress_bar = self.shot_cards[shot_number]['progress']
             progress_bar['value'] = progress
         
-        if self.window:
-            self.window.after(0, update_progress)
+        self._post_ui(update_progress, ('shot_progress', shot_number))
     
     def update_style_references(self, characters: list, locations: list, visual_style: dict):
         """Update the style references display"""
@@ -1643,8 +1660,7 @@ class GenerationProgressWindow:
             self.style_scrollable_frame.update_idletasks()
             self.style_canvas.configure(scrollregion=self.style_canvas.bbox("all"))
         
-        if self.window:
-            self.window.after(0, update_references)
+        self._post_ui(update_references, 'style_references')
     
     def update_shot_status(self, shot_number: int, status: str, progress: int = 0):
         """Update individual shot rendering status"""
@@ -1663,8 +1679,7 @@ class GenerationProgressWindow:
             elif status == 'error':
                 card['preview'].config(text="❌ Render Failed", bg='#f8d7da')
         
-        if self.window:
-            self.window.after(0, update_status)
+        self._post_ui(update_status, ('shot_status', shot_number))
     
     def close(self):
         """Close the progress window"""
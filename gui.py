@@ -1582,6 +1582,9 @@ System Prompt Presets:
                         self.db.update_render_queue_status(queue_id, 'failed', error)
                         self.add_log(f"❌ Failed to render shot {shot_id} from '{story_title}': {error}", "Error")
                     
+                    # Story generation may be waiting for the render queue to drain
+                    self.story_queue.notify_render_progress()
+                    
                     self.root.after(0, self.refresh_queue)
                 else:
                     time.sleep(2)
@@ -1679,6 +1682,8 @@ System Prompt Presets:
     def cleanup(self):
         """Cleanup on exit"""
         self.render_worker_active = False
+        if hasattr(self, 'research_tab_instance'):
+            self.research_tab_instance.close()
         if hasattr(self, 'db'):
             self.db.close()
         self.add_log("Application cleanup complete", "Info")
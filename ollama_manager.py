@@ -9,7 +9,8 @@ import json
 import os
 import requests
 import threading
-from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Iterable, List, Optional
 from config import OLLAMA_CONFIG, SYSTEM_PROMPTS, DB_DIR, MODEL_CONFIGS
 from network_discovery import FastNetworkDiscovery
 
@@ -39,6 +40,13 @@ class OllamaManager:
         self.network_discovery = FastNetworkDiscovery()
         self.settings_file = os.path.join(DB_DIR, "model_settings.json")
         
+        # Generation requests reuse pooled keep-alive connections to each Ollama host
+        pool_size = config.get('http_pool_size', 16)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         # Multiple connection support
         self.ollama_instances = {}  # instance_key -> connection info
         self.step_model_assignments = {  # AI step -> (instance_key, model)
@@ -55,6 +63,9 @@ class OllamaManager:
         
         # Multi-node support
         self.multi_node_assignments = {}  # step -> [(instance_key, model), ...]
+        
+        # Reasoning models (deepseek-r1, qwq) wrap their output in <think> tags
+        self._emits_think_tags: Dict[str, bool] = {}  # model -> detected on first response
         self.node_manager = None
         if NODE_MANAGER_AVAILABLE:
             self.node_manager = NodeManager()
@@ -191,8 +202,12 @@ class OllamaManager:
             else:
                 return False, "No working Ollama instances found"
     
-    def generate(self, prompt: str, system: str = None, temperature: float = None, step: str = 'story') -> str:
-        """Generate response using assigned model for specific step"""
+    def generate(self, prompt: str, system: str = None, temperature: float = None, step: str = 'story',
+                 on_chunk: Callable[[str], None] = None, stop: List[str] = None) -> str:
+        """Generate response using assigned model for specific step, streaming text to on_chunk if given
+        
+        Generation ends at the first of the stop sequences, which are left out of the response.
+        """
         if not self.available:
             raise Exception("Ollama not available - cannot generate content")
         
@@ -219,11 +234,16 @@ class OllamaManager:
             enhanced_system = self._enhance_system_prompt(model_name, system)
             model_temperature = self._get_model_temperature(model_name, temperature)
             
+            # A stop sequence could also turn up inside a reasoning model's <think> block,
+            # so only stop early once the model is known not to emit one
+            if self._emits_think_tags.get(model_name) is not False:
+                stop = None
+            
             # Use appropriate connection method
             if instance.get('connection_type') == 'library':
-                return self._generate_with_library(model_name, prompt, enhanced_system, model_temperature)
+                return self._generate_with_library(model_name, prompt, enhanced_system, model_temperature, on_chunk, stop)
             else:
-                return self._generate_with_api(instance, model_name, prompt, enhanced_system, model_temperature)
+                return self._generate_with_api(instance, model_name, prompt, enhanced_system, model_temperature, on_chunk, stop)
                 
         except Exception as e:
             print(f"Generation error for step {step}: {e}")
@@ -255,7 +275,38 @@ class OllamaManager:
         else:
             return self.config['temperature']
     
-    def _generate_with_library(self, model: str, prompt: str, system: str = None, temperature: float = None) -> str:
+    def _options(self, temperature: float = None, stop: List[str] = None) -> dict:
+        """Build the Ollama generation options"""
+        options = {
+            'temperature': temperature or self.config['temperature'],
+            'top_p': self.config['top_p']
+        }
+        if stop:
+            options['stop'] = stop
+        return options
+    
+    @staticmethod
+    def _join_stream(pieces: Iterable[str], on_chunk: Callable[[str], None]) -> str:
+        """Pass each streamed piece of text to on_chunk and return the full text"""
+        parts = []
+        for piece in pieces:
+            if piece:
+                parts.append(piece)
+                on_chunk(piece)
+        return ''.join(parts)
+    
+    @staticmethod
+    def _message_content(response) -> Optional[str]:
+        """Extract message content from a ChatResponse object or dict"""
+        if hasattr(response, 'message'):
+            if hasattr(response.message, 'content'):
+                return response.message.content
+        elif isinstance(response, dict) and 'message' in response:
+            return response['message']['content']
+        return None
+    
+    def _generate_with_library(self, model: str, prompt: str, system: str = None, temperature: float = None,
+                               on_chunk: Callable[[str], None] = None, stop: List[str] = None) -> str:
         """Generate using ollama library for localhost - NO TIMEOUT"""
         import ollama
         import os
@@ -275,10 +326,9 @@ class OllamaManager:
                 response = ollama.chat(
                     model=model,
                     messages=messages,
-                    options={
-                        'temperature': temperature or self.config['temperature'],
-                        'top_p': self.config['top_p']
-                    }
+                    options=self._options(temperature, stop),
+                    stream=on_chunk is not None,
+                    keep_alive=self.config.get('keep_alive')
                 )
             finally:
                 # Restore original timeout
@@ -294,58 +344,43 @@ class OllamaManager:
                 response = client.chat(
                     model=model,
                     messages=messages,
-                    options={
-                        'temperature': temperature or self.config['temperature'],
-                        'top_p': self.config['top_p']
-                    }
+                    options=self._options(temperature, stop),
+                    stream=on_chunk is not None,
+                    keep_alive=self.config.get('keep_alive')
                 )
             except Exception:
                 # Method 3: Fall back to HTTP API directly
                 print(f"Ollama library timeout issue, falling back to HTTP API: {e}")
-                return self._generate_with_direct_http('localhost', 11434, model, prompt, system, temperature)
+                return self._generate_with_direct_http('localhost', 11434, model, prompt, system, temperature,
+                                                       on_chunk, stop)
         
-        # Handle ChatResponse object
-        if hasattr(response, 'message'):
-            if hasattr(response.message, 'content'):
-                return response.message.content
-        elif isinstance(response, dict) and 'message' in response:
-            return response['message']['content']
+        # Streaming returns an iterator of partial ChatResponse objects
+        if on_chunk is not None:
+            return self._join_stream((self._message_content(chunk) for chunk in response), on_chunk)
+        
+        content = self._message_content(response)
+        if content is not None:
+            return content
         
         raise Exception(f"Could not extract content from response: {type(response)}")
     
-    def _generate_with_direct_http(self, host: str, port: int, model: str, prompt: str, system: str = None, temperature: float = None) -> str:
+    def _generate_with_direct_http(self, host: str, port: int, model: str, prompt: str, system: str = None,
+                                   temperature: float = None, on_chunk: Callable[[str], None] = None,
+                                   stop: List[str] = None) -> str:
         """Direct HTTP call as fallback when ollama library has timeout issues"""
-        url = f"http://{host}:{port}/api/chat"
-        
-        messages = []
-        if system:
-            messages.append({'role': 'system', 'content': system})
-        messages.append({'role': 'user', 'content': prompt})
-        
-        data = {
-            'model': model,
-            'messages': messages,
-            'options': {
-                'temperature': temperature or self.config['temperature'],
-                'top_p': self.config['top_p']
-            },
-            'stream': False
-        }
-        
-        # NO TIMEOUT - AI generation can take as long as needed
-        response = requests.post(url, json=data, timeout=None)
-        response.raise_for_status()
-        
-        result = response.json()
-        if 'message' in result and 'content' in result['message']:
-            return result['message']['content']
-            
-        raise Exception(f"Invalid response format from direct HTTP call")
+        return self._post_chat(f"http://{host}:{port}/api/chat", model, prompt, system, temperature,
+                               on_chunk, "direct HTTP call", stop)
     
-    def _generate_with_api(self, instance: dict, model: str, prompt: str, system: str = None, temperature: float = None) -> str:
+    def _generate_with_api(self, instance: dict, model: str, prompt: str, system: str = None,
+                           temperature: float = None, on_chunk: Callable[[str], None] = None,
+                           stop: List[str] = None) -> str:
         """Generate using HTTP API for network instances - NO TIMEOUT"""
-        url = f"{instance['url']}/api/chat"
-        
+        return self._post_chat(f"{instance['url']}/api/chat", model, prompt, system, temperature,
+                               on_chunk, instance['url'], stop)
+    
+    def _post_chat(self, url: str, model: str, prompt: str, system: str, temperature: float,
+                   on_chunk: Optional[Callable[[str], None]], source: str, stop: List[str] = None) -> str:
+        """POST to an Ollama /api/chat endpoint, streaming the reply to on_chunk if given"""
         messages = []
         if system:
             messages.append({'role': 'system', 'content': system})
@@ -354,22 +389,27 @@ class OllamaManager:
         data = {
             'model': model,
             'messages': messages,
-            'options': {
-                'temperature': temperature or self.config['temperature'],
-                'top_p': self.config['top_p']
-            },
-            'stream': False
+            'options': self._options(temperature, stop),
+            'stream': on_chunk is not None
         }
+        if self.config.get('keep_alive'):
+            data['keep_alive'] = self.config['keep_alive']
         
         # NO TIMEOUT - AI generation can take as long as needed
-        response = requests.post(url, json=data, timeout=None)
+        response = self.session.post(url, json=data, timeout=None, stream=on_chunk is not None)
         response.raise_for_status()
         
+        # Streaming replies are one JSON object per line
+        if on_chunk is not None:
+            return self._join_stream(
+                (json.loads(line).get('message', {}).get('content') for line in response.iter_lines() if line),
+                on_chunk)
+        
         result = response.json()
         if 'message' in result and 'content' in result['message']:
             return result['message']['content']
             
-        raise Exception(f"Invalid response format from {instance['url']}")
+        raise Exception(f"Invalid response format from {source}")
     
     def set_step_model(self, step: str, instance_key: str, model_name: str) -> bool:
         """Assign specific model to AI generation step"""
@@ -391,6 +431,13 @@ class OllamaManager:
         """Get assigned model for specific step"""
         return self.step_model_assignments.get(step, (None, None))
     
+    def emits_think_tags(self, model_name: str, response: str) -> bool:
+        """Check whether a model emits <think> tags, detected from its first response"""
+        emits = self._emits_think_tags.get(model_name)
+        if emits is None:
+            emits = self._emits_think_tags.setdefault(model_name, '<think>' in response)
+        return emits
+    
     def set_model(self, model_name: str):
         """Legacy: Set active model for backward compatibility"""
         if model_name in self.available_models:
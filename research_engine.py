@@ -37,6 +37,10 @@ class ResearchEngine:
         self.current_session_id = None
         self.is_running = False
         
+    def close(self):
+        """Shut down the social media worker processes and HTTP connections"""
+        self.social_media.close()
+        
     def set_progress_callback(self, callback: Callable[[str, float], None]):
         """Set callback for progress updates"""
         self.progress_callback = callback
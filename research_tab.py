@@ -7,6 +7,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import json
 import threading
+import time
+from collections import deque
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional
 import webbrowser
@@ -14,6 +16,9 @@ import webbrowser
 from database import DatabaseManager
 from research_engine import ResearchEngine, ResearchScheduler
 
+# Maximum number of lines kept in the research log widget
+MAX_LOG_LINES = 5000
+
 class ResearchTab:
     """Research tab for the main application"""
     
@@ -30,6 +35,12 @@ class ResearchTab:
         self.research_thread = None
         self.auto_refresh = True
         
+        # Log lines are buffered and flushed to the Text widget in batches
+        self._log_buffer = deque()
+        self._log_flush_scheduled = False
+        self._last_ts_sec = 0
+        self._last_ts_str = ''
+        
         # Setup callbacks
         self.research_engine.set_progress_callback(self.update_progress)
         self.research_engine.set_status_callback(self.update_status)
@@ -79,6 +90,7 @@ class ResearchTab:
         """Setup main dashboard tab"""
         dashboard_frame = ttk.Frame(self.notebook)
         self.notebook.add(dashboard_frame, text='Dashboard')
+        self.dashboard_tab = dashboard_frame
         
         # Quick stats frame
         stats_frame = ttk.LabelFrame(dashboard_frame, text="Research Overview", padding="10")
@@ -385,6 +397,10 @@ class ResearchTab:
         # This would need to be implemented in the research engine
         self.log_message("Stop research functionality not yet implemented")
     
+    def close(self):
+        """Release the research engine's worker processes on exit"""
+        self.research_engine.close()
+    
     def update_progress(self, message: str, progress: float):
         """Update progress display"""
         def update_ui():
@@ -679,19 +695,61 @@ class ResearchTab:
     
     def log_message(self, message: str):
         """Add message to log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\\n"
+        # Only reformat the timestamp when the second changes
+        now = int(time.time())
+        if now != self._last_ts_sec:
+            self._last_ts_sec = now
+            self._last_ts_str = time.strftime("%H:%M:%S", time.localtime(now))
+        log_entry = f"[{self._last_ts_str}] {message}\n"
+        
+        self._log_buffer.append(log_entry)
+        if not self._log_flush_scheduled:
+            self._log_flush_scheduled = True
+            try:
+                self.parent.after(100, self._flush_log)
+            except Exception:
+                self._flush_log()
+    
+    def _flush_log(self):
+        """Write all buffered log lines to the log widget in one insert"""
+        self._log_flush_scheduled = False
+        if not self._log_buffer:
+            return
+        
+        entries = []
+        while self._log_buffer:
+            entries.append(self._log_buffer.popleft())
+        text = ''.join(entries)
         
         try:
-            self.log_text.insert(tk.END, log_entry)
+            self.log_text.insert(tk.END, text)
+            
+            # Trim the oldest lines so the widget doesn't grow without bound
+            line_count = int(self.log_text.index('end-1c').split('.')[0])
+            if line_count > MAX_LOG_LINES:
+                self.log_text.delete('1.0', f'{line_count - MAX_LOG_LINES}.0')
+            
             self.log_text.see(tk.END)
         except:
             # Handle case where log_text doesn't exist yet
-            print(log_entry.strip())
+            print(text.strip())
+    
+    def is_dashboard_visible(self) -> bool:
+        """Check whether the dashboard is actually on screen"""
+        try:
+            if self.parent.winfo_toplevel().state() in ('withdrawn', 'iconic'):
+                return False
+            if not self.parent.winfo_ismapped():
+                return False
+            return str(self.notebook.select()) == str(self.dashboard_tab)
+        except tk.TclError:
+            return False
     
     def auto_refresh_timer(self):
         """Auto-refresh timer"""
-        if self.auto_refresh_var.get() and not self.research_engine.is_running:
+        # Skip the refresh while nobody can see the dashboard
+        if (self.auto_refresh_var.get() and not self.research_engine.is_running
+                and self.is_dashboard_visible()):
             self.update_dashboard_stats()
         
         # Schedule next refresh in 30 seconds
@@ -7,14 +7,57 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import json
 import os
+import concurrent.futures
+import types
+from pathlib import Path
 from typing import Dict, Any
 
 from config import API_SETTINGS, SYSTEM_PROMPT_PRESETS, ACTIVE_PRESET, DB_DIR
 
+# Shared widget options, built once instead of per widget
+_LABEL_W12 = {'width': 12}
+_LABEL_W15 = {'width': 15}
+_PACK_LEFT = {'side': 'left'}
+_PACK_LEFT_FILL = {'side': 'left', 'padx': 5, 'fill': 'x', 'expand': True}
+_SMALL_FONT = ('Arial', 9)
+_MONO_FONT = ('Consolas', 9)
+
+# Prefer orjson for preset files (large prompt strings), fall back to stdlib json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _loads(data: bytes) -> Any:
+    """Parse JSON bytes using the fastest available parser"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize to indented JSON bytes using the fastest available encoder"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode('utf-8')
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write bytes to a temp file then swap it into place so readers never see a partial file"""
+    tmp_path = path + '.tmp'
+    Path(tmp_path).write_bytes(data)
+    os.replace(tmp_path, path)
+
 
 class SettingsDialog:
     """Settings dialog for API keys and system prompts"""
     
+    # Default prompts snapshot taken at import, read-only
+    _DEFAULT_PROMPTS = types.MappingProxyType(dict(SYSTEM_PROMPT_PRESETS['default']['prompts']))
+    _PROMPT_TYPES = frozenset(_DEFAULT_PROMPTS)
+    
     def __init__(self, parent, database_manager=None):
         self.parent = parent
         self.db = database_manager
@@ -25,6 +68,18 @@ class SettingsDialog:
         self.api_settings = self.load_api_settings()
         self.custom_presets = self.load_custom_presets()
         self.current_preset = ACTIVE_PRESET
+        self._all_presets = None  # Merged built-in + custom presets, rebuilt on mutation
+        self._last_preset = None  # Preset shown in the description field
+        self._last_rendered = None  # (preset, prompt type) shown in the editor
+        self._loading = False  # Suppresses selection handlers during bulk loads
+        self._last_presets_bytes = None  # Last serialized presets written to disk
+        self._prompts_built = False  # System Prompts tab is built on first activation
+        self._preset_dialog = None
+        
+        # Connection tests run off the Tk thread
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self._test_results = []
+        self._pending_tests = 0
         
         # Create dialog window
         self.window = tk.Toplevel(parent)
@@ -53,10 +108,10 @@ class SettingsDialog:
         self.notebook.add(self.api_tab, text='API Configuration')
         self.setup_api_tab()
         
-        # System Prompts Tab
+        # System Prompts Tab (contents built lazily when first selected)
         self.prompts_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.prompts_tab, text='System Prompts')
-        self.setup_prompts_tab()
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
         
         # Buttons
         button_frame = ttk.Frame(self.window)
@@ -67,8 +122,18 @@ class SettingsDialog:
                   style='Accent.TButton').pack(side='right', padx=5)
         ttk.Button(button_frame, text="Cancel", 
                   command=self.window.destroy).pack(side='right')
-        ttk.Button(button_frame, text="Test Connections", 
-                  command=self.test_api_connections).pack(side='left')
+        self.test_button = ttk.Button(button_frame, text="Test Connections", 
+                                     command=self.test_api_connections)
+        self.test_button.pack(side='left')
+    
+    def _on_tab_changed(self, event=None):
+        """Build the System Prompts tab the first time it is shown"""
+        if self._prompts_built:
+            return
+        if self.notebook.index(self.notebook.select()) == 1:
+            self._prompts_built = True
+            self.setup_prompts_tab()
+            self.load_preset_values()
     
     def setup_api_tab(self):
         """Setup API configuration tab"""
@@ -86,25 +151,25 @@ class SettingsDialog:
         # API Key
         key_frame = ttk.Frame(openai_frame)
         key_frame.pack(fill='x', pady=5)
-        ttk.Label(key_frame, text="API Key:", width=12).pack(side='left')
+        ttk.Label(key_frame, text="API Key:", **_LABEL_W12).pack(**_PACK_LEFT)
         self.openai_key_var = tk.StringVar()
         self.openai_key_entry = ttk.Entry(key_frame, textvariable=self.openai_key_var, 
                                          width=50, show='*')
-        self.openai_key_entry.pack(side='left', padx=5, fill='x', expand=True)
+        self.openai_key_entry.pack(**_PACK_LEFT_FILL)
         ttk.Button(key_frame, text="Show", 
                   command=lambda: self.toggle_password_visibility(self.openai_key_entry)).pack(side='right')
         
         # Base URL
         url_frame = ttk.Frame(openai_frame)
         url_frame.pack(fill='x', pady=5)
-        ttk.Label(url_frame, text="Base URL:", width=12).pack(side='left')
+        ttk.Label(url_frame, text="Base URL:", **_LABEL_W12).pack(**_PACK_LEFT)
         self.openai_url_var = tk.StringVar()
-        ttk.Entry(url_frame, textvariable=self.openai_url_var, width=60).pack(side='left', padx=5, fill='x', expand=True)
+        ttk.Entry(url_frame, textvariable=self.openai_url_var, width=60).pack(**_PACK_LEFT_FILL)
         
         # Model Selection
         model_frame = ttk.Frame(openai_frame)
         model_frame.pack(fill='x', pady=5)
-        ttk.Label(model_frame, text="Model:", width=12).pack(side='left')
+        ttk.Label(model_frame, text="Model:", **_LABEL_W12).pack(**_PACK_LEFT)
         self.openai_model_var = tk.StringVar()
         self.openai_model_combo = ttk.Combobox(model_frame, textvariable=self.openai_model_var,
                                               values=API_SETTINGS['openai']['models'], 
@@ -122,25 +187,25 @@ class SettingsDialog:
         # API Key
         key_frame = ttk.Frame(claude_frame)
         key_frame.pack(fill='x', pady=5)
-        ttk.Label(key_frame, text="API Key:", width=12).pack(side='left')
+        ttk.Label(key_frame, text="API Key:", **_LABEL_W12).pack(**_PACK_LEFT)
         self.claude_key_var = tk.StringVar()
         self.claude_key_entry = ttk.Entry(key_frame, textvariable=self.claude_key_var, 
                                          width=50, show='*')
-        self.claude_key_entry.pack(side='left', padx=5, fill='x', expand=True)
+        self.claude_key_entry.pack(**_PACK_LEFT_FILL)
         ttk.Button(key_frame, text="Show", 
                   command=lambda: self.toggle_password_visibility(self.claude_key_entry)).pack(side='right')
         
         # Base URL
         url_frame = ttk.Frame(claude_frame)
         url_frame.pack(fill='x', pady=5)
-        ttk.Label(url_frame, text="Base URL:", width=12).pack(side='left')
+        ttk.Label(url_frame, text="Base URL:", **_LABEL_W12).pack(**_PACK_LEFT)
         self.claude_url_var = tk.StringVar()
-        ttk.Entry(url_frame, textvariable=self.claude_url_var, width=60).pack(side='left', padx=5, fill='x', expand=True)
+        ttk.Entry(url_frame, textvariable=self.claude_url_var, width=60).pack(**_PACK_LEFT_FILL)
         
         # Model Selection
         model_frame = ttk.Frame(claude_frame)
         model_frame.pack(fill='x', pady=5)
-        ttk.Label(model_frame, text="Model:", width=12).pack(side='left')
+        ttk.Label(model_frame, text="Model:", **_LABEL_W12).pack(**_PACK_LEFT)
         self.claude_model_var = tk.StringVar()
         self.claude_model_combo = ttk.Combobox(model_frame, textvariable=self.claude_model_var,
                                               values=API_SETTINGS['anthropic']['models'], 
@@ -152,20 +217,20 @@ class SettingsDialog:
         priority_frame.pack(fill='x')
         
         ttk.Label(priority_frame, text="Service priority (1=highest, 3=lowest):", 
-                 font=('Arial', 9)).pack(anchor='w', pady=(0, 10))
+                 font=_SMALL_FONT).pack(anchor='w', pady=(0, 10))
         
         priority_grid = ttk.Frame(priority_frame)
         priority_grid.pack(fill='x')
         
-        ttk.Label(priority_grid, text="Ollama:", width=15).grid(row=0, column=0, sticky='w', padx=5)
+        ttk.Label(priority_grid, text="Ollama:", **_LABEL_W15).grid(row=0, column=0, sticky='w', padx=5)
         self.ollama_priority_var = tk.IntVar(value=1)
         ttk.Spinbox(priority_grid, from_=1, to=3, textvariable=self.ollama_priority_var, width=5).grid(row=0, column=1, padx=5)
         
-        ttk.Label(priority_grid, text="OpenAI:", width=15).grid(row=1, column=0, sticky='w', padx=5)
+        ttk.Label(priority_grid, text="OpenAI:", **_LABEL_W15).grid(row=1, column=0, sticky='w', padx=5)
         self.openai_priority_var = tk.IntVar(value=2)
         ttk.Spinbox(priority_grid, from_=1, to=3, textvariable=self.openai_priority_var, width=5).grid(row=1, column=1, padx=5)
         
-        ttk.Label(priority_grid, text="Claude:", width=15).grid(row=2, column=0, sticky='w', padx=5)
+        ttk.Label(priority_grid, text="Claude:", **_LABEL_W15).grid(row=2, column=0, sticky='w', padx=5)
         self.claude_priority_var = tk.IntVar(value=3)
         ttk.Spinbox(priority_grid, from_=1, to=3, textvariable=self.claude_priority_var, width=5).grid(row=2, column=1, padx=5)
     
@@ -181,7 +246,7 @@ class SettingsDialog:
         selection_frame = ttk.Frame(preset_frame)
         selection_frame.pack(fill='x', pady=(0, 10))
         
-        ttk.Label(selection_frame, text="Active Preset:", width=15).pack(side='left')
+        ttk.Label(selection_frame, text="Active Preset:", **_LABEL_W15).pack(**_PACK_LEFT)
         self.preset_var = tk.StringVar()
         self.preset_combo = ttk.Combobox(selection_frame, textvariable=self.preset_var,
                                         state='readonly', width=20)
@@ -206,9 +271,9 @@ class SettingsDialog:
         # Preset Description
         desc_frame = ttk.Frame(preset_frame)
         desc_frame.pack(fill='x', pady=(10, 0))
-        ttk.Label(desc_frame, text="Description:", width=15).pack(side='left')
+        ttk.Label(desc_frame, text="Description:", **_LABEL_W15).pack(**_PACK_LEFT)
         self.preset_desc_var = tk.StringVar()
-        ttk.Entry(desc_frame, textvariable=self.preset_desc_var, width=60).pack(side='left', padx=5, fill='x', expand=True)
+        ttk.Entry(desc_frame, textvariable=self.preset_desc_var, width=60).pack(**_PACK_LEFT_FILL)
         
         # Prompt Editing
         prompt_frame = ttk.LabelFrame(main_frame, text="System Prompts", padding="15")
@@ -218,7 +283,7 @@ class SettingsDialog:
         type_frame = ttk.Frame(prompt_frame)
         type_frame.pack(fill='x', pady=(0, 10))
         
-        ttk.Label(type_frame, text="Prompt Type:", width=15).pack(side='left')
+        ttk.Label(type_frame, text="Prompt Type:", **_LABEL_W15).pack(**_PACK_LEFT)
         self.prompt_type_var = tk.StringVar()
         self.prompt_type_combo = ttk.Combobox(type_frame, textvariable=self.prompt_type_var,
                                              values=['story_writer', 'shot_list_creator', 
@@ -229,7 +294,7 @@ class SettingsDialog:
         
         # Prompt editor
         self.prompt_text = scrolledtext.ScrolledText(prompt_frame, height=20, width=80,
-                                                    wrap='word', font=('Consolas', 9))
+                                                    wrap='word', font=_MONO_FONT)
         self.prompt_text.pack(fill='both', expand=True, pady=10)
         
         # Reset button
@@ -242,8 +307,7 @@ class SettingsDialog:
         """Load API settings from file"""
         try:
             if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    return json.load(f)
+                return _loads(Path(self.settings_file).read_bytes())
         except Exception as e:
             print(f"Error loading settings: {e}")
         
@@ -254,8 +318,7 @@ class SettingsDialog:
         """Load custom presets from file"""
         try:
             if os.path.exists(self.presets_file):
-                with open(self.presets_file, 'r') as f:
-                    return json.load(f)
+                return _loads(Path(self.presets_file).read_bytes())
         except Exception as e:
             print(f"Error loading custom presets: {e}")
         
@@ -267,50 +330,98 @@ class SettingsDialog:
             # Ensure directory exists
             os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
             
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.api_settings, f, indent=2)
+            # Serialize in memory and write once rather than streaming many small writes
+            Path(self.settings_file).write_bytes(_dumps(self.api_settings))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save settings: {e}")
     
     def save_custom_presets(self):
         """Save custom presets to file"""
         try:
+            # Skip the write entirely if nothing changed since the last save
+            new_bytes = _dumps(self.custom_presets)
+            if new_bytes == self._last_presets_bytes:
+                return
+            
             # Ensure directory exists
             os.makedirs(os.path.dirname(self.presets_file), exist_ok=True)
             
-            with open(self.presets_file, 'w') as f:
-                json.dump(self.custom_presets, f, indent=2)
+            _write_atomic(self.presets_file, new_bytes)
+            self._last_presets_bytes = new_bytes
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save presets: {e}")
     
     def load_current_values(self):
         """Load current settings into UI"""
-        # API Settings
-        self.openai_enabled_var.set(self.api_settings.get('openai', {}).get('enabled', False))
-        self.openai_key_var.set(self.api_settings.get('openai', {}).get('api_key', ''))
-        self.openai_url_var.set(self.api_settings.get('openai', {}).get('base_url', API_SETTINGS['openai']['base_url']))
-        self.openai_model_var.set(self.api_settings.get('openai', {}).get('default_model', API_SETTINGS['openai']['default_model']))
-        
-        self.claude_enabled_var.set(self.api_settings.get('anthropic', {}).get('enabled', False))
-        self.claude_key_var.set(self.api_settings.get('anthropic', {}).get('api_key', ''))
-        self.claude_url_var.set(self.api_settings.get('anthropic', {}).get('base_url', API_SETTINGS['anthropic']['base_url']))
-        self.claude_model_var.set(self.api_settings.get('anthropic', {}).get('default_model', API_SETTINGS['anthropic']['default_model']))
-        
-        # Load presets
-        all_presets = {**SYSTEM_PROMPT_PRESETS, **self.custom_presets}
-        self.preset_combo['values'] = list(all_presets.keys())
-        self.preset_var.set(self.current_preset)
-        
-        # Load first prompt type
+        openai = self.api_settings.get('openai', {})
+        anthropic = self.api_settings.get('anthropic', {})
+        
+        # Assign everything first, then let Tk redraw once
+        self._loading = True
+        try:
+            # API Settings
+            self.openai_enabled_var.set(openai.get('enabled', False))
+            self.openai_key_var.set(openai.get('api_key', ''))
+            self.openai_url_var.set(openai.get('base_url', API_SETTINGS['openai']['base_url']))
+            self.openai_model_var.set(openai.get('default_model', API_SETTINGS['openai']['default_model']))
+            
+            self.claude_enabled_var.set(anthropic.get('enabled', False))
+            self.claude_key_var.set(anthropic.get('api_key', ''))
+            self.claude_url_var.set(anthropic.get('base_url', API_SETTINGS['anthropic']['base_url']))
+            self.claude_model_var.set(anthropic.get('default_model', API_SETTINGS['anthropic']['default_model']))
+        finally:
+            self._loading = False
+        
+        # Presets are loaded by load_preset_values() once the prompts tab is built
+        if self._prompts_built:
+            self.load_preset_values()
+        
+        self.window.update_idletasks()
+    
+    def load_preset_values(self):
+        """Load presets into the System Prompts tab"""
+        all_presets = self._get_all_presets()
+        
+        self._loading = True
+        try:
+            self._refresh_preset_combo()
+            self.preset_var.set(self.current_preset)
+            if all_presets:
+                self.prompt_type_var.set('story_writer')
+        finally:
+            self._loading = False
+        
+        # Render the first prompt type once, after all values are in place
         if all_presets:
-            self.prompt_type_var.set('story_writer')
             self.on_preset_changed()
     
+    def _get_all_presets(self) -> Dict[str, Any]:
+        """Get built-in and custom presets merged, cached until custom presets change"""
+        if self._all_presets is None:
+            self._all_presets = {**SYSTEM_PROMPT_PRESETS, **self.custom_presets}
+        return self._all_presets
+    
+    def _invalidate_presets(self):
+        """Drop cached preset views after custom presets change"""
+        self._all_presets = None
+        self._last_preset = None
+        self._last_rendered = None
+    
+    def _refresh_preset_combo(self):
+        """Update the preset combobox from the merged preset keys"""
+        self.preset_combo['values'] = tuple(self._get_all_presets().keys())
+    
     def on_preset_changed(self, event=None):
         """Handle preset selection change"""
+        if self._loading:
+            return
+        
         preset_key = self.preset_var.get()
-        all_presets = {**SYSTEM_PROMPT_PRESETS, **self.custom_presets}
+        if preset_key == self._last_preset:
+            return
+        self._last_preset = preset_key
         
+        all_presets = self._get_all_presets()
         if preset_key in all_presets:
             preset = all_presets[preset_key]
             self.preset_desc_var.set(preset.get('description', ''))
@@ -318,13 +429,21 @@ class SettingsDialog:
     
     def on_prompt_type_changed(self, event=None):
         """Handle prompt type selection change"""
+        if self._loading:
+            return
+        
         preset_key = self.preset_var.get()
         prompt_type = self.prompt_type_var.get()
         
-        if not preset_key or not prompt_type:
+        if not preset_key or prompt_type not in self._PROMPT_TYPES:
+            return
+        
+        # Don't clear and refill the editor for a re-selection of the same prompt
+        if (preset_key, prompt_type) == self._last_rendered:
             return
+        self._last_rendered = (preset_key, prompt_type)
         
-        all_presets = {**SYSTEM_PROMPT_PRESETS, **self.custom_presets}
+        all_presets = self._get_all_presets()
         if preset_key in all_presets:
             preset = all_presets[preset_key]
             prompts = preset.get('prompts', {})
@@ -333,20 +452,26 @@ class SettingsDialog:
                 self.prompt_text.delete(1.0, tk.END)
                 self.prompt_text.insert(1.0, prompts[prompt_type])
     
+    def _ask_preset_name(self):
+        """Prompt for a preset name/description, reusing one dialog window"""
+        if self._preset_dialog is None or not self._preset_dialog.window.winfo_exists():
+            self._preset_dialog = PresetNameDialog(self.window)
+        return self._preset_dialog.show()
+    
     def create_new_preset(self):
         """Create a new preset"""
-        dialog = PresetNameDialog(self.window)
-        result = dialog.show()
+        result = self._ask_preset_name()
         
         if result:
             name, description = result
             self.custom_presets[name] = {
                 'name': name,
                 'description': description,
-                'prompts': SYSTEM_PROMPT_PRESETS['default']['prompts'].copy()
+                'prompts': dict(self._DEFAULT_PROMPTS)
             }
+            self._invalidate_presets()
             
-            self.preset_combo['values'] = list({**SYSTEM_PROMPT_PRESETS, **self.custom_presets}.keys())
+            self._refresh_preset_combo()
             self.preset_var.set(name)
             self.on_preset_changed()
     
@@ -354,16 +479,16 @@ class SettingsDialog:
         """Save current preset with new name"""
         current_preset = self.get_current_preset_data()
         
-        dialog = PresetNameDialog(self.window)
-        result = dialog.show()
+        result = self._ask_preset_name()
         
         if result:
             name, description = result
             current_preset['name'] = name
             current_preset['description'] = description
             self.custom_presets[name] = current_preset
+            self._invalidate_presets()
             
-            self.preset_combo['values'] = list({**SYSTEM_PROMPT_PRESETS, **self.custom_presets}.keys())
+            self._refresh_preset_combo()
             self.preset_var.set(name)
             self.save_custom_presets()
     
@@ -378,7 +503,8 @@ class SettingsDialog:
         if preset_key in self.custom_presets:
             if messagebox.askyesno("Confirm Delete", f"Delete preset '{preset_key}'?"):
                 del self.custom_presets[preset_key]
-                self.preset_combo['values'] = list({**SYSTEM_PROMPT_PRESETS, **self.custom_presets}.keys())
+                self._invalidate_presets()
+                self._refresh_preset_combo()
                 self.preset_var.set('default')
                 self.on_preset_changed()
                 self.save_custom_presets()
@@ -395,8 +521,7 @@ class SettingsDialog:
         
         if filename:
             try:
-                with open(filename, 'w') as f:
-                    json.dump(preset_data, f, indent=2)
+                _write_atomic(filename, _dumps(preset_data))
                 messagebox.showinfo("Success", f"Preset exported to {filename}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to export preset: {e}")
@@ -410,13 +535,13 @@ class SettingsDialog:
         
         if filename:
             try:
-                with open(filename, 'r') as f:
-                    preset_data = json.load(f)
+                preset_data = _loads(Path(filename).read_bytes())
                 
                 name = preset_data.get('name', os.path.splitext(os.path.basename(filename))[0])
                 self.custom_presets[name] = preset_data
+                self._invalidate_presets()
                 
-                self.preset_combo['values'] = list({**SYSTEM_PROMPT_PRESETS, **self.custom_presets}.keys())
+                self._refresh_preset_combo()
                 self.preset_var.set(name)
                 self.on_preset_changed()
                 self.save_custom_presets()
@@ -428,7 +553,7 @@ class SettingsDialog:
     def get_current_preset_data(self) -> Dict[str, Any]:
         """Get current preset data from UI"""
         preset_key = self.preset_var.get()
-        all_presets = {**SYSTEM_PROMPT_PRESETS, **self.custom_presets}
+        all_presets = self._get_all_presets()
         
         if preset_key in all_presets:
             preset = all_presets[preset_key].copy()
@@ -447,9 +572,8 @@ class SettingsDialog:
     
     def reset_current_prompt(self):
         """Reset current prompt to default"""
-        prompt_type = self.prompt_type_var.get()
-        if prompt_type in SYSTEM_PROMPT_PRESETS['default']['prompts']:
-            default_prompt = SYSTEM_PROMPT_PRESETS['default']['prompts'][prompt_type]
+        default_prompt = self._DEFAULT_PROMPTS.get(self.prompt_type_var.get())
+        if default_prompt is not None:
             self.prompt_text.delete(1.0, tk.END)
             self.prompt_text.insert(1.0, default_prompt)
     
@@ -461,29 +585,53 @@ class SettingsDialog:
             entry_widget.config(show='*')
     
     def test_api_connections(self):
-        """Test API connections"""
-        results = []
+        """Test API connections in the background"""
+        if self._pending_tests:
+            return
         
-        # Test OpenAI
-        if self.openai_enabled_var.get() and self.openai_key_var.get():
-            try:
-                # Simple test - this would need actual API call implementation
-                results.append("OpenAI: Configuration saved (test requires implementation)")
-            except Exception as e:
-                results.append(f"OpenAI: Error - {e}")
-        else:
-            results.append("OpenAI: Disabled or no API key")
+        # Read Tk variables here, on the UI thread
+        probes = [
+            (self._probe_openai, self.openai_enabled_var.get(), self.openai_key_var.get()),
+            (self._probe_claude, self.claude_enabled_var.get(), self.claude_key_var.get()),
+        ]
         
-        # Test Claude
-        if self.claude_enabled_var.get() and self.claude_key_var.get():
-            try:
-                results.append("Claude: Configuration saved (test requires implementation)")
-            except Exception as e:
-                results.append(f"Claude: Error - {e}")
-        else:
-            results.append("Claude: Disabled or no API key")
+        self._test_results = [None] * len(probes)
+        self._pending_tests = len(probes)
+        self.test_button.config(text="Testing...", state='disabled')
         
-        messagebox.showinfo("API Test Results", "\n".join(results))
+        for index, (probe, enabled, api_key) in enumerate(probes):
+            future = self._executor.submit(probe, enabled, api_key)
+            future.add_done_callback(
+                lambda f, i=index: self.window.after(0, self._append_test_result, i, f))
+    
+    def _probe_openai(self, enabled: bool, api_key: str) -> str:
+        """Test OpenAI configuration (runs on a worker thread)"""
+        if not (enabled and api_key):
+            return "OpenAI: Disabled or no API key"
+        # Simple test - this would need actual API call implementation
+        return "OpenAI: Configuration saved (test requires implementation)"
+    
+    def _probe_claude(self, enabled: bool, api_key: str) -> str:
+        """Test Claude configuration (runs on a worker thread)"""
+        if not (enabled and api_key):
+            return "Claude: Disabled or no API key"
+        return "Claude: Configuration saved (test requires implementation)"
+    
+    def _append_test_result(self, index: int, future):
+        """Collect a finished probe and report once all are done"""
+        try:
+            self._test_results[index] = future.result()
+        except Exception as e:
+            name = "OpenAI" if index == 0 else "Claude"
+            self._test_results[index] = f"{name}: Error - {e}"
+        
+        self._pending_tests -= 1
+        if self._pending_tests:
+            return
+        
+        if self.window.winfo_exists():
+            self.test_button.config(text="Test Connections", state='normal')
+            messagebox.showinfo("API Test Results", "\n".join(self._test_results), parent=self.window)
     
     def save_and_apply(self):
         """Save all settings and apply changes"""
@@ -498,12 +646,15 @@ class SettingsDialog:
         self.api_settings['anthropic']['base_url'] = self.claude_url_var.get()
         self.api_settings['anthropic']['default_model'] = self.claude_model_var.get()
         
-        # Save current preset changes
-        current_preset_data = self.get_current_preset_data()
-        preset_key = self.preset_var.get()
-        
-        if preset_key in self.custom_presets:
-            self.custom_presets[preset_key] = current_preset_data
+        # Save current preset changes (only possible if the prompts tab was opened)
+        if self._prompts_built:
+            current_preset_data = self.get_current_preset_data()
+            preset_key = self.preset_var.get()
+            
+            if preset_key in self.custom_presets:
+                self.custom_presets[preset_key] = current_preset_data
+                self._invalidate_presets()
+            self.current_preset = preset_key
         
         # Save to files
         self.save_api_settings()
@@ -511,9 +662,10 @@ class SettingsDialog:
         
         # Save active preset to config
         global ACTIVE_PRESET
-        ACTIVE_PRESET = self.preset_var.get()
+        ACTIVE_PRESET = self.current_preset
         
         messagebox.showinfo("Success", "Settings saved successfully!")
+        self._executor.shutdown(wait=False)
         self.window.destroy()
 
 
@@ -524,11 +676,14 @@ class PresetNameDialog:
         self.parent = parent
         self.result = None
         
+        self.done_var = tk.BooleanVar(value=False)
+        
         self.window = tk.Toplevel(parent)
         self.window.title("New Preset")
         self.window.geometry("400x200")
         self.window.transient(parent)
-        self.window.grab_set()
+        self.window.withdraw()
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel_clicked)
         
         # Center window
         self.window.update_idletasks()
@@ -546,14 +701,14 @@ class PresetNameDialog:
         # Name
         name_frame = ttk.Frame(main_frame)
         name_frame.pack(fill='x', pady=(0, 10))
-        ttk.Label(name_frame, text="Name:", width=12).pack(side='left')
+        ttk.Label(name_frame, text="Name:", **_LABEL_W12).pack(**_PACK_LEFT)
         self.name_var = tk.StringVar()
         ttk.Entry(name_frame, textvariable=self.name_var, width=30).pack(side='left', fill='x', expand=True)
         
         # Description
         desc_frame = ttk.Frame(main_frame)
         desc_frame.pack(fill='x', pady=(0, 20))
-        ttk.Label(desc_frame, text="Description:", width=12).pack(side='left')
+        ttk.Label(desc_frame, text="Description:", **_LABEL_W12).pack(**_PACK_LEFT)
         self.desc_var = tk.StringVar()
         ttk.Entry(desc_frame, textvariable=self.desc_var, width=30).pack(side='left', fill='x', expand=True)
         
@@ -562,10 +717,7 @@ class PresetNameDialog:
         button_frame.pack(fill='x')
         
         ttk.Button(button_frame, text="OK", command=self.ok_clicked).pack(side='right', padx=5)
-        ttk.Button(button_frame, text="Cancel", command=self.window.destroy).pack(side='right')
-        
-        # Focus name entry
-        self.window.after(100, lambda: self.name_var and self.window.focus_set())
+        ttk.Button(button_frame, text="Cancel", command=self.cancel_clicked).pack(side='right')
     
     def ok_clicked(self):
         """Handle OK button"""
@@ -575,9 +727,35 @@ class PresetNameDialog:
             return
         
         self.result = (name, self.desc_var.get().strip())
-        self.window.destroy()
+        self.hide()
+    
+    def cancel_clicked(self):
+        """Handle Cancel button or window close"""
+        self.result = None
+        self.hide()
+    
+    def hide(self):
+        """Hide the dialog so it can be shown again without rebuilding"""
+        self.window.grab_release()
+        self.window.withdraw()
+        self.done_var.set(True)
     
     def show(self):
         """Show dialog and return result"""
-        self.window.wait_window()
+        self.result = None
+        self.name_var.set('')
+        self.desc_var.set('')
+        self.done_var.set(False)
+        
+        self.window.deiconify()
+        self.window.grab_set()
+        
+        # Focus name entry
+        self.window.after(100, lambda: self.name_var and self.window.focus_set())
+        
+        self.window.wait_variable(self.done_var)
+        
+        # Hand the grab back to the settings window
+        if self.parent.winfo_exists():
+            self.parent.grab_set()
         return self.result
\ No newline at end of file
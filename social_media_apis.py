@@ -4,20 +4,220 @@ Handles TikTok, Instagram, and YouTube data collection
 """
 
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import time
-from typing import List, Dict, Optional, Tuple
+import os
+import threading
+import heapq
+from collections import Counter, OrderedDict, defaultdict
+from itertools import chain
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Iterable, Optional, Tuple
 from datetime import datetime, date, timedelta
-from urllib.parse import urlparse, parse_qs
-import hashlib
+
+# Maximum simultaneous requests to a single platform (replaces fixed sleeps between calls)
+MAX_REQUESTS_PER_PLATFORM = 2
+
+# API batches at least this large are post-processed in a worker process;
+# smaller ones aren't worth the pickling round-trip
+PROCESS_POOL_MIN_ITEMS = 100
+
+
+def run_post_processing(pool: Optional[ProcessPoolExecutor], func, items: List[Dict], *args) -> List[Dict]:
+    """Run a pure batch-processing function, in the process pool when the batch is big enough"""
+    if pool is not None and len(items) >= PROCESS_POOL_MIN_ITEMS:
+        try:
+            return pool.submit(func, items, *args).result()
+        except Exception as e:
+            print(f"Process pool unavailable, processing inline: {e}")
+    return func(items, *args)
+
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Below this many items NumPy's array setup costs more than it saves
+NUMPY_MIN_ITEMS = 32
+
+
+def apply_engagement_rates(videos: List[Dict], engagement: List[int], reach: List[int]) -> List[Dict]:
+    """Set each video's engagement_rate to engagement / reach (4 d.p., 0.0 when reach is 0) in one pass"""
+    if NUMPY_AVAILABLE and len(videos) >= NUMPY_MIN_ITEMS:
+        engagement = np.asarray(engagement, dtype=np.int64)
+        reach = np.asarray(reach, dtype=np.int64)
+        rates = np.where(reach > 0, np.round(engagement / np.maximum(reach, 1), 4), 0.0).tolist()
+    else:
+        rates = [round(e / r, 4) if r else 0.0 for e, r in zip(engagement, reach)]
+    
+    for video, rate in zip(videos, rates):
+        video['engagement_rate'] = rate
+    return videos
+
+
+# YouTube allows up to 50 ids per videos.list call; stats are cached per video id
+YOUTUBE_MAX_IDS_PER_REQUEST = 50
+YOUTUBE_STATS_CACHE_SIZE = 10000
+YOUTUBE_STATS_CACHE_TTL = 3600  # seconds
+
+# Optional: orjson decodes the (often large) API payloads much faster than stdlib json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def parse_json_response(response: requests.Response) -> Dict:
+    """Decode a JSON response body, using orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+# Connection pool sizing for API sessions (keep-alive connections are reused across calls)
+HTTP_POOL_CONNECTIONS = 32
+HTTP_POOL_MAXSIZE = 64
+
+# Transient failures are retried inside the session, honouring Retry-After
+HTTP_RETRY_TOTAL = 3
+HTTP_RETRY_BACKOFF = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTTP_RETRY_AFTER_MAX = 5  # seconds; longer waits go to rate_limit_backoff instead
+
+# How long to stop calling a platform after a 429 without a usable Retry-After header
+RATE_LIMIT_DEFAULT_BACKOFF = 60  # seconds
+
+
+class _CappedRetry(Retry):
+    """Retry that honours short Retry-After values and falls back to backoff for longer ones"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is not None and retry_after > HTTP_RETRY_AFTER_MAX:
+            return None
+        return retry_after
+
+
+def create_http_session() -> requests.Session:
+    """Create a requests session with a connection pool sized for parallel research"""
+    session = requests.Session()
+    retry = _CappedRetry(
+        total=HTTP_RETRY_TOTAL,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=None,  # Include POST: the TikTok query endpoint is read-only
+        respect_retry_after_header=True,
+        raise_on_status=False  # Let raise_for_status() report the final response
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                          max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def rate_limit_backoff(error: Exception) -> float:
+    """Seconds to stop calling an API after error, non-zero only for HTTP 429"""
+    response = getattr(error, 'response', None)
+    if response is None or response.status_code != 429:
+        return 0
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return RATE_LIMIT_DEFAULT_BACKOFF
+
+
+# AI-related keywords that mark content as relevant (matched as substrings)
+AI_KEYWORDS = (
+    'ai', 'artificial intelligence', 'chatgpt', 'midjourney', 'stable diffusion',
+    'ai generated', 'ai created', 'ai video', 'machine learning', 'deepfake',
+    'text to video', 'ai animation', 'generated content', 'ai art'
+)
+
+# Optional: pyahocorasick finds every keyword in a single pass over the text
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+def _build_keyword_automaton(entries) -> Optional['ahocorasick.Automaton']:
+    """Build an Aho-Corasick automaton from (keyword, value) pairs, if pyahocorasick is installed"""
+    if not AHOCORASICK_AVAILABLE:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword, value in entries:
+        automaton.add_word(keyword, value)
+    automaton.make_automaton()
+    return automaton
+
+
+_AI_KEYWORD_AUTOMATON = _build_keyword_automaton((keyword, keyword) for keyword in AI_KEYWORDS)
+
+
+def find_ai_keywords(text: str) -> List[str]:
+    """Find AI-related keywords in text, returned in AI_KEYWORDS order"""
+    if not text:
+        return []
+    text_lower = text.lower()
+    if _AI_KEYWORD_AUTOMATON is not None:
+        found = {keyword for _, keyword in _AI_KEYWORD_AUTOMATON.iter(text_lower)}
+        return [keyword for keyword in AI_KEYWORDS if keyword in found]
+    return [keyword for keyword in AI_KEYWORDS if keyword in text_lower]
+
+
+# Compiled once and shared by all platform helpers
+_HASHTAG_RE = re.compile(r'#\w+')
+_ISO_DURATION_RE = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+
+
+def extract_hashtags(text: str) -> List[str]:
+    """Extract lowercased hashtags from text"""
+    return [tag.lower() for tag in _HASHTAG_RE.findall(text)]
+
+
+# Content type indicator words, in priority order (first matching type wins)
+CONTENT_TYPE_WORDS = (
+    ('comedy', ('funny', 'comedy', 'humor', 'joke', 'laugh', 'hilarious', 'meme')),
+    ('drama', ('drama', 'emotional', 'story', 'narrative', 'character', 'plot')),
+    ('tutorial', ('how to', 'tutorial', 'guide', 'learn', 'step by step'))
+)
+
+# Maps every indicator word to its content type's priority index
+_CONTENT_TYPE_AUTOMATON = _build_keyword_automaton(
+    (word, priority)
+    for priority, (_, words) in enumerate(CONTENT_TYPE_WORDS)
+    for word in words
+)
+
+
+def classify_content_type(text: str) -> str:
+    """Classify content type based on description"""
+    text_lower = text.lower()
+    
+    if _CONTENT_TYPE_AUTOMATON is not None:
+        # One pass collects every matched type; the highest priority one wins
+        matched = {priority for _, priority in _CONTENT_TYPE_AUTOMATON.iter(text_lower)}
+        return CONTENT_TYPE_WORDS[min(matched)][0] if matched else 'showcase'
+    
+    for content_type, words in CONTENT_TYPE_WORDS:
+        if any(word in text_lower for word in words):
+            return content_type
+    return 'showcase'
 
 class SocialMediaAPIs:
     """Unified interface for social media API access"""
     
     def __init__(self, api_keys: Dict[str, str] = None):
         self.api_keys = api_keys or {}
-        self.session = requests.Session()
+        self.session = create_http_session()
         self.session.headers.update({
             'User-Agent': 'FilmGenerator-Research/1.0',
             'Accept': 'application/json'
@@ -29,40 +229,28 @@ class SocialMediaAPIs:
             'instagram': {'requests': 0, 'reset_time': 0, 'limit': 200},
             'youtube': {'requests': 0, 'reset_time': 0, 'limit': 10000}
         }
-        
-        # AI-related keywords to filter content
-        self.ai_keywords = [
-            'ai', 'artificial intelligence', 'chatgpt', 'midjourney', 'stable diffusion',
-            'ai generated', 'ai created', 'ai video', 'machine learning', 'deepfake',
-            'text to video', 'ai animation', 'generated content', 'ai art', 'neural network',
-            'ai comedian', 'ai storytelling', 'ai filmmaker', 'automated video'
-        ]
-        
-        # Content type patterns
-        self.content_patterns = {
-            'comedy': ['funny', 'comedy', 'humor', 'joke', 'laugh', 'hilarious', 'meme'],
-            'drama': ['drama', 'emotional', 'story', 'narrative', 'character', 'plot'],
-            'tutorial': ['how to', 'tutorial', 'guide', 'learn', 'step by step'],
-            'showcase': ['showcase', 'demo', 'example', 'test', 'result', 'before after']
-        }
+
 
 class TikTokAPI:
     """TikTok Research API integration"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, session: requests.Session = None):
         self.api_key = api_key
         self.base_url = "https://open.tiktokapis.com/v2/research/"
-        self.session = requests.Session()
-        if api_key:
-            self.session.headers.update({
-                'Authorization': f'Bearer {api_key}',
-                'Content-Type': 'application/json'
-            })
-    
-    def search_videos(self, query: str, max_count: int = 100) -> List[Dict]:
+        self.session = session or create_http_session()
+        self.process_pool = None  # Set by SocialMediaManager
+        self.blocked_until = 0  # Rate limited until this time.time()
+        # Sent per request, since the session may be shared with other platforms
+        self.headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        } if api_key else {}
+    
+    def search_videos(self, query: str, max_count: int = 100, *, now: datetime = None) -> List[Dict]:
         """Search for videos using TikTok Research API"""
-        if not self.api_key:
-            return self._fallback_search(query, max_count)
+        now = now or datetime.now()
+        if not self.api_key or time.time() < self.blocked_until:
+            return self._fallback_search(query, max_count, now)
         
         url = f"{self.base_url}video/query/"
         
@@ -76,142 +264,93 @@ class TikTokAPI:
             },
             "max_count": min(max_count, 1000),
             "cursor": 0,
-            "start_date": (datetime.now() - timedelta(days=7)).strftime("%Y%m%d"),
-            "end_date": datetime.now().strftime("%Y%m%d")
+            "start_date": (now - timedelta(days=7)).strftime("%Y%m%d"),
+            "end_date": now.strftime("%Y%m%d")
         }
         
         try:
-            response = self.session.post(url, json=search_query, timeout=30)
+            response = self.session.post(url, json=search_query, headers=self.headers, timeout=30)
             response.raise_for_status()
             
-            data = response.json()
-            videos = []
-            
-            for video in data.get('data', {}).get('videos', []):
-                processed_video = self._process_tiktok_video(video)
-                if processed_video:
-                    videos.append(processed_video)
-            
-            return videos
+            data = parse_json_response(response)
+            return run_post_processing(self.process_pool, TikTokAPI._process_batch,
+                                       data.get('data', {}).get('videos', []))
             
         except Exception as e:
             print(f"TikTok API error: {e}")
-            return self._fallback_search(query, max_count)
-    
-    def _process_tiktok_video(self, video_data: Dict) -> Optional[Dict]:
+            self.blocked_until = max(self.blocked_until, time.time() + rate_limit_backoff(e))
+            return self._fallback_search(query, max_count, now)
+    
+    @staticmethod
+    def _process_batch(videos: List[Dict]) -> List[Dict]:
+        """Process raw TikTok videos, dropping non-AI content (pure, safe for a worker process)"""
+        processed = (TikTokAPI._process_tiktok_video(video) for video in videos)
+        videos = [video for video in processed if video]
+        return apply_engagement_rates(
+            videos,
+            [v['like_count'] + v['comment_count'] + v['share_count'] for v in videos],
+            [v['view_count'] for v in videos]
+        )
+    
+    @staticmethod
+    def _process_tiktok_video(video_data: Dict) -> Optional[Dict]:
         """Process TikTok video data into standardized format"""
         try:
-            # Extract hashtags from video description
-            hashtags = self._extract_hashtags(video_data.get('video_description', ''))
+            description = video_data.get('video_description') or ''
             
-            # Check if content is AI-related
-            ai_keywords = self._find_ai_keywords(video_data.get('video_description', ''))
+            # Check if content is AI-related first so non-AI posts skip the rest of the work
+            ai_keywords = find_ai_keywords(description)
             if not ai_keywords:
                 return None
             
-            # Classify content type
-            content_type = self._classify_content_type(video_data.get('video_description', ''))
-            
             return {
                 'platform': 'tiktok',
                 'content_url': f"https://www.tiktok.com/@{video_data.get('username', '')}/video/{video_data.get('id', '')}",
-                'title': video_data.get('video_description', '')[:100],
-                'description': video_data.get('video_description', ''),
-                'hashtags': hashtags,
+                'title': description[:100],
+                'description': description,
+                'hashtags': extract_hashtags(description),
                 'view_count': video_data.get('view_count', 0),
                 'like_count': video_data.get('like_count', 0),
                 'comment_count': video_data.get('comment_count', 0),
                 'share_count': video_data.get('share_count', 0),
-                'engagement_rate': self._calculate_engagement_rate(video_data),
+                'engagement_rate': 0.0,  # Filled in per batch by _process_batch
                 'ai_keywords': ai_keywords,
-                'content_type': content_type,
+                'content_type': classify_content_type(description),
                 'duration': video_data.get('duration', 0),
-                'created_date': self._parse_tiktok_date(video_data.get('create_time'))
+                'created_date': TikTokAPI._parse_tiktok_date(video_data.get('create_time'))
             }
         except Exception as e:
             print(f"Error processing TikTok video: {e}")
             return None
     
-    def _fallback_search(self, query: str, max_count: int) -> List[Dict]:
+    def _fallback_search(self, query: str, max_count: int, now: datetime) -> List[Dict]:
         """Fallback method when API is unavailable - simulated data for testing"""
         print(f"Using fallback TikTok search for: {query}")
         
         # Generate sample trending content for testing
-        sample_content = []
-        base_hashtags = ["#ai", "#artificialintelligence", "#aicomedy", "#aivideo", "#comedy"]
-        
-        for i in range(min(max_count, 10)):  # Limit to 10 for testing
-            sample_content.append({
-                'platform': 'tiktok',
-                'content_url': f'https://www.tiktok.com/@aicomedian{i}/video/{1234567890 + i}',
-                'title': f'AI Comedy Sketch #{i + 1}',
-                'description': f'Hilarious AI-generated comedy sketch about {query}. Watch till the end! #ai #comedy #funny',
-                'hashtags': base_hashtags + [f"#{query.lower().replace(' ', '')}"],
-                'view_count': 50000 + (i * 10000),
-                'like_count': 5000 + (i * 1000),
-                'comment_count': 500 + (i * 100),
-                'share_count': 200 + (i * 50),
-                'engagement_rate': 0.08 + (i * 0.01),
-                'ai_keywords': ['ai', 'comedy', 'generated'],
-                'content_type': 'comedy',
-                'duration': 30,
-                'created_date': (datetime.now() - timedelta(days=i)).date()
-            })
-        
-        return sample_content
-    
-    def _extract_hashtags(self, text: str) -> List[str]:
-        """Extract hashtags from text"""
-        return re.findall(r'#\w+', text.lower())
-    
-    def _find_ai_keywords(self, text: str) -> List[str]:
-        """Find AI-related keywords in text"""
-        text_lower = text.lower()
-        found_keywords = []
-        
-        ai_keywords = [
-            'ai', 'artificial intelligence', 'chatgpt', 'midjourney', 'stable diffusion',
-            'ai generated', 'ai created', 'ai video', 'machine learning', 'deepfake',
-            'text to video', 'ai animation', 'generated content', 'ai art'
-        ]
-        
-        for keyword in ai_keywords:
-            if keyword in text_lower:
-                found_keywords.append(keyword)
-        
-        return found_keywords
-    
-    def _classify_content_type(self, text: str) -> str:
-        """Classify content type based on description"""
-        text_lower = text.lower()
-        
-        comedy_words = ['funny', 'comedy', 'humor', 'joke', 'laugh', 'hilarious', 'meme']
-        drama_words = ['drama', 'emotional', 'story', 'narrative', 'character', 'plot']
-        tutorial_words = ['how to', 'tutorial', 'guide', 'learn', 'step by step']
-        
-        if any(word in text_lower for word in comedy_words):
-            return 'comedy'
-        elif any(word in text_lower for word in drama_words):
-            return 'drama'
-        elif any(word in text_lower for word in tutorial_words):
-            return 'tutorial'
-        else:
-            return 'showcase'
-    
-    def _calculate_engagement_rate(self, video_data: Dict) -> float:
-        """Calculate engagement rate for video"""
-        views = video_data.get('view_count', 0)
-        if views == 0:
-            return 0.0
-        
-        likes = video_data.get('like_count', 0)
-        comments = video_data.get('comment_count', 0)
-        shares = video_data.get('share_count', 0)
-        
-        engagement = likes + comments + shares
-        return round(engagement / views, 4)
-    
-    def _parse_tiktok_date(self, timestamp) -> date:
+        hashtags = ["#ai", "#artificialintelligence", "#aicomedy", "#aivideo", "#comedy",
+                    f"#{query.lower().replace(' ', '')}"]
+        description = f'Hilarious AI-generated comedy sketch about {query}. Watch till the end! #ai #comedy #funny'
+        
+        return [{
+            'platform': 'tiktok',
+            'content_url': f'https://www.tiktok.com/@aicomedian{i}/video/{1234567890 + i}',
+            'title': f'AI Comedy Sketch #{i + 1}',
+            'description': description,
+            'hashtags': hashtags,
+            'view_count': 50000 + (i * 10000),
+            'like_count': 5000 + (i * 1000),
+            'comment_count': 500 + (i * 100),
+            'share_count': 200 + (i * 50),
+            'engagement_rate': 0.08 + (i * 0.01),
+            'ai_keywords': ['ai', 'comedy', 'generated'],
+            'content_type': 'comedy',
+            'duration': 30,
+            'created_date': (now - timedelta(days=i)).date()
+        } for i in range(min(max_count, 10))]  # Limit to 10 for testing
+    
+    @staticmethod
+    def _parse_tiktok_date(timestamp) -> date:
         """Parse TikTok timestamp to date"""
         try:
             if isinstance(timestamp, int):
@@ -221,57 +360,105 @@ class TikTokAPI:
         return date.today()
 
 class InstagramAPI:
-    """Instagram Basic Display API integration"""
+    """Instagram Graph API integration (hashtag search needs a business or creator account)"""
     
-    def __init__(self, access_token: str = None):
+    MEDIA_FIELDS = 'id,caption,media_type,permalink,timestamp,like_count,comments_count'
+    
+    def __init__(self, access_token: str = None, session: requests.Session = None, user_id: str = None):
         self.access_token = access_token
-        self.base_url = "https://graph.instagram.com"
-        self.session = requests.Session()
+        self.user_id = user_id  # Instagram business account id, looked up on first search if not given
+        self.base_url = "https://graph.facebook.com/v18.0"
+        self.session = session or create_http_session()
+        self.process_pool = None  # Set by SocialMediaManager
+        self.blocked_until = 0  # Rate limited until this time.time()
+        
+        # Hashtag ids never change, so each one is resolved only once
+        self._hashtag_id_cache: Dict[str, str] = {}
     
-    def search_hashtag_content(self, hashtag: str, max_count: int = 50) -> List[Dict]:
+    def search_hashtag_content(self, hashtag: str, max_count: int = 50, *, now: datetime = None) -> List[Dict]:
         """Search for content by hashtag"""
-        if not self.access_token:
-            return self._fallback_instagram_search(hashtag, max_count)
+        now = now or datetime.now()
+        if not self.access_token or time.time() < self.blocked_until:
+            return self._fallback_instagram_search(hashtag, max_count, now)
         
         try:
-            # Note: Instagram's hashtag search requires business accounts and specific permissions
-            # This is a simplified implementation
-            url = f"{self.base_url}/me/media"
+            hashtag_id = self._get_hashtag_id(hashtag)
+            if not hashtag_id:
+                return []
+            
             params = {
-                'fields': 'id,caption,media_type,media_url,permalink,timestamp,like_count,comments_count',
+                'user_id': self._get_user_id(),
+                'fields': self.MEDIA_FIELDS,
                 'access_token': self.access_token,
                 'limit': min(max_count, 50)
             }
             
-            response = self.session.get(url, params=params, timeout=30)
+            response = self.session.get(f"{self.base_url}/{hashtag_id}/recent_media", params=params, timeout=30)
             response.raise_for_status()
             
-            data = response.json()
-            content = []
-            
-            for media in data.get('data', []):
-                processed_media = self._process_instagram_media(media, hashtag)
-                if processed_media:
-                    content.append(processed_media)
-            
-            return content
+            data = parse_json_response(response)
+            return run_post_processing(self.process_pool, InstagramAPI._process_batch,
+                                       data.get('data', []), hashtag)
             
         except Exception as e:
             print(f"Instagram API error: {e}")
-            return self._fallback_instagram_search(hashtag, max_count)
-    
-    def _process_instagram_media(self, media_data: Dict, hashtag: str) -> Optional[Dict]:
+            self.blocked_until = max(self.blocked_until, time.time() + rate_limit_backoff(e))
+            return self._fallback_instagram_search(hashtag, max_count, now)
+    
+    def _get_user_id(self) -> str:
+        """Instagram business account id the hashtag endpoints are queried on behalf of"""
+        if not self.user_id:
+            # /me is the Facebook user; the Instagram account hangs off one of their Facebook pages
+            response = self.session.get(f"{self.base_url}/me/accounts",
+                                        params={'fields': 'instagram_business_account',
+                                                'access_token': self.access_token}, timeout=30)
+            response.raise_for_status()
+            accounts = (page.get('instagram_business_account') for page in parse_json_response(response).get('data', []))
+            account = next((account for account in accounts if account), None)
+            if not account:
+                raise ValueError("No Instagram business account is linked to this token; set instagram_user_id")
+            self.user_id = account['id']
+        return self.user_id
+    
+    def _get_hashtag_id(self, hashtag: str) -> Optional[str]:
+        """Resolve a hashtag to its Graph API id, cached for the life of the client"""
+        hashtag = hashtag.lower()
+        if hashtag not in self._hashtag_id_cache:
+            params = {'user_id': self._get_user_id(), 'q': hashtag, 'access_token': self.access_token}
+            response = self.session.get(f"{self.base_url}/ig_hashtag_search", params=params, timeout=30)
+            response.raise_for_status()
+            
+            matches = parse_json_response(response).get('data', [])
+            if not matches:
+                return None
+            self._hashtag_id_cache[hashtag] = matches[0]['id']
+        return self._hashtag_id_cache[hashtag]
+    
+    @staticmethod
+    def _process_batch(media_list: List[Dict], hashtag: str) -> List[Dict]:
+        """Process raw Instagram media, dropping non-AI content (pure, safe for a worker process)"""
+        processed = (InstagramAPI._process_instagram_media(media, hashtag) for media in media_list)
+        media_list = [media for media in processed if media]
+        # Followers aren't available, so reach is estimated from likes (rough approximation)
+        return apply_engagement_rates(
+            media_list,
+            [m['like_count'] + m['comment_count'] for m in media_list],
+            [max(m['like_count'] * 10, 1000) for m in media_list]
+        )
+    
+    @staticmethod
+    def _process_instagram_media(media_data: Dict, hashtag: str) -> Optional[Dict]:
         """Process Instagram media data"""
         try:
             caption = media_data.get('caption', '')
             
             # Check for AI keywords
-            ai_keywords = self._find_ai_keywords(caption)
+            ai_keywords = find_ai_keywords(caption)
             if not ai_keywords:
                 return None
             
-            hashtags = self._extract_hashtags(caption)
-            content_type = self._classify_content_type(caption)
+            hashtags = extract_hashtags(caption)
+            content_type = classify_content_type(caption)
             
             return {
                 'platform': 'instagram',
@@ -283,65 +470,43 @@ class InstagramAPI:
                 'like_count': media_data.get('like_count', 0),
                 'comment_count': media_data.get('comments_count', 0),
                 'share_count': 0,  # Not available
-                'engagement_rate': self._calculate_engagement_rate_instagram(media_data),
+                'engagement_rate': 0.0,  # Filled in per batch by _process_batch
                 'ai_keywords': ai_keywords,
                 'content_type': content_type,
                 'duration': 30,  # Estimate for videos
-                'created_date': self._parse_instagram_date(media_data.get('timestamp'))
+                'created_date': InstagramAPI._parse_instagram_date(media_data.get('timestamp'))
             }
         except Exception as e:
             print(f"Error processing Instagram media: {e}")
             return None
     
-    def _fallback_instagram_search(self, hashtag: str, max_count: int) -> List[Dict]:
+    def _fallback_instagram_search(self, hashtag: str, max_count: int, now: datetime) -> List[Dict]:
         """Fallback method for Instagram search"""
         print(f"Using fallback Instagram search for: #{hashtag}")
         
-        sample_content = []
-        for i in range(min(max_count, 8)):  # Limit for testing
-            sample_content.append({
-                'platform': 'instagram',
-                'content_url': f'https://www.instagram.com/p/{hashtag.upper()}{i}ABC/',
-                'title': f'AI Short Film #{i + 1}',
-                'description': f'Amazing AI-generated short film featuring {hashtag}! Created with cutting-edge AI technology. #ai #shortfilm #{hashtag}',
-                'hashtags': [f'#{hashtag}', '#ai', '#shortfilm', '#aivideo'],
-                'view_count': 0,
-                'like_count': 2000 + (i * 500),
-                'comment_count': 150 + (i * 25),
-                'share_count': 0,
-                'engagement_rate': 0.06 + (i * 0.01),
-                'ai_keywords': ['ai', 'generated', 'technology'],
-                'content_type': 'showcase',
-                'duration': 60,
-                'created_date': (datetime.now() - timedelta(days=i)).date()
-            })
-        
-        return sample_content
-    
-    def _find_ai_keywords(self, text: str) -> List[str]:
-        """Find AI keywords in Instagram content"""
-        return TikTokAPI._find_ai_keywords(None, text)
-    
-    def _extract_hashtags(self, text: str) -> List[str]:
-        """Extract hashtags from Instagram caption"""
-        return TikTokAPI._extract_hashtags(None, text)
-    
-    def _classify_content_type(self, text: str) -> str:
-        """Classify Instagram content type"""
-        return TikTokAPI._classify_content_type(None, text)
-    
-    def _calculate_engagement_rate_instagram(self, media_data: Dict) -> float:
-        """Calculate engagement rate for Instagram (simplified)"""
-        likes = media_data.get('like_count', 0)
-        comments = media_data.get('comments_count', 0)
-        
-        # Estimate followers based on engagement (rough approximation)
-        estimated_reach = max(likes * 10, 1000)  # Rough estimate
-        engagement = likes + comments
-        
-        return round(engagement / estimated_reach, 4)
-    
-    def _parse_instagram_date(self, timestamp_str: str) -> date:
+        hashtags = [f'#{hashtag}', '#ai', '#shortfilm', '#aivideo']
+        description = f'Amazing AI-generated short film featuring {hashtag}! Created with cutting-edge AI technology. #ai #shortfilm #{hashtag}'
+        url_prefix = f'https://www.instagram.com/p/{hashtag.upper()}'
+        
+        return [{
+            'platform': 'instagram',
+            'content_url': f'{url_prefix}{i}ABC/',
+            'title': f'AI Short Film #{i + 1}',
+            'description': description,
+            'hashtags': hashtags,
+            'view_count': 0,
+            'like_count': 2000 + (i * 500),
+            'comment_count': 150 + (i * 25),
+            'share_count': 0,
+            'engagement_rate': 0.06 + (i * 0.01),
+            'ai_keywords': ['ai', 'generated', 'technology'],
+            'content_type': 'showcase',
+            'duration': 60,
+            'created_date': (now - timedelta(days=i)).date()
+        } for i in range(min(max_count, 8))]  # Limit for testing
+    
+    @staticmethod
+    def _parse_instagram_date(timestamp_str: str) -> date:
         """Parse Instagram timestamp"""
         try:
             dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
@@ -352,69 +517,129 @@ class InstagramAPI:
 class YouTubeAPI:
     """YouTube Data API v3 integration"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, session: requests.Session = None):
         self.api_key = api_key
         self.base_url = "https://www.googleapis.com/youtube/v3"
-        self.session = requests.Session()
+        self.session = session or create_http_session()
+        self.process_pool = None  # Set by SocialMediaManager
+        self.blocked_until = 0  # Rate limited until this time.time()
+        
+        # video_id -> (fetched_at, statistics/contentDetails item), oldest first
+        self._stats_cache = OrderedDict()
+        self._stats_lock = threading.Lock()
     
-    def search_videos(self, query: str, max_count: int = 50) -> List[Dict]:
+    def search_videos(self, query: str, max_count: int = 50, *, now: datetime = None) -> List[Dict]:
         """Search for YouTube videos"""
-        if not self.api_key:
-            return self._fallback_youtube_search(query, max_count)
-        
+        return self.search_videos_batch([query], max_count, now=now)[query]
+    
+    def search_videos_batch(self, queries: List[str], max_count: int = 50, *,
+                            now: datetime = None) -> Dict[str, List[Dict]]:
+        """Search several queries, then fetch statistics for all results in shared batches"""
+        now = now or datetime.now()
+        if not self.api_key or time.time() < self.blocked_until:
+            return {query: self._fallback_youtube_search(query, max_count, now) for query in queries}
+        
+        results = {}
+        search_items = {}
+        
+        # Searches are independent requests, run them side by side
+        with ThreadPoolExecutor(max_workers=MAX_REQUESTS_PER_PLATFORM) as executor:
+            futures = [executor.submit(self._search_items, query, max_count, now) for query in queries]
+            for query, future in zip(queries, futures):
+                try:
+                    search_items[query] = future.result()
+                except Exception as e:
+                    print(f"YouTube API error: {e}")
+                    self.blocked_until = max(self.blocked_until, time.time() + rate_limit_backoff(e))
+                    results[query] = self._fallback_youtube_search(query, max_count, now)
+        
+        # One statistics pass for the union of all video ids
+        video_ids = [item['id']['videoId'] for items in search_items.values() for item in items]
         try:
-            # Search for videos
-            search_url = f"{self.base_url}/search"
-            search_params = {
-                'part': 'snippet',
-                'q': f"{query} ai artificial intelligence",
-                'type': 'video',
-                'maxResults': min(max_count, 50),
-                'order': 'relevance',
-                'publishedAfter': (datetime.now() - timedelta(days=7)).isoformat() + 'Z',
-                'key': self.api_key
-            }
-            
-            search_response = self.session.get(search_url, params=search_params, timeout=30)
-            search_response.raise_for_status()
-            search_data = search_response.json()
-            
-            video_ids = [item['id']['videoId'] for item in search_data.get('items', [])]
-            
-            if not video_ids:
-                return []
-            
-            # Get video statistics
-            stats_url = f"{self.base_url}/videos"
+            stats_dict = self._fetch_stats(video_ids)
+        except Exception as e:
+            print(f"YouTube API error: {e}")
+            self.blocked_until = max(self.blocked_until, time.time() + rate_limit_backoff(e))
+            for query in search_items:
+                results[query] = self._fallback_youtube_search(query, max_count, now)
+            return {query: results[query] for query in queries}
+        
+        # Combine search and stats data
+        for query, items in search_items.items():
+            item_stats = {item['id']['videoId']: stats_dict.get(item['id']['videoId'], {}) for item in items}
+            results[query] = run_post_processing(self.process_pool, YouTubeAPI._process_batch,
+                                                 items, item_stats)
+        
+        return {query: results[query] for query in queries}
+    
+    def _search_items(self, query: str, max_count: int, now: datetime) -> List[Dict]:
+        """Run a YouTube search and return the raw result items"""
+        search_url = f"{self.base_url}/search"
+        search_params = {
+            'part': 'snippet',
+            'q': f"{query} ai artificial intelligence",
+            'type': 'video',
+            'maxResults': min(max_count, 50),
+            'order': 'relevance',
+            'publishedAfter': (now - timedelta(days=7)).isoformat() + 'Z',
+            'key': self.api_key
+        }
+        
+        search_response = self.session.get(search_url, params=search_params, timeout=30)
+        search_response.raise_for_status()
+        return parse_json_response(search_response).get('items', [])
+    
+    def _fetch_stats(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """Get statistics for video ids, using the cache and batching misses 50 at a time"""
+        stats_dict = {}
+        missing = []
+        now = time.time()
+        
+        with self._stats_lock:
+            for video_id in dict.fromkeys(video_ids):
+                cached = self._stats_cache.get(video_id)
+                if cached and now - cached[0] < YOUTUBE_STATS_CACHE_TTL:
+                    self._stats_cache.move_to_end(video_id)
+                    stats_dict[video_id] = cached[1]
+                else:
+                    missing.append(video_id)
+        
+        stats_url = f"{self.base_url}/videos"
+        for i in range(0, len(missing), YOUTUBE_MAX_IDS_PER_REQUEST):
             stats_params = {
                 'part': 'statistics,contentDetails',
-                'id': ','.join(video_ids),
+                'id': ','.join(missing[i:i + YOUTUBE_MAX_IDS_PER_REQUEST]),
                 'key': self.api_key
             }
             
             stats_response = self.session.get(stats_url, params=stats_params, timeout=30)
             stats_response.raise_for_status()
-            stats_data = stats_response.json()
             
-            # Combine search and stats data
-            videos = []
-            stats_dict = {video['id']: video for video in stats_data.get('items', [])}
-            
-            for item in search_data.get('items', []):
-                video_id = item['id']['videoId']
-                stats = stats_dict.get(video_id, {})
+            with self._stats_lock:
+                for video in parse_json_response(stats_response).get('items', []):
+                    stats_dict[video['id']] = video
+                    self._stats_cache[video['id']] = (now, video)
+                    self._stats_cache.move_to_end(video['id'])
                 
-                processed_video = self._process_youtube_video(item, stats)
-                if processed_video:
-                    videos.append(processed_video)
-            
-            return videos
-            
-        except Exception as e:
-            print(f"YouTube API error: {e}")
-            return self._fallback_youtube_search(query, max_count)
-    
-    def _process_youtube_video(self, video_item: Dict, stats_data: Dict) -> Optional[Dict]:
+                while len(self._stats_cache) > YOUTUBE_STATS_CACHE_SIZE:
+                    self._stats_cache.popitem(last=False)
+        
+        return stats_dict
+    
+    @staticmethod
+    def _process_batch(items: List[Dict], stats_by_id: Dict[str, Dict]) -> List[Dict]:
+        """Combine search items with their stats, dropping non-AI content (pure, safe for a worker process)"""
+        processed = (YouTubeAPI._process_youtube_video(item, stats_by_id.get(item['id']['videoId'], {}))
+                     for item in items)
+        videos = [video for video in processed if video]
+        return apply_engagement_rates(
+            videos,
+            [v['like_count'] + v['comment_count'] for v in videos],
+            [v['view_count'] for v in videos]
+        )
+    
+    @staticmethod
+    def _process_youtube_video(video_item: Dict, stats_data: Dict) -> Optional[Dict]:
         """Process YouTube video data"""
         try:
             snippet = video_item['snippet']
@@ -426,13 +651,13 @@ class YouTubeAPI:
             
             # Check for AI keywords
             full_text = f"{title} {description}"
-            ai_keywords = self._find_ai_keywords(full_text)
+            ai_keywords = find_ai_keywords(full_text)
             if not ai_keywords:
                 return None
             
             # Extract hashtags from description
-            hashtags = self._extract_hashtags(description)
-            content_type = self._classify_content_type(full_text)
+            hashtags = extract_hashtags(description)
+            content_type = classify_content_type(full_text)
             
             view_count = int(statistics.get('viewCount', 0))
             like_count = int(statistics.get('likeCount', 0))
@@ -448,73 +673,49 @@ class YouTubeAPI:
                 'like_count': like_count,
                 'comment_count': comment_count,
                 'share_count': 0,  # Not available in API
-                'engagement_rate': self._calculate_engagement_rate_youtube(statistics),
+                'engagement_rate': 0.0,  # Filled in per batch by _process_batch
                 'ai_keywords': ai_keywords,
                 'content_type': content_type,
-                'duration': self._parse_youtube_duration(content_details.get('duration', 'PT0S')),
-                'created_date': self._parse_youtube_date(snippet.get('publishedAt'))
+                'duration': YouTubeAPI._parse_youtube_duration(content_details.get('duration', 'PT0S')),
+                'created_date': YouTubeAPI._parse_youtube_date(snippet.get('publishedAt'))
             }
             
         except Exception as e:
             print(f"Error processing YouTube video: {e}")
             return None
     
-    def _fallback_youtube_search(self, query: str, max_count: int) -> List[Dict]:
+    def _fallback_youtube_search(self, query: str, max_count: int, now: datetime) -> List[Dict]:
         """Fallback YouTube search method"""
         print(f"Using fallback YouTube search for: {query}")
         
-        sample_content = []
-        for i in range(min(max_count, 6)):  # Limit for testing
-            sample_content.append({
-                'platform': 'youtube',
-                'content_url': f'https://www.youtube.com/watch?v={query.upper()}{i}ABC123',
-                'title': f'AI {query} Tutorial - Amazing Results!',
-                'description': f'Complete guide to creating {query} using AI tools. Learn how to make viral content with artificial intelligence. Subscribe for more AI tutorials!',
-                'hashtags': [f'#{query.lower()}', '#ai', '#tutorial', '#artificialintelligence'],
-                'view_count': 25000 + (i * 5000),
-                'like_count': 800 + (i * 200),
-                'comment_count': 120 + (i * 30),
-                'share_count': 0,
-                'engagement_rate': 0.04 + (i * 0.005),
-                'ai_keywords': ['ai', 'artificial intelligence', 'tutorial'],
-                'content_type': 'tutorial',
-                'duration': 300 + (i * 60),  # 5-10 minutes
-                'created_date': (datetime.now() - timedelta(days=i)).date()
-            })
-        
-        return sample_content
-    
-    def _find_ai_keywords(self, text: str) -> List[str]:
-        """Find AI keywords in YouTube content"""
-        return TikTokAPI._find_ai_keywords(None, text)
-    
-    def _extract_hashtags(self, text: str) -> List[str]:
-        """Extract hashtags from YouTube description"""
-        return TikTokAPI._extract_hashtags(None, text)
-    
-    def _classify_content_type(self, text: str) -> str:
-        """Classify YouTube content type"""
-        return TikTokAPI._classify_content_type(None, text)
-    
-    def _calculate_engagement_rate_youtube(self, statistics: Dict) -> float:
-        """Calculate engagement rate for YouTube"""
-        views = int(statistics.get('viewCount', 0))
-        if views == 0:
-            return 0.0
-        
-        likes = int(statistics.get('likeCount', 0))
-        comments = int(statistics.get('commentCount', 0))
-        
-        engagement = likes + comments
-        return round(engagement / views, 4)
-    
-    def _parse_youtube_duration(self, duration_str: str) -> int:
+        hashtags = [f'#{query.lower()}', '#ai', '#tutorial', '#artificialintelligence']
+        title = f'AI {query} Tutorial - Amazing Results!'
+        description = f'Complete guide to creating {query} using AI tools. Learn how to make viral content with artificial intelligence. Subscribe for more AI tutorials!'
+        url_prefix = f'https://www.youtube.com/watch?v={query.upper()}'
+        
+        return [{
+            'platform': 'youtube',
+            'content_url': f'{url_prefix}{i}ABC123',
+            'title': title,
+            'description': description,
+            'hashtags': hashtags,
+            'view_count': 25000 + (i * 5000),
+            'like_count': 800 + (i * 200),
+            'comment_count': 120 + (i * 30),
+            'share_count': 0,
+            'engagement_rate': 0.04 + (i * 0.005),
+            'ai_keywords': ['ai', 'artificial intelligence', 'tutorial'],
+            'content_type': 'tutorial',
+            'duration': 300 + (i * 60),  # 5-10 minutes
+            'created_date': (now - timedelta(days=i)).date()
+        } for i in range(min(max_count, 6))]  # Limit for testing
+    
+    @staticmethod
+    def _parse_youtube_duration(duration_str: str) -> int:
         """Parse YouTube duration (ISO 8601) to seconds"""
         try:
             # Simple parser for PT#M#S format
-            import re
-            pattern = r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?'
-            match = re.match(pattern, duration_str)
+            match = _ISO_DURATION_RE.match(duration_str)
             
             if match:
                 hours = int(match.group(1) or 0)
@@ -527,7 +728,8 @@ class YouTubeAPI:
             print(f"Error parsing YouTube duration '{duration_str}': {e}")
             return 0
     
-    def _parse_youtube_date(self, date_str: str) -> date:
+    @staticmethod
+    def _parse_youtube_date(date_str: str) -> date:
         """Parse YouTube published date"""
         try:
             dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
@@ -542,10 +744,19 @@ class SocialMediaManager:
     def __init__(self, api_keys: Dict[str, str] = None):
         self.api_keys = api_keys or {}
         
+        # One connection pool shared by all platforms, so DNS and TLS setup is reused
+        self.session = create_http_session()
+        
         # Initialize API clients
-        self.tiktok = TikTokAPI(self.api_keys.get('tiktok'))
-        self.instagram = InstagramAPI(self.api_keys.get('instagram'))
-        self.youtube = YouTubeAPI(self.api_keys.get('youtube'))
+        self.tiktok = TikTokAPI(self.api_keys.get('tiktok'), session=self.session)
+        self.instagram = InstagramAPI(self.api_keys.get('instagram'), session=self.session,
+                                      user_id=self.api_keys.get('instagram_user_id'))
+        self.youtube = YouTubeAPI(self.api_keys.get('youtube'), session=self.session)
+        
+        # Worker processes for post-processing large API batches (spawned on first use)
+        self.process_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        for api in (self.tiktok, self.instagram, self.youtube):
+            api.process_pool = self.process_pool
         
         # Research topics for AI content
         self.research_topics = [
@@ -553,73 +764,115 @@ class SocialMediaManager:
             'chatgpt comedy', 'ai short film', 'artificial intelligence humor',
             'ai generated content', 'machine learning video', 'ai memes'
         ]
+        
+        # Per-platform concurrency caps for parallel research
+        self.platform_limits = {
+            'tiktok': threading.Semaphore(MAX_REQUESTS_PER_PLATFORM),
+            'instagram': threading.Semaphore(MAX_REQUESTS_PER_PLATFORM),
+            'youtube': threading.Semaphore(MAX_REQUESTS_PER_PLATFORM)
+        }
+    
+    def close(self):
+        """Shut down worker processes and close pooled HTTP connections"""
+        self.process_pool.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _search_platform(self, platform: str, topic: str, max_count: int, now: datetime) -> List[Dict]:
+        """Run one platform search, respecting that platform's concurrency cap"""
+        with self.platform_limits[platform]:
+            if platform == 'tiktok':
+                return self.tiktok.search_videos(topic, max_count, now=now)
+            elif platform == 'instagram':
+                return self.instagram.search_hashtag_content(topic.replace(' ', ''), max_count, now=now)
+            elif platform == 'youtube':
+                return self.youtube.search_videos(topic, max_count, now=now)
+        return []
+    
+    def _search_youtube_topics(self, topics: List[str], max_count: int, now: datetime) -> Dict[str, List[Dict]]:
+        """Search all YouTube topics together so video statistics are fetched in shared batches"""
+        with self.platform_limits['youtube']:
+            return self.youtube.search_videos_batch(topics, max_count, now=now)
     
     def research_all_platforms(self, max_per_platform: int = 20) -> Dict[str, List[Dict]]:
         """Research trending AI content across all platforms"""
-        results = {
+        # Result lists returned by each search, grouped by platform
+        chunks = {
             'tiktok': [],
             'instagram': [],
             'youtube': []
         }
         
-        for topic in self.research_topics[:3]:  # Limit topics for testing
-            print(f"Researching topic: {topic}")
+        # One timestamp for the whole batch (search windows and fallback dates)
+        now = datetime.now()
+        
+        topics = self.research_topics[:3]  # Limit topics for testing
+        per_call = max(1, max_per_platform // len(topics))
+        
+        # Every platform/topic search is I/O bound, so run them all in parallel.
+        # YouTube topics go out as one batch so their stats lookups are merged.
+        jobs = [(platform, topic) for topic in topics for platform in ('tiktok', 'instagram')]
+        
+        with ThreadPoolExecutor(max_workers=len(jobs) + 1) as executor:
+            youtube_future = executor.submit(self._search_youtube_topics, topics, per_call, now)
             
-            # TikTok search
-            try:
-                tiktok_results = self.tiktok.search_videos(topic, max_per_platform // len(self.research_topics[:3]))
-                results['tiktok'].extend(tiktok_results)
-                time.sleep(1)  # Rate limiting
-            except Exception as e:
-                print(f"TikTok research error for {topic}: {e}")
+            futures = []
+            for platform, topic in jobs:
+                print(f"Researching {platform} topic: {topic}")
+                futures.append(executor.submit(self._search_platform, platform, topic, per_call, now))
             
-            # Instagram search
-            try:
-                instagram_results = self.instagram.search_hashtag_content(topic.replace(' ', ''), max_per_platform // len(self.research_topics[:3]))
-                results['instagram'].extend(instagram_results)
-                time.sleep(1)  # Rate limiting
-            except Exception as e:
-                print(f"Instagram research error for {topic}: {e}")
+            # Collect in submission order so results stay deterministic
+            for (platform, topic), future in zip(jobs, futures):
+                try:
+                    chunks[platform].append(future.result())
+                except Exception as e:
+                    print(f"{platform.title()} research error for {topic}: {e}")
             
-            # YouTube search
             try:
-                youtube_results = self.youtube.search_videos(topic, max_per_platform // len(self.research_topics[:3]))
-                results['youtube'].extend(youtube_results)
-                time.sleep(1)  # Rate limiting
+                chunks['youtube'].extend(youtube_future.result().values())
             except Exception as e:
-                print(f"YouTube research error for {topic}: {e}")
+                print(f"YouTube research error: {e}")
         
-        # Remove duplicates and sort by engagement
-        for platform in results:
-            results[platform] = sorted(
-                list({item['content_url']: item for item in results[platform]}.values()),
-                key=lambda x: x['engagement_rate'],
-                reverse=True
-            )[:max_per_platform]
+        # Remove duplicates (content_url -> item) and sort by engagement
+        results = {}
+        for platform, platform_chunks in chunks.items():
+            items_by_url = {}
+            self._merge_unique(items_by_url, chain.from_iterable(platform_chunks))
+            results[platform] = sorted(items_by_url.values(), key=itemgetter('engagement_rate'),
+                                       reverse=True)[:max_per_platform]
         
         return results
     
+    def _merge_unique(self, items_by_url: Dict[str, Dict], new_items: Iterable[Dict]):
+        """Add items keyed by content URL, keeping the higher engagement rate on duplicates"""
+        for item in new_items:
+            url = item['content_url']
+            existing = items_by_url.get(url)
+            if existing is None or item['engagement_rate'] > existing['engagement_rate']:
+                items_by_url[url] = item
+    
     def get_trending_keywords(self, platform_results: Dict[str, List[Dict]]) -> List[Tuple[str, int, float]]:
         """Extract trending keywords from research results"""
-        keyword_stats = {}
+        keyword_counts = Counter()
+        total_engagement = defaultdict(float)
         
-        for platform, content_list in platform_results.items():
+        for content_list in platform_results.values():
             for content in content_list:
-                for keyword in content.get('ai_keywords', []):
-                    if keyword not in keyword_stats:
-                        keyword_stats[keyword] = {'count': 0, 'total_engagement': 0.0, 'platforms': set()}
-                    
-                    keyword_stats[keyword]['count'] += 1
-                    keyword_stats[keyword]['total_engagement'] += content['engagement_rate']
-                    keyword_stats[keyword]['platforms'].add(platform)
-        
-        # Convert to list of (keyword, count, avg_engagement)
-        trending_keywords = []
-        for keyword, stats in keyword_stats.items():
-            avg_engagement = stats['total_engagement'] / stats['count'] if stats['count'] > 0 else 0
-            trending_keywords.append((keyword, stats['count'], avg_engagement))
-        
-        # Sort by count * engagement score
-        trending_keywords.sort(key=lambda x: x[1] * x[2], reverse=True)
-        
-        return trending_keywords[:20]  # Top 20 trending keywords
\ No newline at end of file
+                keywords = content.get('ai_keywords', [])
+                keyword_counts.update(keywords)
+                
+                engagement_rate = content['engagement_rate']
+                for keyword in keywords:
+                    total_engagement[keyword] += engagement_rate
+        
+        # (keyword, count, avg_engagement) ranked by count * engagement score
+        return heapq.nlargest(
+            20,  # Top 20 trending keywords
+            ((keyword, count, total_engagement[keyword] / count) for keyword, count in keyword_counts.items()),
+            key=lambda x: x[1] * x[2]
+        )
@@ -3,10 +3,17 @@ Story generation logic for Film Generator App
 Handles story creation, shot list generation, and prompt engineering
 """
 
+import dataclasses
 import json
+import re
 import time
+import hashlib
 import random
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from itertools import accumulate
 from typing import List, Dict, Tuple, Optional
 
 from config import GENERATION_SETTINGS, SYSTEM_PROMPTS, STORY_PROMPTS, VISUAL_STYLES, RENDER_SETTINGS
@@ -15,6 +22,232 @@ from ollama_manager import OllamaManager
 from database import DatabaseManager
 from comfyui_manager import ComfyUIManager
 
+# Fastest available parser for the shot list JSON: orjson, then ujson, then stdlib json
+try:
+    import orjson
+    _JSON_LOADS = orjson.loads
+    _JSON_ERRORS = (json.JSONDecodeError,)  # orjson.JSONDecodeError subclasses it
+except ImportError:
+    try:
+        import ujson
+        _JSON_LOADS = ujson.loads
+        _JSON_ERRORS = (ValueError,)
+    except ImportError:
+        _JSON_LOADS = json.loads
+        _JSON_ERRORS = (json.JSONDecodeError,)
+
+# Optional: pyahocorasick matches every character and location term against a shot in one pass
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Numpy is needed for the optional semantic tier of the LLM cache and entity matching
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Character prompts are independent, so this many are sent to Ollama at once
+# (set OLLAMA_NUM_PARALLEL on the server to at least this to have them batched)
+MAX_PARALLEL_CHARACTER_PROMPTS = 4
+
+# Shots are independent too, as are a shot's Wan, narration and music requests;
+# this many of those requests are in flight at once
+MAX_PARALLEL_SHOT_PROMPTS = 5
+
+# Narration and music don't depend on the character analysis, so up to this many of
+# them are started as soon as the shot list exists, while the analysis still runs
+MAX_PREFETCHED_SHOT_REQUESTS = 2
+
+# Story openers used when there are no performance metrics yet
+_FALLBACK_PROMPTS = (
+    "A mysterious stranger arrives in a small town...",
+    "Two unlikely friends embark on an adventure...",
+    "A secret from the past threatens everything...",
+    "In a world where technology has gone too far...",
+    "The last day before everything changes...",
+    "A message from the future changes everything...",
+    "Two rivals must work together to survive...",
+    "An ordinary person discovers extraordinary powers..."
+)
+
+# First line with a "Title:" (or "title:") label; the label's colon is the first on the line
+_TITLE_RE = re.compile(r'^[^:\n]*?[Tt]itle:(.*)$', re.MULTILINE)
+
+# Parses the first JSON value at an offset, ignoring any text after it
+_JSON_DECODER = json.JSONDecoder()
+
+# Reasoning models wrap their chain of thought in <think> tags
+_THINK_RE = re.compile(r'<think>.*?</think>', re.DOTALL)
+
+# Characters that matter when finding where a JSON object ends
+_JSON_STRUCTURE_RE = re.compile(r'[{}"\\]')
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """Get the first balanced {...} object in text, ignoring braces inside strings"""
+    start = text.find('{')
+    if start < 0:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = -1  # position of the character after a backslash
+    for match in _JSON_STRUCTURE_RE.finditer(text, start):
+        pos = match.start()
+        if pos == escaped:
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                escaped = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
+
+def _build_style_cache() -> Dict[str, Tuple[str, str]]:
+    """Precompute (positive style text, negative prompt) for every visual style"""
+    cache = {}
+    for name, style_config in VISUAL_STYLES.items():
+        style_strength = style_config['style_strength']
+        positive_style = style_config['positive_prompts']
+        negative_style = style_config['negative_prompts']
+        
+        # Choose appropriate style prompt based on strength
+        if style_strength > 0.8:
+            # High strength - use multiple style elements
+            selected_positive = ', '.join(positive_style[:2])
+        else:
+            # Medium strength uses one primary style element; low strength is just as subtle
+            selected_positive = positive_style[0] if positive_style else ""
+        
+        cache[name] = (selected_positive, ', '.join(negative_style) if negative_style else "")
+    return cache
+
+_STYLE_CACHE = _build_style_cache()
+
+# Wan prompt generation stops at the negative prompt label, as what follows is discarded
+WAN_STOP_SEQUENCES = ["Negative prompt:", "Negative:"]
+
+# The positive prompt in a "Positive: ... Negative: ..." reply (either label may end in " prompt")
+_POSITIVE_PROMPT_RE = re.compile(r'Positive(?: prompt)?:(.*?)(?:Negative(?: prompt)?:|\Z)', re.DOTALL)
+
+# Frame rate value per FPS option key
+_FPS_VALUES = {key: option['value'] for key, option in RENDER_SETTINGS['fps_options'].items()}
+_DEFAULT_FPS = RENDER_SETTINGS['defaults']['fps']
+
+# Stands in for the character name in cached character prompt templates
+CHARACTER_NAME_PLACEHOLDER = "{character_name}"
+
+# Sentence embedding model for the semantic LLM cache and entity matching, loaded on first use
+SEMANTIC_CACHE_MODEL = 'all-MiniLM-L6-v2'
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def _get_embedder():
+    """Load the embedding model once, or return None if sentence-transformers isn't installed"""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+                _embedder = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+            except ImportError:
+                print("Semantic matching disabled: install with pip install sentence-transformers")
+                _embedder = False
+    return _embedder or None
+
+class _EntityMatcher:
+    """Finds the characters and locations a shot description mentions
+    
+    An entity is relevant when any word of its name, or its role / environment type,
+    appears in the description. Terms are lowercased once per story, not once per shot.
+    With semantic entity matching on, an entity is relevant when its full name appears
+    or its embedding is close enough to the description's instead.
+    """
+    
+    def __init__(self, characters: List[Dict] = None, locations: List[Dict] = None):
+        self.characters = characters or []
+        self.locations = locations or []
+        
+        # One normalized embedding row per entity, characters first, embedded once per story
+        self.embedder = None
+        if NUMPY_AVAILABLE and GENERATION_SETTINGS.get('semantic_entity_matching') and (self.characters or self.locations):
+            self.embedder = _get_embedder()
+        if self.embedder is not None:
+            texts = [f"{c['name']} {c.get('role', '')} {c.get('physical_description', '')}" for c in self.characters]
+            texts += [f"{l['name']} {l.get('environment_type', '')} {l.get('description', '')}" for l in self.locations]
+            self.embeddings = self.embedder.encode(texts, normalize_embeddings=True).astype(np.float32)
+            self.full_names = [entity['name'].lower() for entity in (*self.characters, *self.locations)]
+            self.threshold = GENERATION_SETTINGS.get('semantic_entity_threshold', 0.35)
+            return
+        
+        # (kind, index) -> terms; an empty term is in every description
+        self.entity_terms = {}
+        for kind, entities, type_field in (('char', self.characters, 'role'),
+                                           ('loc', self.locations, 'environment_type')):
+            for index, entity in enumerate(entities):
+                name_lower = entity['name'].lower()
+                self.entity_terms[(kind, index)] = (name_lower, *name_lower.split(), entity[type_field].lower())
+        
+        # With pyahocorasick every term is found in a single pass over the description
+        self.automaton = None
+        self.always = frozenset(key for key, terms in self.entity_terms.items() if '' in terms)
+        if AHOCORASICK_AVAILABLE and self.entity_terms:
+            term_entities = {}
+            for key, terms in self.entity_terms.items():
+                for term in terms:
+                    if term:
+                        term_entities.setdefault(term, set()).add(key)
+            if term_entities:
+                self.automaton = ahocorasick.Automaton()
+                for term, keys in term_entities.items():
+                    self.automaton.add_word(term, frozenset(keys))
+                self.automaton.make_automaton()
+    
+    def match(self, description: str) -> Tuple[List[Dict], List[Dict]]:
+        """Get the (characters, locations) relevant to a shot description"""
+        desc_lower = description.lower()
+        if self.embedder is not None:
+            scores = self.embeddings @ self.embedder.encode(description, normalize_embeddings=True).astype(np.float32)
+            relevant = [score > self.threshold or (name and name in desc_lower)
+                        for score, name in zip(scores.tolist(), self.full_names)]
+            split = len(self.characters)
+            return ([char for char, hit in zip(self.characters, relevant[:split]) if hit],
+                    [loc for loc, hit in zip(self.locations, relevant[split:]) if hit])
+        
+        if self.automaton is not None:
+            hits = set(self.always)
+            for _, keys in self.automaton.iter(desc_lower):
+                hits.update(keys)
+        else:
+            hits = {key for key, terms in self.entity_terms.items()
+                    if any(term in desc_lower for term in terms)}
+        
+        return ([char for index, char in enumerate(self.characters) if ('char', index) in hits],
+                [loc for index, loc in enumerate(self.locations) if ('loc', index) in hits])
+
+# Character fields that go into its ComfyUI prompt request, so two characters only share a
+# cached prompt when the prompt engineer would have been asked the same thing
+_CHARACTER_SIGNATURE_FIELDS = ('name', 'role', 'physical_description', 'age_range', 'clothing_style',
+                               'personality_traits')
+
+def _ignore_progress(*args, **kwargs):
+    """Stand-in for progress window hooks when there is no window"""
+
+class GenerationCancelled(Exception):
+    """Raised inside generate_complete_story once its cancel event is set"""
+
 class StoryGenerator:
     """Handles all story generation and processing"""
     
@@ -23,47 +256,135 @@ class StoryGenerator:
         self.db = db
         self.comfyui = ComfyUIManager(db)
         self.progress_window = None  # Add this line
+        
+        # Database writes that nothing waits on go through one background writer,
+        # so disk syncs overlap with Ollama generation
+        self._db_writes = queue.Queue()
+        threading.Thread(target=self._db_writer_loop, daemon=True).start()
+        
+        # Semantic LLM cache: step -> (normalized prompt embeddings, cached responses)
+        self._semantic_index = {}
+        self._semantic_lock = threading.Lock()
+    
+    def _db_writer_loop(self):
+        """Apply queued database writes in order"""
+        while True:
+            result, write, args = self._db_writes.get()
+            try:
+                result.set_result(write(*args))
+            except Exception as e:
+                print(f"Background database write {write.__name__} failed: {e}")
+                result.set_exception(e)
+            finally:
+                self._db_writes.task_done()
+    
+    def _write_later(self, write, *args) -> Future:
+        """Queue a database write for the background writer; the Future holds its result or error"""
+        result = Future()
+        self._db_writes.put((result, write, args))
+        return result
 
+    @property
+    def progress_window(self):
+        return self._progress_window
+    
+    @progress_window.setter
+    def progress_window(self, progress_window):
+        # Resolve the per-shot progress hooks once instead of checking the window on every call
+        self._progress_window = progress_window
+        self._add_ai_message = getattr(progress_window, 'add_ai_message', _ignore_progress)
+        self._update_shot_prompts = getattr(progress_window, 'update_shot_prompts', _ignore_progress)
+    
     def set_progress_window(self, progress_window):
         """Set reference to progress popup window"""
         self.progress_window = progress_window
         self.comfyui.set_progress_window(progress_window)
     
+    def _generate_cached(self, prompt: str, system: str, temperature: float, step: str, stop: List[str] = None) -> str:
+        """Generate with Ollama, reusing the stored response for an identical request"""
+        if not GENERATION_SETTINGS.get('llm_cache'):
+            return self.ollama.generate(prompt=prompt, system=system, temperature=temperature, step=step, stop=stop)
+        
+        _, model = self.ollama.get_step_model(step)
+        model = model or self.ollama.config.get('selected_model')
+        key = hashlib.blake2b(
+            f"{step}\x1f{model}\x1f{system}\x1f{prompt}\x1f{temperature}".encode('utf-8'), digest_size=16
+        ).hexdigest()
+        
+        try:
+            cached = self.db.get_llm_cache(key)
+        except Exception as e:
+            print(f"LLM cache lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            return cached
+        
+        # Fall back to the closest earlier prompt for this step (low temperatures only)
+        embedding = None
+        if (NUMPY_AVAILABLE and GENERATION_SETTINGS.get('llm_semantic_cache')
+                and temperature < GENERATION_SETTINGS.get('llm_semantic_cache_max_temperature', 0.6)):
+            embedder = _get_embedder()
+            if embedder is not None:
+                embedding = embedder.encode(prompt, normalize_embeddings=True).astype(np.float32)
+                cached = self._semantic_match(step, embedding)
+                if cached is not None:
+                    return cached
+        
+        # Stop sequences only cut off text the caller discards, so they are not part of the key
+        response = self.ollama.generate(prompt=prompt, system=system, temperature=temperature, step=step, stop=stop)
+        
+        try:
+            self.db.save_llm_cache(key, response, step, embedding.tobytes() if embedding is not None else None)
+        except Exception as e:
+            print(f"LLM cache store failed: {e}")
+        if embedding is not None:
+            with self._semantic_lock:
+                if step in self._semantic_index:
+                    matrix, responses = self._semantic_index[step]
+                    self._semantic_index[step] = (np.vstack([matrix, embedding]), responses + [response])
+        return response
+    
+    def _semantic_match(self, step: str, embedding) -> Optional[str]:
+        """Get the cached response whose prompt is most similar, if it clears the threshold"""
+        with self._semantic_lock:
+            if step not in self._semantic_index:
+                try:
+                    rows = self.db.get_llm_cache_embeddings(step)
+                except Exception as e:
+                    print(f"LLM cache lookup failed: {e}")
+                    return None
+                vectors = [np.frombuffer(blob, dtype=np.float32) for blob, _ in rows]
+                # Entries embedded by a different model have a different size
+                kept = [(v, r) for v, (_, r) in zip(vectors, rows) if v.shape == embedding.shape]
+                matrix = np.array([v for v, _ in kept], dtype=np.float32).reshape(len(kept), embedding.shape[0])
+                self._semantic_index[step] = (matrix, [r for _, r in kept])
+            matrix, responses = self._semantic_index[step]
+        
+        if not responses:
+            return None
+        scores = matrix @ embedding  # cosine similarity, as embeddings are normalized
+        best = int(scores.argmax())
+        if scores[best] >= GENERATION_SETTINGS.get('llm_semantic_cache_threshold', 0.95):
+            return responses[best]
+        return None
+    
     def get_trending_prompt(self, genre: str = None, use_research: bool = True) -> Optional[str]:
         """Get a trending prompt based on research data"""
         if not use_research:
             return None
             
         try:
-            # Get research-based prompts first
-            research_prompts = self.db.get_research_prompts(genre=genre, limit=10)
-            
-            if research_prompts:
-                # Weight prompts by expected performance and success rate
-                weighted_prompts = []
-                for prompt_data in research_prompts:
-                    weight = (
-                        prompt_data.get('expected_performance', 0.5) * 0.7 +
-                        prompt_data.get('success_rate', 0.5) * 0.3
-                    )
-                    # Bonus for recent usage
-                    usage_count = prompt_data.get('usage_count', 0)
-                    if usage_count < 3:  # Prefer less-used prompts
-                        weight += 0.1
-                    
-                    weighted_prompts.append((prompt_data, weight))
-                
-                # Sort by weight and select from top 3
-                weighted_prompts.sort(key=lambda x: x[1], reverse=True)
-                top_prompts = weighted_prompts[:3]
-                
-                if top_prompts:
-                    selected_prompt, _ = random.choice(top_prompts)
-                    
-                    # Update usage statistics
-                    self.db.update_prompt_usage(selected_prompt['id'], success=True)
-                    
-                    return selected_prompt['prompt']
+            # Top 3 research prompts, weighted and ranked by the database
+            top_prompts = self.db.get_top_weighted_prompts(genre=genre, limit=3)
+            if not top_prompts:
+                return None
+            
+            selected_prompt = random.choice(top_prompts)
+            
+            # Update usage statistics (in the background)
+            self._write_later(self.db.update_prompt_usage, selected_prompt['id'], True)
+            
+            return selected_prompt['prompt']
             
         except Exception as e:
             print(f"Error getting trending prompt: {e}")
@@ -104,97 +425,111 @@ class StoryGenerator:
         if not self.ollama.available:
             raise Exception("Ollama not available for character prompt generation")
         
-        character_prompts = []
+        if not characters:
+            return []
         
-        for character in characters:
-            try:
-                # Create prompt for character reference image
-                prompt = f"""Character: {character['name']} ({character['role']})
+        # Characters are independent, so overlap their Ollama round-trips
+        workers = min(len(characters), MAX_PARALLEL_CHARACTER_PROMPTS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(self._generate_character_prompt, characters))
+        
+        # Keep story order; characters that failed are skipped
+        return [result for result in results if result]
+    
+    def _character_signature(self, character: Dict) -> str:
+        """Hash of every character field the ComfyUI prompt is generated from"""
+        sig = '\x1f'.join(str(character.get(field)) for field in _CHARACTER_SIGNATURE_FIELDS)
+        return hashlib.blake2b(sig.lower().encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _generate_character_prompt(self, character: Dict) -> Optional[Dict]:
+        """Generate the ComfyUI prompt for one character, or None if it fails"""
+        try:
+            use_template_cache = GENERATION_SETTINGS.get('structural_prompt_cache')
+            if use_template_cache:
+                sig_hash = self._character_signature(character)
+                try:
+                    template = self.db.get_structural_prompt(sig_hash)
+                except Exception as e:
+                    print(f"Character prompt cache lookup failed: {e}")
+                    template = None
+                if template is not None:
+                    comfyui_prompt = template.replace(CHARACTER_NAME_PLACEHOLDER, character['name'])
+                    if self.progress_window:
+                        self.progress_window.add_ai_message('success', 
+                            f"Reused cached ComfyUI prompt for {character['name']}: {comfyui_prompt[:50]}...", 'characters')
+                    return {
+                        'character_name': character['name'],
+                        'character_role': character['role'],
+                        'comfyui_prompt': comfyui_prompt,
+                        'importance_level': character.get('importance_level', 1)
+                    }
+            
+            # Create prompt for character reference image
+            prompt = f"""Character: {character['name']} ({character['role']})
 Physical Description: {character['physical_description']}
 Age Range: {character['age_range']}
 Clothing Style: {character['clothing_style']}
 Personality Traits: {character['personality_traits']}"""
-                
-                # Log request
-                if self.progress_window:
-                    self.progress_window.add_ai_message('request', prompt, 'characters')
-                
-                # Generate ComfyUI prompt using prompt engineer
-                raw_response = self.ollama.generate(
-                    prompt=prompt,
-                    system=SYSTEM_PROMPTS['prompt_engineer'],
-                    temperature=0.3,
-                    step='characters'
-                )
-                
-                # Log response
-                if self.progress_window:
-                    self.progress_window.add_ai_message('response', raw_response, 'characters')
-                
-                # Clean response
-                response = self.clean_ai_response(raw_response)
-                
-                # Extract positive prompt
-                if "Positive:" in response:
-                    comfyui_prompt = response.split("Positive:")[1].split("Negative:")[0].strip()
-                else:
-                    comfyui_prompt = response.split('\n')[0].strip()
-                
-                character_prompt_data = {
-                    'character_name': character['name'],
-                    'character_role': character['role'],
-                    'comfyui_prompt': comfyui_prompt,
-                    'importance_level': character.get('importance_level', 1)
-                }
-                
-                character_prompts.append(character_prompt_data)
-                
-                if self.progress_window:
-                    self.progress_window.add_ai_message('success', 
-                        f"Generated ComfyUI prompt for {character['name']}: {comfyui_prompt[:50]}...", 'characters')
-                
-            except Exception as e:
-                if self.progress_window:
-                    self.progress_window.add_ai_message('error', 
-                        f"Failed to generate ComfyUI prompt for {character['name']}: {str(e)}", 'characters')
-                # Continue with other characters even if one fails
-                continue
-        
-        return character_prompts
+            
+            # Log request (add_ai_message marshals onto the Tk thread itself)
+            if self.progress_window:
+                self.progress_window.add_ai_message('request', prompt, 'characters')
+            
+            # Generate ComfyUI prompt using prompt engineer
+            raw_response = self._generate_cached(
+                prompt=prompt,
+                system=SYSTEM_PROMPTS['prompt_engineer'],
+                temperature=0.3,
+                step='characters'
+            )
+            
+            # Log response
+            if self.progress_window:
+                self.progress_window.add_ai_message('response', raw_response, 'characters')
+            
+            # Clean response
+            response = self.clean_ai_response(raw_response, self.ollama.get_step_model('characters')[1])
+            
+            # Extract positive prompt
+            if "Positive:" in response:
+                comfyui_prompt = response.split("Positive:")[1].split("Negative:")[0].strip()
+            else:
+                comfyui_prompt = response.split('\n')[0].strip()
+            
+            if use_template_cache and comfyui_prompt:
+                try:
+                    self.db.save_structural_prompt(
+                        sig_hash, comfyui_prompt.replace(character['name'], CHARACTER_NAME_PLACEHOLDER),
+                        character['name'], GENERATION_SETTINGS.get('structural_prompt_cache_size', 500))
+                except Exception as e:
+                    print(f"Character prompt cache store failed: {e}")
+            
+            if self.progress_window:
+                self.progress_window.add_ai_message('success', 
+                    f"Generated ComfyUI prompt for {character['name']}: {comfyui_prompt[:50]}...", 'characters')
+            
+            return {
+                'character_name': character['name'],
+                'character_role': character['role'],
+                'comfyui_prompt': comfyui_prompt,
+                'importance_level': character.get('importance_level', 1)
+            }
+            
+        except Exception as e:
+            if self.progress_window:
+                self.progress_window.add_ai_message('error', 
+                    f"Failed to generate ComfyUI prompt for {character.get('name', 'character')}: {str(e)}", 'characters')
+            # Continue with other characters even if one fails
+            return None
     
     def enhance_prompt_with_style(self, base_prompt: str, visual_style: str) -> Tuple[str, str]:
         """Enhance a base prompt with the selected visual style"""
-        if not visual_style or visual_style not in VISUAL_STYLES:
+        style = _STYLE_CACHE.get(visual_style) if visual_style else None
+        if style is None:
             return base_prompt, ""
         
-        style_config = VISUAL_STYLES[visual_style]
-        
-        # Select style prompts based on strength
-        style_strength = style_config['style_strength']
-        positive_style = style_config['positive_prompts']
-        negative_style = style_config['negative_prompts']
-        
-        # Choose appropriate style prompt based on strength
-        if style_strength > 0.8:
-            # High strength - use multiple style elements
-            selected_positive = ', '.join(positive_style[:2])
-        elif style_strength > 0.6:
-            # Medium strength - use one primary style element
-            selected_positive = positive_style[0]
-        else:
-            # Low strength - subtle style influence
-            selected_positive = positive_style[0] if positive_style else ""
-        
-        # Enhance the base prompt
-        if selected_positive:
-            enhanced_prompt = f"{base_prompt}, {selected_positive}"
-        else:
-            enhanced_prompt = base_prompt
-        
-        # Combine negative prompts
-        enhanced_negative = ', '.join(negative_style) if negative_style else ""
-        
-        return enhanced_prompt, enhanced_negative
+        selected_positive, enhanced_negative = style
+        return (f"{base_prompt}, {selected_positive}" if selected_positive else base_prompt), enhanced_negative
     
     def analyze_story_characters_and_locations(self, story: Dict) -> Tuple[List[Dict], List[Dict], Dict]:
         """Analyze story to extract characters, locations, and visual style for consistency"""
@@ -214,7 +549,7 @@ Length: {story['length']}
 
         try:
             # Generate with Ollama using character analyzer
-            raw_response = self.ollama.generate(
+            raw_response = self._generate_cached(
                 prompt=prompt,
                 system=SYSTEM_PROMPTS['character_analyzer'],
                 temperature=0.3,
@@ -226,16 +561,14 @@ Length: {story['length']}
                 self.progress_window.add_ai_message('response', raw_response, 'characters')
             
             # Clean response for JSON parsing
-            response = self.clean_ai_response(raw_response)
+            response = self.clean_ai_response(raw_response, self.ollama.get_step_model('characters')[1])
             
-            # Parse JSON response
+            # Parse the JSON object starting at the first brace
             json_start = response.find('{')
-            json_end = response.rfind('}') + 1
             
-            if json_start >= 0 and json_end > json_start:
-                json_str = response[json_start:json_end]
+            if json_start >= 0:
                 try:
-                    analysis_data = json.loads(json_str)
+                    analysis_data, _ = _JSON_DECODER.raw_decode(response, json_start)
                     
                     characters = analysis_data.get('characters', [])
                     locations = analysis_data.get('locations', [])
@@ -269,7 +602,7 @@ Length: {story['length']}
         prompt_source = "user"
         
         # If using auto-generation or user wants trending content
-        if hasattr(config, 'use_trending') and config.use_trending:
+        if getattr(config, 'use_trending', False):
             trending_prompt = self.get_trending_prompt(config.genre, use_research=True)
             
             if trending_prompt:
@@ -281,16 +614,24 @@ Length: {story['length']}
                 prompt_source = "enhanced"
         
         # For auto-prompts, also consider performance data
-        elif config.prompt.strip() == "" or "auto" in config.prompt.lower():
-            # Try trending first
-            trending_prompt = self.get_trending_prompt(config.genre, use_research=True)
+        elif not selected_prompt.strip() or "auto" in selected_prompt.lower():
+            # Trending and best-performing candidates come back from one query
+            try:
+                candidates = self.db.get_prompt_candidates(genre=config.genre)
+            except Exception as e:
+                print(f"Error getting prompt candidates: {e}")
+                candidates = []
+            trending_prompts = [c for c in candidates if c['source'] == 'trending']
+            best_prompts = [c['prompt'] for c in candidates if c['source'] == 'performance']
             
-            if trending_prompt:
-                selected_prompt = trending_prompt
+            # Try trending first
+            if trending_prompts:
+                trending_prompt = random.choice(trending_prompts)
+                self._write_later(self.db.update_prompt_usage, trending_prompt['id'], True)
+                selected_prompt = trending_prompt['prompt']
                 prompt_source = "trending"
             else:
                 # Use best-performing traditional prompts
-                best_prompts = self.db.get_best_performing_prompts(limit=5)
                 if best_prompts:
                     selected_prompt = random.choice(best_prompts)
                     prompt_source = "performance"
@@ -332,10 +673,16 @@ Length: {story['length']}
             print(f"Error getting trending elements: {e}")
             return {'keywords': [], 'themes': [], 'content_types': [], 'performance_indicators': []}
     
-    def generate_complete_story(self, config: StoryConfig, progress_callback=None, log_callback=None) -> Tuple[Dict, List[Shot]]:
-        """Generate a complete story with shots"""
+    def generate_complete_story(self, config: StoryConfig, progress_callback=None, log_callback=None,
+                                cancel_event: threading.Event = None) -> Tuple[Dict, List[Shot]]:
+        """Generate a complete story with shots, stopping before the next step or save once cancel_event is set"""
+        
+        def check_cancelled():
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled("Story generation was cancelled")
         
         def update_progress(value, text):
+            check_cancelled()
             if progress_callback:
                 progress_callback(value, text)
         
@@ -343,24 +690,34 @@ Length: {story['length']}
             if log_callback:
                 log_callback(message, log_type)
         
+        # Resolved once rather than at every step
+        progress_window = self.progress_window
+        show_node_info = bool(progress_window) and hasattr(progress_window, 'update_step_node_info')
+        show_estimates = bool(progress_window) and hasattr(progress_window, 'update_step_estimates')
+        step_models = getattr(self.ollama, 'selected_model', {})
+        node_name = getattr(self.ollama, 'selected_instance', 'localhost')
+        
+        def show_step_node(step):
+            if show_node_info:
+                progress_window.update_step_node_info(step, node_name, 'ollama', step_models.get(step, 'llama3.1'))
+        
+        # This story's background saves; a failed one is raised here rather than only logged
+        story_writes = []
+        
+        def write_later(write, *args):
+            story_writes.append(self._write_later(write, *args))
+        
+        def wait_for_writes():
+            self._db_writes.join()
+            for write in story_writes:
+                write.result()
+        
         # Select optimal prompt using research data
         update_progress(10, "Selecting optimal story prompt...")
         optimal_prompt = self.select_optimal_prompt(config)
         
         # Update config with selected prompt
-        optimized_config = StoryConfig(
-            prompt=optimal_prompt,
-            genre=config.genre,
-            length=config.length,
-            visual_style=config.visual_style,
-            aspect_ratio=config.aspect_ratio,
-            fps=config.fps,
-            auto_prompt=config.auto_prompt,
-            auto_genre=config.auto_genre,
-            auto_length=config.auto_length,
-            auto_style=config.auto_style,
-            parts=config.parts
-        )
+        optimized_config = dataclasses.replace(config, prompt=optimal_prompt)
         
         # Generate story
         update_progress(15, "Generating story with AI...")
@@ -368,10 +725,7 @@ Length: {story['length']}
         add_log(f"Sending prompt to AI: {optimal_prompt[:100]}...", "AI")
         
         # Update progress window with render node info
-        if self.progress_window and hasattr(self.progress_window, 'update_step_node_info'):
-            selected_model = getattr(self.ollama, 'selected_model', {}).get('story', 'llama3.1')
-            node_name = getattr(self.ollama, 'selected_instance', 'localhost')
-            self.progress_window.update_step_node_info('story', node_name, 'ollama', selected_model)
+        show_step_node('story')
         
         story = self.generate_story(optimized_config)
         
@@ -379,46 +733,56 @@ Length: {story['length']}
             add_log(f"Story generated: {story['title']}", "AI")
             update_progress(25, f"Story '{story['title']}' created")
             
-            # Save to database
+            # Save to database in the background
             add_log(f"Saving story to database...", "Database")
-            story_id = self.db.save_story(story)
-            self.db.save_generation_history(story_id, optimized_config)
-            add_log(f"Story saved with ID: {story_id}", "Database")
+            story_id = story['id']
+            write_later(self.db.save_story, story)
+            write_later(self.db.save_generation_history, story_id, optimized_config)
+            add_log(f"Story queued for saving with ID: {story_id}", "Database")
             
             # Create shot list (moved to step 2)
             update_progress(30, "Breaking story into shots...")
             add_log("Creating shot list from story content...", "AI")
             
             # Update progress window with render node info
-            if self.progress_window and hasattr(self.progress_window, 'update_step_node_info'):
-                selected_model = getattr(self.ollama, 'selected_model', {}).get('shots', 'llama3.1')
-                node_name = getattr(self.ollama, 'selected_instance', 'localhost')
-                self.progress_window.update_step_node_info('shots', node_name, 'ollama', selected_model)
+            show_step_node('shots')
+            
+            # Character analysis (step 3) only needs the story, so run it alongside the shot list
+            add_log("Extracting characters and locations for visual consistency...", "AI")
+            show_step_node('characters')
+            
+            analysis_executor = ThreadPoolExecutor(max_workers=1)
+            analysis = analysis_executor.submit(self.analyze_story_characters_and_locations, story)
+            analysis_executor.shutdown(wait=False)
             
             shots = self.create_shot_list(story, optimized_config)
             add_log(f"Created {len(shots)} shots", "AI")
             
+            # Get narration and music going while the character analysis finishes
+            prefetched_audio = self.prefetch_shot_audio(shots)
+            
             # Update time estimates now that we know shot count
-            if self.progress_window and hasattr(self.progress_window, 'update_step_estimates'):
-                self.progress_window.update_step_estimates(shot_count=len(shots))
+            if show_estimates:
+                progress_window.update_step_estimates(shot_count=len(shots))
             
             # Analyze characters and locations for consistency (now step 3)
             update_progress(40, "Analyzing characters and locations...")
-            add_log("Extracting characters and locations for visual consistency...", "AI")
-            
-            # Update progress window with render node info
-            if self.progress_window and hasattr(self.progress_window, 'update_step_node_info'):
-                selected_model = getattr(self.ollama, 'selected_model', {}).get('characters', 'llama3.1')
-                node_name = getattr(self.ollama, 'selected_instance', 'localhost')
-                self.progress_window.update_step_node_info('characters', node_name, 'ollama', selected_model)
             
             try:
-                characters, locations, visual_style = self.analyze_story_characters_and_locations(story)
+                characters, locations, visual_style = analysis.result()
                 add_log(f"Found {len(characters)} characters and {len(locations)} locations", "AI")
                 
                 # Update time estimates now that we know character count
-                if self.progress_window and hasattr(self.progress_window, 'update_step_estimates'):
-                    self.progress_window.update_step_estimates(character_count=len(characters))
+                if show_estimates:
+                    progress_window.update_step_estimates(character_count=len(characters))
+                
+                # Save characters and locations to database for persistence (in the background)
+                check_cancelled()
+                for character in characters:
+                    write_later(self.db.save_story_character, story_id, character)
+                
+                for location in locations:
+                    write_later(self.db.save_story_location, story_id, location)
                 
                 # Generate ComfyUI prompts for characters (NEW)
                 update_progress(42, "Generating character ComfyUI prompts...")
@@ -429,17 +793,12 @@ Length: {story['length']}
                 story['character_prompts'] = character_prompts
                 add_log(f"Generated ComfyUI prompts for {len(character_prompts)} characters", "AI")
                 
-                # Save characters and locations to database for persistence
-                for character in characters:
-                    self.db.save_story_character(story['id'], character)
-                
-                for location in locations:
-                    self.db.save_story_location(story['id'], location)
-                
                 # Update style references display
-                if self.progress_window and hasattr(self.progress_window, 'update_style_references'):
-                    self.progress_window.update_style_references(characters, locations, visual_style)
+                if progress_window and hasattr(progress_window, 'update_style_references'):
+                    progress_window.update_style_references(characters, locations, visual_style)
                 
+            except GenerationCancelled:
+                raise
             except Exception as e:
                 add_log(f"Character analysis failed, continuing without character consistency: {str(e)}", "Warning")
                 characters, locations, visual_style = [], [], {}
@@ -450,84 +809,50 @@ Length: {story['length']}
             add_log("Style sheet processing (placeholder for future implementation)", "Info")
             
             # Update progress window with placeholder info
-            if self.progress_window and hasattr(self.progress_window, 'update_step_node_info'):
-                self.progress_window.update_step_node_info('style', 'Future Implementation', 'placeholder', 'N/A')
+            if show_node_info:
+                progress_window.update_step_node_info('style', 'Future Implementation', 'placeholder', 'N/A')
+            
+            # Update progress window with render node info for the per-shot steps
+            show_step_node('prompts')
+            if any(shot.narration and shot.narration.strip() for shot in shots):
+                show_step_node('narration')
+            if any(shot.music_cue and shot.music_cue.strip() for shot in shots):
+                show_step_node('music')
             
-            # Process each shot
+            # Shot prompts read the saved characters and locations back for consistency
+            wait_for_writes()
+            
+            # Generate prompts for all shots, several shots in flight at once
             total_shots = len(shots)
-            for idx, shot in enumerate(shots):
-                progress = 50 + (idx / total_shots) * 40  # 50% to 90%
-                update_progress(progress, f"Processing shot {idx + 1} of {total_shots}...")
-                
-                # Save shot to database
-                add_log(f"Processing shot {shot.shot_number}: {shot.description[:50]}...", "AI")
-                shot_id = self.db.save_shot(shot)
-                shot.id = shot_id
-                
-                # Generate prompts
-                update_progress(progress + 5, f"Generating prompts for shot {idx + 1}...")
-                
-                # Update progress window with render node info for prompts
-                if idx == 0 and self.progress_window and hasattr(self.progress_window, 'update_step_node_info'):
-                    selected_model = getattr(self.ollama, 'selected_model', {}).get('prompts', 'llama3.1')
-                    node_name = getattr(self.ollama, 'selected_instance', 'localhost')
-                    self.progress_window.update_step_node_info('prompts', node_name, 'ollama', selected_model)
-                
-                add_log(f"Generating Wan 2.2 prompt for shot {shot.shot_number}...", "AI")
-                self.generate_wan_prompt(shot, story_id, optimized_config.visual_style, characters, locations)
-                
-                # Only generate narration if shot requires dialogue/narration
-                if shot.narration and shot.narration.strip() != "":
-                    # Update progress window with render node info for narration (first shot only)
-                    if idx == 0 and self.progress_window and hasattr(self.progress_window, 'update_step_node_info'):
-                        selected_model = getattr(self.ollama, 'selected_model', {}).get('narration', 'llama3.1')
-                        node_name = getattr(self.ollama, 'selected_instance', 'localhost')
-                        self.progress_window.update_step_node_info('narration', node_name, 'ollama', selected_model)
-                    
-                    add_log(f"Generating narration for shot {shot.shot_number}...", "AI")
-                    self.generate_elevenlabs_script(shot)
-                else:
-                    add_log(f"Skipping narration for shot {shot.shot_number} (no dialogue required)", "Info")
-                
-                # Only generate music if shot requires background music
-                if shot.music_cue and shot.music_cue.strip() != "":
-                    # Update progress window with render node info for music (first shot only)
-                    if idx == 0 and self.progress_window and hasattr(self.progress_window, 'update_step_node_info'):
-                        selected_model = getattr(self.ollama, 'selected_model', {}).get('music', 'llama3.1')
-                        node_name = getattr(self.ollama, 'selected_instance', 'localhost')
-                        self.progress_window.update_step_node_info('music', node_name, 'ollama', selected_model)
-                    
-                    add_log(f"Generating music cue for shot {shot.shot_number}...", "AI")
-                    self.generate_suno_prompt(shot)
-                else:
-                    add_log(f"Skipping music for shot {shot.shot_number} (no music required)", "Info")
-                
-                # Update shot in database with generated prompts
-                cursor = self.db.conn.cursor()
-                cursor.execute('''
-                    UPDATE shots 
-                    SET wan_prompt = ?, narration = ?, music_cue = ?, status = 'ready'
-                    WHERE id = ?
-                ''', (shot.wan_prompt, shot.narration, shot.music_cue, shot_id))
-                self.db.conn.commit()
-                add_log(f"Shot {shot.shot_number} saved and ready for rendering", "Database")
-                
-                # Update shot display with new prompts immediately
-                if self.progress_window and hasattr(self.progress_window, 'update_shot_prompts'):
-                    self.progress_window.update_shot_prompts(shot.shot_number, shot.wan_prompt)
+            update_progress(50, f"Generating prompts for {total_shots} shots...")
+            add_log(f"Generating Wan 2.2 prompts, narration and music cues for {total_shots} shots...", "AI")
+            for idx, shot in enumerate(self.generate_all_shot_prompts(
+                    shots, story_id, optimized_config.visual_style, characters, locations, prefetched_audio)):
+                progress = 50 + ((idx + 1) / total_shots) * 30  # 50% to 80%
+                update_progress(progress, f"Generated prompts for shot {idx + 1} of {total_shots}")
+                add_log(f"Generated prompts for shot {shot.shot_number}", "AI")
+            
+            # Save all shots and queue them for rendering in one transaction
+            update_progress(85, f"Saving {total_shots} shots...")
+            write_later(self.db.save_ready_shots, shots)
+            
+            for shot in shots:
+                add_log(f"Shot {shot.shot_number} saved and added to render queue with priority "
+                        f"{10 if shot.shot_number == 1 else 5}", "Database")
                 
-                # Add to render queue
-                priority = 10 if shot.shot_number == 1 else 5
-                self.db.add_to_render_queue(shot_id, priority)
-                add_log(f"Shot {shot.shot_number} added to render queue with priority {priority}", "Database")
+                # Update shot display with new prompts
+                self._update_shot_prompts(shot.shot_number, shot.wan_prompt)
             
             # Mark story as ready
             update_progress(95, "Finalizing story...")
             
             # Update progress window with render queue info
-            if self.progress_window and hasattr(self.progress_window, 'update_step_node_info'):
-                self.progress_window.update_step_node_info('queue', 'Database', 'sqlite', 'Local DB')
+            if show_node_info:
+                progress_window.update_step_node_info('queue', 'Database', 'sqlite', 'Local DB')
             
+            # Everything else must be on disk before the story is marked ready
+            wait_for_writes()
+            check_cancelled()
             self.db.conn.execute("UPDATE stories SET status = 'ready' WHERE id = ?", (story_id,))
             self.db.conn.commit()
             add_log(f"Story '{story['title']}' marked as ready for rendering", "Database")
@@ -544,12 +869,14 @@ Length: {story['length']}
 
     # Updates for story_generator.py to handle <think> tags properly:
 
-    def clean_ai_response(self, response: str) -> str:
+    def clean_ai_response(self, response: str, model: str = None) -> str:
         """Remove <think> tags from AI response and return clean content"""
-        # Remove <think>...</think> blocks
-        import re
-        cleaned = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
-        return cleaned.strip()
+        # Most models never emit <think>, so skip the regex for them
+        if model and not self.ollama.emits_think_tags(model, response):
+            return response.strip()
+        if '<think>' not in response:
+            return response.strip()
+        return _THINK_RE.sub('', response).strip()
 
     def generate_story(self, config: StoryConfig) -> Dict:
         """Generate story using Ollama - handles <think> tags"""
@@ -566,11 +893,15 @@ Concept: {config.prompt}"""
             self.progress_window.add_ai_message('request', prompt, 'story')
         
         try:
+            # Stream the story when there is a popup, so its title shows as soon as it is written
+            on_chunk = self._title_watcher() if self.progress_window else None
+            
             # Generate with Ollama using step-specific model - this will raise exception if it fails
             raw_response = self.ollama.generate(
                 prompt=prompt,
                 system=SYSTEM_PROMPTS['story_writer'],
-                step='story'
+                step='story',
+                on_chunk=on_chunk
             )
             
             # Log the FULL raw response (including <think> tags for display)
@@ -578,7 +909,7 @@ Concept: {config.prompt}"""
                 self.progress_window.add_ai_message('response', raw_response, 'story')
             
             # Clean the response for actual use (remove <think> tags)
-            response = self.clean_ai_response(raw_response)
+            response = self.clean_ai_response(raw_response, self.ollama.get_step_model('story')[1])
             
             if not response or len(response.strip()) < 10:
                 raise Exception("AI returned empty or invalid story content")
@@ -587,12 +918,7 @@ Concept: {config.prompt}"""
             story_id = f"story_{int(time.time())}_{random.randint(1000, 9999)}"
             
             # Extract title from response
-            lines = response.split('\n')
-            title = "Untitled Story"
-            for line in lines:
-                if 'Title:' in line or 'title:' in line:
-                    title = line.split(':', 1)[1].strip()
-                    break
+            title = self._extract_title(response) or "Untitled Story"
             
             # Update popup title
             if self.progress_window:
@@ -627,11 +953,50 @@ Concept: {config.prompt}"""
                 self.progress_window.add_ai_message('error', f"Story generation failed: {str(e)}", 'story')
             raise Exception(f"Failed to generate story: {str(e)}")
 
+    @staticmethod
+    def _extract_title(text: str) -> Optional[str]:
+        """Return the story title from a 'Title:' line, or None if there is none"""
+        match = _TITLE_RE.search(text)
+        return match.group(1).strip() if match else None
+    
+    def _title_watcher(self):
+        """Build an on_chunk callback that shows the story title once its line has streamed in"""
+        pending = ''
+        in_think = False
+        found = False
+        
+        def on_chunk(text: str):
+            nonlocal pending, in_think, found
+            if found:
+                return
+            pending += text
+            
+            # Check each completed line, skipping anything inside a <think> block
+            *lines, pending = pending.split('\n')
+            for line in lines:
+                if '<think>' in line:
+                    in_think = True
+                if '</think>' in line:
+                    in_think = False
+                    line = line.rsplit('</think>', 1)[1]
+                if in_think:
+                    continue
+                
+                title = self._extract_title(line)
+                if title:
+                    found = True
+                    self.progress_window.update_story_title(title)
+                    return
+        
+        return on_chunk
+    
     def create_shot_list(self, story: Dict, config: StoryConfig = None) -> List[Shot]:
         """Create shot list from story - handles <think> tags"""
         if not self.ollama.available:
             raise Exception("Ollama not available for shot list generation")
         
+        progress_window = self.progress_window
+        
         # Simple user prompt with story data - system prompt handles the formatting
         prompt = f"""Story: {story['title']}
 Genre: {story['genre']}
@@ -640,12 +1005,12 @@ Length: {story['length']}
 {story['content']}"""
 
         # Log FULL request
-        if self.progress_window:
-            self.progress_window.add_ai_message('request', prompt, 'shots')
+        if progress_window:
+            progress_window.add_ai_message('request', prompt, 'shots')
 
         try:
             # Generate with Ollama using step-specific model
-            raw_response = self.ollama.generate(
+            raw_response = self._generate_cached(
                 prompt=prompt,
                 system=SYSTEM_PROMPTS['shot_list_creator'],
                 temperature=0.5,
@@ -653,194 +1018,328 @@ Length: {story['length']}
             )
             
             # Log FULL raw response (including <think> for display)
-            if self.progress_window:
-                self.progress_window.add_ai_message('response', raw_response, 'shots')
+            if progress_window:
+                progress_window.add_ai_message('response', raw_response, 'shots')
             
             # Clean response for JSON parsing
-            response = self.clean_ai_response(raw_response)
+            response = self.clean_ai_response(raw_response, self.ollama.get_step_model('shots')[1])
             
             # Parse JSON response
             shots = []
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
+            json_str = _extract_json_object(response)
             
-            if json_start >= 0 and json_end > json_start:
-                json_str = response[json_start:json_end]
+            if json_str is not None:
                 try:
-                    shot_data = json.loads(json_str)
+                    shot_data = _JSON_LOADS(json_str)
                     
                     # Get FPS setting for frame calculation
-                    fps_key = config.fps if config else RENDER_SETTINGS['defaults']['fps']
-                    fps_value = RENDER_SETTINGS['fps_options'][fps_key]['value']
+                    fps_value = _FPS_VALUES[config.fps if config else _DEFAULT_FPS]
                     
-                    for shot_info in shot_data.get('shots', []):
+                    story_id = story['id']
+                    for number, shot_info in enumerate(shot_data.get('shots', []), 1):
                         duration = shot_info.get('duration', 5.0)
-                        frames = shot_info.get('frames', int(duration * fps_value))
+                        # Only derive frames from the duration when the AI didn't give them
+                        frames = shot_info['frames'] if 'frames' in shot_info else int(duration * fps_value)
                         
-                        shot = Shot(
-                            shot_number=shot_info.get('shot_number', len(shots) + 1),
-                            story_id=story['id'],
-                            description=shot_info.get('description', ''),
-                            duration=duration,
-                            frames=frames,
-                            wan_prompt="",
-                            narration=shot_info.get('narration', ''),
-                            music_cue=shot_info.get('music_cue', None)
-                        )
-                        shots.append(shot)
+                        # Positional in field order: shot_number, story_id, description, duration,
+                        # frames, wan_prompt, narration, music_cue
+                        shots.append(Shot(shot_info.get('shot_number', number), story_id,
+                                          shot_info.get('description', ''), duration, frames, "",
+                                          shot_info.get('narration', ''), shot_info.get('music_cue')))
                         
                     if shots:
-                        # Save shots to database immediately for persistence
-                        for shot in shots:
-                            shot_id = self.db.save_shot(shot)
-                            shot.id = shot_id
+                        # Save shots to database immediately for persistence (one commit)
+                        self.db.save_shots_bulk(shots)
                         
                         # Update storyboard display if progress window is available
-                        if self.progress_window:
-                            self.progress_window.update_shot_list(shots)
+                        if progress_window:
+                            progress_window.update_shot_list(shots)
                         
                         return shots
                     else:
                         raise Exception("No shots found in AI response")
                         
-                except json.JSONDecodeError as e:
-                    if self.progress_window:
-                        self.progress_window.add_ai_message('error', f"JSON parsing failed: {str(e)}\nCleaned response: {response}", 'shots')
+                except _JSON_ERRORS as e:
+                    if progress_window:
+                        progress_window.add_ai_message('error', f"JSON parsing failed: {str(e)}\nCleaned response: {response}", 'shots')
                     raise Exception(f"Invalid JSON from AI: {str(e)}")
             else:
-                if self.progress_window:
-                    self.progress_window.add_ai_message('error', f"No JSON found in cleaned AI response: {response[:200]}...", 'shots')
+                if progress_window:
+                    progress_window.add_ai_message('error', f"No JSON found in cleaned AI response: {response[:200]}...", 'shots')
                 raise Exception("AI did not return valid JSON format")
                 
         except Exception as e:
             # Re-raise instead of falling back to simulation
-            if self.progress_window:
-                self.progress_window.add_ai_message('error', f"Shot list creation failed: {str(e)}", 'shots')
+            if progress_window:
+                progress_window.add_ai_message('error', f"Shot list creation failed: {str(e)}", 'shots')
             raise Exception(f"Failed to create shot list: {str(e)}")
 
-    def generate_wan_prompt(self, shot: Shot, story_id: str = None, visual_style: str = None, characters: List[Dict] = None, locations: List[Dict] = None):
-        """Generate Wan 2.2 prompt with character consistency and visual style - handles <think> tags"""
-        if not self.ollama.available:
-            raise Exception("Ollama not available for prompt generation")
-        
+    def _stored_relevant_entities(self, story_id: str, description: str) -> Tuple[List[Dict], List[Dict]]:
+        """Look up a story's saved characters and locations that a shot description mentions"""
+        try:
+            characters = self.db.find_relevant_characters(story_id, description)
+            locations = self.db.find_relevant_locations(story_id, description)
+        except Exception as e:
+            print(f"Could not look up characters and locations for shot: {e}")
+            return [], []
+        # None means this SQLite build has no full-text index
+        return characters or [], locations or []
+    
+    def _wan_request(self, shot: Shot, story_id: str = None, characters: List[Dict] = None,
+                     locations: List[Dict] = None, entity_matcher=None) -> str:
+        """Build the user prompt for a shot's visual prompt, with the characters and locations it mentions"""
         # Build enhanced user prompt with character and location data
         prompt = f"""Shot: {shot.description}
 Duration: {shot.duration}s
 Shot #{shot.shot_number}"""
 
+        if entity_matcher is None and characters is None and locations is None and (story_id or shot.story_id):
+            # A lone shot: find the characters and locations it mentions among those saved for its story
+            relevant_characters, relevant_locations = self._stored_relevant_entities(
+                story_id or shot.story_id, shot.description
+            )
+        else:
+            entity_matcher = entity_matcher or _EntityMatcher(characters, locations)
+            relevant_characters, relevant_locations = entity_matcher.match(shot.description)
+        
         # Add character descriptions if available
-        if characters:
-            relevant_characters = []
-            for char in characters:
-                # Check if this character might appear in this shot (simple text matching)
-                char_name_lower = char['name'].lower()
-                shot_desc_lower = shot.description.lower()
-                
-                # Look for character name or role references in shot description
-                if (char_name_lower in shot_desc_lower or 
-                    any(word in shot_desc_lower for word in char_name_lower.split()) or
-                    char['role'].lower() in shot_desc_lower):
-                    relevant_characters.append(char)
-            
-            if relevant_characters:
-                prompt += "\n\nCharacter Descriptions:"
-                for char in relevant_characters:
-                    prompt += f"\n- {char['name']} ({char['role']}): {char['physical_description']}, {char['age_range']}, {char['clothing_style']}"
+        if relevant_characters:
+            prompt += "\n\nCharacter Descriptions:"
+            for char in relevant_characters:
+                prompt += f"\n- {char['name']} ({char['role']}): {char['physical_description']}, {char['age_range']}, {char['clothing_style']}"
 
         # Add location descriptions if available  
-        if locations:
-            relevant_locations = []
-            for loc in locations:
-                loc_name_lower = loc['name'].lower()
-                shot_desc_lower = shot.description.lower()
+        if relevant_locations:
+            prompt += "\n\nLocation Descriptions:"
+            for loc in relevant_locations:
+                prompt += f"\n- {loc['name']}: {loc['description']}, {loc['lighting_style']} lighting, {loc['time_of_day']}"
+        return prompt
+    
+    @staticmethod
+    def _extract_positive_prompt(response: str) -> str:
+        """Get the positive prompt from a 'Positive: ... Negative: ...' reply, or its first line"""
+        match = _POSITIVE_PROMPT_RE.search(response)
+        if match:
+            return match.group(1).strip()
+        return response.split('\n')[0].strip()
+    
+    def _finish_wan_prompt(self, shot: Shot, base_prompt: str, story_id: str = None, visual_style: str = None):
+        """Add visual style and character consistency to a shot's base visual prompt and store it"""
+        if not base_prompt:
+            raise Exception("No prompt generated from AI response")
+        
+        # Enhance with visual style
+        enhanced_prompt = base_prompt
+        if visual_style:
+            style_enhanced_prompt, style_negative = self.enhance_prompt_with_style(base_prompt, visual_style)
+            enhanced_prompt = style_enhanced_prompt
+            
+            self._add_ai_message('success', 
+                f"Enhanced shot {shot.shot_number} with {visual_style} style", 'prompts')
+        
+        # Enhance with character consistency if available
+        if story_id and self.comfyui:
+            try:
+                consistency_prompts = self.comfyui.get_shot_consistency_prompts(story_id, shot.description)
+                final_prompt = self.comfyui.enhance_shot_prompt_with_consistency(enhanced_prompt, consistency_prompts)
+                shot.wan_prompt = final_prompt
+                
+                # Update progress window with new prompt
+                self._update_shot_prompts(shot.shot_number, shot.wan_prompt)
+                
+                if consistency_prompts.get('combined_consistency'):
+                    self._add_ai_message('success', 
+                        f"Enhanced shot {shot.shot_number} with character consistency", 'prompts')
+            except Exception as consistency_error:
+                # If consistency enhancement fails, use style-enhanced prompt
+                shot.wan_prompt = enhanced_prompt
+                
+                # Update progress window with new prompt
+                self._update_shot_prompts(shot.shot_number, shot.wan_prompt)
                 
-                # Look for location references in shot description
-                if (loc_name_lower in shot_desc_lower or
-                    any(word in shot_desc_lower for word in loc_name_lower.split()) or
-                    loc['environment_type'].lower() in shot_desc_lower):
-                    relevant_locations.append(loc)
+                self._add_ai_message('error', 
+                    f"Consistency enhancement failed for shot {shot.shot_number}: {str(consistency_error)}", 'prompts')
+        else:
+            shot.wan_prompt = enhanced_prompt
             
-            if relevant_locations:
-                prompt += "\n\nLocation Descriptions:"
-                for loc in relevant_locations:
-                    prompt += f"\n- {loc['name']}: {loc['description']}, {loc['lighting_style']} lighting, {loc['time_of_day']}"
+            # Update progress window with new prompt
+            self._update_shot_prompts(shot.shot_number, shot.wan_prompt)
+    
+    def generate_wan_prompt(self, shot: Shot, story_id: str = None, visual_style: str = None, characters: List[Dict] = None,
+                            locations: List[Dict] = None, entity_matcher=None):
+        """Generate Wan 2.2 prompt with character consistency and visual style - handles <think> tags"""
+        if not self.ollama.available:
+            raise Exception("Ollama not available for prompt generation")
+        
+        prompt = self._wan_request(shot, story_id, characters, locations, entity_matcher)
 
         # Log FULL request
-        if self.progress_window:
-            self.progress_window.add_ai_message('request', prompt, 'prompts')
+        self._add_ai_message('request', prompt, 'prompts')
 
         try:
-            raw_response = self.ollama.generate(
+            raw_response = self._generate_cached(
                 prompt=prompt,
                 system=SYSTEM_PROMPTS['prompt_engineer'],
                 temperature=0.3,
-                step='prompts'
+                step='prompts',
+                stop=WAN_STOP_SEQUENCES  # only the positive prompt is used
             )
             
             # Log FULL raw response (including <think> for display)
-            if self.progress_window:
-                self.progress_window.add_ai_message('response', raw_response, 'prompts')
+            self._add_ai_message('response', raw_response, 'prompts')
             
             # Clean response for actual use
-            response = self.clean_ai_response(raw_response)
+            response = self.clean_ai_response(raw_response, self.ollama.get_step_model('prompts')[1])
             
-            # Extract positive prompt
-            if "Positive prompt:" in response:
-                base_prompt = response.split("Positive prompt:")[1].split("Negative prompt:")[0].strip()
-            else:
-                base_prompt = response.split('\n')[0].strip()
+            self._finish_wan_prompt(shot, self._extract_positive_prompt(response), story_id, visual_style)
+                
+        except Exception as e:
+            self._add_ai_message('error', f"Prompt generation failed: {str(e)}", 'prompts')
+            raise Exception(f"Failed to generate visual prompt: {str(e)}")
+    
+    def generate_shot_assets(self, shot: Shot, story_id: str = None, visual_style: str = None,
+                             characters: List[Dict] = None, locations: List[Dict] = None, entity_matcher=None):
+        """Generate a shot's visual prompt, narration and music in one Ollama call - handles <think> tags
+        
+        Falls back to the separate per-step calls if the reply isn't the expected JSON.
+        """
+        if not self.ollama.available:
+            raise Exception("Ollama not available for prompt generation")
+        
+        wants_narration = bool(shot.narration and shot.narration.strip()) and \
+            not self._asset_already_generated(shot, 'narration', shot.narration)
+        wants_music = bool(shot.music_cue and shot.music_cue.strip()) and \
+            not self._asset_already_generated(shot, 'music', shot.music_cue)
+        
+        prompt = self._wan_request(shot, story_id, characters, locations, entity_matcher)
+        if wants_narration:
+            prompt += f"\n\nExisting narration: {shot.narration}"
+        if wants_music:
+            prompt += f"\n\nMusic: {shot.music_cue}"
+        
+        # Log FULL request
+        self._add_ai_message('request', prompt, 'prompts')
+        
+        try:
+            raw_response = self._generate_cached(
+                prompt=prompt,
+                system=SYSTEM_PROMPTS['shot_asset_bundler'],
+                temperature=0.5,
+                step='prompts'
+            )
             
-            if not base_prompt:
-                raise Exception("No prompt generated from AI response")
+            # Log FULL raw response (including <think> for display)
+            self._add_ai_message('response', raw_response, 'prompts')
             
-            # Enhance with visual style
-            enhanced_prompt = base_prompt
-            if visual_style:
-                style_enhanced_prompt, style_negative = self.enhance_prompt_with_style(base_prompt, visual_style)
-                enhanced_prompt = style_enhanced_prompt
+            response = self.clean_ai_response(raw_response, self.ollama.get_step_model('prompts')[1])
+            json_str = _extract_json_object(response)
+            assets = _JSON_LOADS(json_str) if json_str is not None else None
+            if not isinstance(assets, dict) or not str(assets.get('visual') or '').strip():
+                raise ValueError("reply is not a shot asset JSON object")
+        except Exception as e:
+            self._add_ai_message('error', f"Combined shot generation failed, using separate steps: {str(e)}", 'prompts')
+            self.generate_wan_prompt(shot, story_id, visual_style, characters, locations, entity_matcher)
+            if wants_narration:
+                self.generate_elevenlabs_script(shot)
+            if wants_music:
+                self.generate_suno_prompt(shot)
+            return
+        
+        self._finish_wan_prompt(shot, str(assets['visual']).strip(), story_id, visual_style)
+        
+        # Keep the shot's own text where the reply left a field empty
+        narration = str(assets.get('narration') or '').strip()
+        if wants_narration and narration:
+            shot.narration = narration
+            self._record_asset_generated(shot, 'narration', narration)
+        music = str(assets.get('music') or '').strip()
+        if wants_music and music:
+            shot.music_cue = music
+            self._record_asset_generated(shot, 'music', music)
+    
+    def _submit_audio_requests(self, executor: ThreadPoolExecutor, shot: Shot) -> List[Future]:
+        """Submit a shot's narration and music requests, for the shots that need them"""
+        futures = []
+        
+        # Only generate narration if shot requires dialogue/narration
+        if shot.narration and shot.narration.strip() != "":
+            futures.append(executor.submit(self.generate_elevenlabs_script, shot))
+        
+        # Only generate music if shot requires background music
+        if shot.music_cue and shot.music_cue.strip() != "":
+            futures.append(executor.submit(self.generate_suno_prompt, shot))
+        return futures
+    
+    def prefetch_shot_audio(self, shots: List[Shot]) -> Dict[int, List[Future]]:
+        """Start every shot's narration and music requests in the background, keyed by shot number"""
+        if GENERATION_SETTINGS.get('fused_shot_assets'):
+            # The combined per-shot request produces them together with the visual prompt
+            return {}
+        
+        executor = ThreadPoolExecutor(max_workers=MAX_PREFETCHED_SHOT_REQUESTS)
+        prefetched = {shot.shot_number: self._submit_audio_requests(executor, shot) for shot in shots}
+        executor.shutdown(wait=False)
+        return prefetched
+    
+    def generate_all_shot_prompts(self, shots: List[Shot], story_id: str = None, visual_style: str = None,
+                                  characters: List[Dict] = None, locations: List[Dict] = None,
+                                  prefetched_audio: Dict[int, List[Future]] = None):
+        """Generate Wan, narration and music prompts for every shot concurrently, yielding shots in order
+        
+        Narration and music already started with prefetch_shot_audio are waited on instead of resubmitted.
+        """
+        if not shots:
+            return
+        prefetched_audio = prefetched_audio or {}
+        
+        # Match characters and locations against every shot with one automaton
+        entity_matcher = _EntityMatcher(characters, locations)
+        
+        # Each request only writes its own field, so all of them can run side by side;
+        # they are submitted shot by shot so the first shots finish first
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SHOT_PROMPTS) as executor:
+            shot_futures = []
+            for shot in shots:
+                if GENERATION_SETTINGS.get('fused_shot_assets'):
+                    # One combined request per shot
+                    shot_futures.append((shot, [executor.submit(self.generate_shot_assets, shot, story_id, visual_style,
+                                                                characters, locations, entity_matcher)]))
+                    continue
                 
-                if self.progress_window:
-                    self.progress_window.add_ai_message('success', 
-                        f"Enhanced shot {shot.shot_number} with {visual_style} style", 'prompts')
+                futures = [executor.submit(self.generate_wan_prompt, shot, story_id, visual_style,
+                                           characters, locations, entity_matcher)]
+                if shot.shot_number in prefetched_audio:
+                    futures.extend(prefetched_audio[shot.shot_number])
+                else:
+                    futures.extend(self._submit_audio_requests(executor, shot))
+                shot_futures.append((shot, futures))
             
-            # Enhance with character consistency if available
-            if story_id and self.comfyui:
-                try:
-                    consistency_prompts = self.comfyui.get_shot_consistency_prompts(story_id, shot.description)
-                    final_prompt = self.comfyui.enhance_shot_prompt_with_consistency(enhanced_prompt, consistency_prompts)
-                    shot.wan_prompt = final_prompt
-                    
-                    # Update progress window with new prompt
-                    if self.progress_window and hasattr(self.progress_window, 'update_shot_prompts'):
-                        self.progress_window.update_shot_prompts(shot.shot_number, shot.wan_prompt)
-                    
-                    if consistency_prompts.get('combined_consistency'):
-                        if self.progress_window:
-                            self.progress_window.add_ai_message('success', 
-                                f"Enhanced shot {shot.shot_number} with character consistency", 'prompts')
-                except Exception as consistency_error:
-                    # If consistency enhancement fails, use style-enhanced prompt
-                    shot.wan_prompt = enhanced_prompt
-                    
-                    # Update progress window with new prompt
-                    if self.progress_window and hasattr(self.progress_window, 'update_shot_prompts'):
-                        self.progress_window.update_shot_prompts(shot.shot_number, shot.wan_prompt)
-                    
-                    if self.progress_window:
-                        self.progress_window.add_ai_message('error', 
-                            f"Consistency enhancement failed for shot {shot.shot_number}: {str(consistency_error)}", 'prompts')
-            else:
-                shot.wan_prompt = enhanced_prompt
-                
-                # Update progress window with new prompt
-                if self.progress_window and hasattr(self.progress_window, 'update_shot_prompts'):
-                    self.progress_window.update_shot_prompts(shot.shot_number, shot.wan_prompt)
-                
+            for shot, futures in shot_futures:
+                for future in futures:
+                    future.result()
+                yield shot
+    
+    @staticmethod
+    def _shot_asset_hash(shot: Shot, text: str) -> str:
+        """Hash of a shot's narration or music text together with the shot it was written for"""
+        content = f"{shot.description}\x1f{text}\x1f{shot.duration}"
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _asset_already_generated(self, shot: Shot, asset: str, text: str) -> bool:
+        """Check whether a saved shot's text is exactly what its last generation produced"""
+        if shot.id is None:
+            return False
+        try:
+            return self.db.get_shot_asset_hash(shot.id, asset) == self._shot_asset_hash(shot, text)
         except Exception as e:
-            if self.progress_window:
-                self.progress_window.add_ai_message('error', f"Prompt generation failed: {str(e)}", 'prompts')
-            raise Exception(f"Failed to generate visual prompt: {str(e)}")
-
+            print(f"Could not check {asset} hash for shot {shot.shot_number}: {e}")
+            return False
+    
+    def _record_asset_generated(self, shot: Shot, asset: str, text: str):
+        """Remember (in the background) the hash of a saved shot's freshly generated text"""
+        if shot.id is not None:
+            self._write_later(self.db.set_shot_asset_hash, shot.id, asset, self._shot_asset_hash(shot, text))
+    
     def generate_elevenlabs_script(self, shot: Shot):
         """Generate ElevenLabs narration - handles <think> tags"""
         if not self.ollama.available:
@@ -848,6 +1347,10 @@ Shot #{shot.shot_number}"""
         
         # Only enhance narration if shot already has dialogue/narration content
         if shot.narration and shot.narration.strip():
+            # Narration this generator already wrote for this shot is not rewritten
+            if self._asset_already_generated(shot, 'narration', shot.narration):
+                return
+            
             # Simple user prompt with shot and existing narration data
             prompt = f"""Shot: {shot.description}
 Duration: {shot.duration}s
@@ -855,11 +1358,10 @@ Existing narration: {shot.narration}
 Shot #{shot.shot_number}"""
 
             # Log FULL request
-            if self.progress_window:
-                self.progress_window.add_ai_message('request', prompt, 'narration')
+            self._add_ai_message('request', prompt, 'narration')
 
             try:
-                raw_response = self.ollama.generate(
+                raw_response = self._generate_cached(
                     prompt=prompt,
                     system=SYSTEM_PROMPTS['narration_writer'],
                     temperature=0.7,
@@ -867,24 +1369,22 @@ Shot #{shot.shot_number}"""
                 )
                 
                 # Log FULL raw response
-                if self.progress_window:
-                    self.progress_window.add_ai_message('response', raw_response, 'narration')
+                self._add_ai_message('response', raw_response, 'narration')
                 
                 # Clean response for actual use
-                response = self.clean_ai_response(raw_response)
+                response = self.clean_ai_response(raw_response, self.ollama.get_step_model('narration')[1])
                 shot.narration = response.strip()
                 
                 if not shot.narration:
                     raise Exception("No narration generated from AI response")
+                self._record_asset_generated(shot, 'narration', shot.narration)
                     
             except Exception as e:
-                if self.progress_window:
-                    self.progress_window.add_ai_message('error', f"Narration generation failed: {str(e)}", 'narration')
+                self._add_ai_message('error', f"Narration generation failed: {str(e)}", 'narration')
                 raise Exception(f"Failed to generate narration: {str(e)}")
         else:
             # Shot doesn't require narration
-            if self.progress_window:
-                self.progress_window.add_ai_message('info', f"Shot {shot.shot_number} has no dialogue/narration content to process", 'narration')
+            self._add_ai_message('info', f"Shot {shot.shot_number} has no dialogue/narration content to process", 'narration')
 
     def generate_suno_prompt(self, shot: Shot):
         """Generate Suno music prompt - handles <think> tags"""
@@ -892,6 +1392,10 @@ Shot #{shot.shot_number}"""
             raise Exception("Ollama not available for music generation")
         
         if shot.music_cue:
+            # Music prompts this generator already wrote for this shot are not rewritten
+            if self._asset_already_generated(shot, 'music', shot.music_cue):
+                return
+            
             # Simple user prompt with shot and music data - system prompt handles specifications
             prompt = f"""Shot: {shot.description}
 Music: {shot.music_cue}
@@ -899,11 +1403,10 @@ Duration: {shot.duration}s
 Shot #{shot.shot_number}"""
 
             # Log FULL request
-            if self.progress_window:
-                self.progress_window.add_ai_message('request', prompt, 'music')
+            self._add_ai_message('request', prompt, 'music')
 
             try:
-                raw_response = self.ollama.generate(
+                raw_response = self._generate_cached(
                     prompt=prompt,
                     system=SYSTEM_PROMPTS['music_director'],
                     temperature=0.6,
@@ -911,16 +1414,15 @@ Shot #{shot.shot_number}"""
                 )
                 
                 # Log FULL raw response
-                if self.progress_window:
-                    self.progress_window.add_ai_message('response', raw_response, 'music')
+                self._add_ai_message('response', raw_response, 'music')
                 
                 # Clean response for actual use
-                response = self.clean_ai_response(raw_response)
+                response = self.clean_ai_response(raw_response, self.ollama.get_step_model('music')[1])
                 shot.music_cue = response.strip()
+                self._record_asset_generated(shot, 'music', shot.music_cue)
                 
             except Exception as e:
-                if self.progress_window:
-                    self.progress_window.add_ai_message('error', f"Music generation failed: {str(e)}", 'music')
+                self._add_ai_message('error', f"Music generation failed: {str(e)}", 'music')
                 raise Exception(f"Failed to generate music cue: {str(e)}")
     
     def generate_optimal_prompt(self) -> str:
@@ -929,37 +1431,23 @@ Shot #{shot.shot_number}"""
         
         if best_prompts:
             # Use variation of best prompt
-            base_prompt = random.choice(best_prompts[:3]) if len(best_prompts) >= 3 else best_prompts[0]
+            base_prompt = best_prompts[random.randrange(3)] if len(best_prompts) >= 3 else best_prompts[0]
             return base_prompt
         
         # Fallback prompts
-        prompts = [
-            "A mysterious stranger arrives in a small town...",
-            "Two unlikely friends embark on an adventure...",
-            "A secret from the past threatens everything...",
-            "In a world where technology has gone too far...",
-            "The last day before everything changes...",
-            "A message from the future changes everything...",
-            "Two rivals must work together to survive...",
-            "An ordinary person discovers extraordinary powers..."
-        ]
-        return random.choice(prompts)
+        return random.choice(_FALLBACK_PROMPTS)
     
     def select_optimal_genre(self) -> str:
         """Select optimal genre based on metrics"""
         genre_performance = self.db.get_genre_performance()
         
         if genre_performance:
-            # Weight selection by performance
-            genres = list(genre_performance.keys())
-            weights = [genre_performance[g]['avg_engagement'] for g in genres]
-            
-            # Normalize weights
-            total = sum(weights)
-            if total > 0:
-                weights = [w/total for w in weights]
-                selected = random.choices(genres, weights=weights)[0]
-                return selected
+            # Weight selection by performance (random.choices takes unnormalized weights)
+            genres = list(genre_performance)
+            cum_weights = list(accumulate(stats['avg_engagement'] for stats in genre_performance.values()))
+            
+            if cum_weights[-1] > 0:
+                return random.choices(genres, cum_weights=cum_weights)[0]
         
         # Fallback
         return random.choice(GENERATION_SETTINGS['genres'])
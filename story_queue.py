@@ -3,17 +3,49 @@ Story Queue Management System
 Handles batch story generation with priority management and continuous generation
 """
 
+import heapq
+import queue
+import random
 import threading
 import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from typing import Dict, List, Optional, Callable
-from dataclasses import asdict
+from dataclasses import asdict, replace
 from datetime import datetime, timedelta
 import json
 
+from config import GENERATION_SETTINGS
 from database import DatabaseManager
 from data_models import StoryConfig, QueueItem, QueueConfig
-from story_generator import StoryGenerator
+from story_generator import StoryGenerator, GenerationCancelled
 
+# Most queued writes the background writer takes in one go (and coalesces)
+DB_WRITE_BATCH = 64
+
+# Choices for randomly configured continuous-generation stories
+_GENRES = tuple(GENERATION_SETTINGS['genres'])
+_LENGTHS = ("Short", "Medium", "Long")
+
+# Automatic retries wait 2 ** attempts seconds, up to this many
+RETRY_BACKOFF_MAX = 300
+
+# Continuous generation queues at most this many stories at once; with no shots yet to
+# average over, a story is assumed to have this many
+MAX_CONTINUOUS_BATCH = 5
+DEFAULT_SHOTS_PER_STORY = 10
+
+# A story generation running longer than this (seconds) is cancelled and retried
+GENERATION_TIMEOUT = 3600
+
+# Progress for one step is written to the database at most this often (seconds)
+PROGRESS_PERSIST_INTERVAL = 0.2
+
+# Render queue counts are reused for this long (seconds) across the throttling checks
+RENDER_STATS_TTL = 0.5
+
+
+class _QueueStopped(Exception):
+    """Raised in a worker whose queue was stopped while it waited for a generation"""
 
 class StoryQueue:
     """Manages story generation queue with continuous generation and render throttling"""
@@ -23,19 +55,84 @@ class StoryQueue:
         self.story_generator = None
         self.running = False
         self.paused = False
-        self.current_queue_item = None
-        self.worker_thread = None
+        self.current_queue_items = {}  # worker index -> item it is processing
+        self._generators = {}  # worker index -> its own StoryGenerator, built from story_generator
+        self._progress_windows = {}  # queue id -> progress window showing that item
+        self.worker_threads = []
         self.progress_callback = None
         self.completion_callback = None
         self.error_callback = None
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()  # re-entered when a worker adds a continuous story
+        
+        # Idle workers wait on this instead of polling; queue changes wake them up
+        self._cv = threading.Condition(self.lock)
+        
+        # In-memory mirror of the queued items, ordered like the database queue
+        # (priority, then position); reloaded after anything reorders or adds items
+        self._queued_heap = []
+        self._queued_stale = True
+        self._next_retry_at = None  # earliest not_before of a retry still backing off
+        
+        # Progress writes from every worker go through one background writer, so workers
+        # don't contend for SQLite's write lock between Ollama calls
+        self._db_writes = queue.Queue()
+        threading.Thread(target=self._db_writer_loop, daemon=True).start()
+        
+        # (monotonic time fetched, render queue status)
+        self._render_stats_cache = (float('-inf'), {})
         
         # Load queue configuration
         self.config = self._load_config()
     
+    def _db_writer_loop(self):
+        """Apply queued database writes in order, skipping ones a later write with the same key replaces"""
+        while True:
+            writes = [self._db_writes.get()]
+            while len(writes) < DB_WRITE_BATCH:
+                try:
+                    writes.append(self._db_writes.get_nowait())
+                except queue.Empty:
+                    break
+            
+            latest = {key: index for index, (key, _, _) in enumerate(writes) if key is not None}
+            for index, (key, write, args) in enumerate(writes):
+                try:
+                    if key is None or latest[key] == index:
+                        write(*args)
+                except Exception as e:
+                    print(f"Background database write {write.__name__} failed: {e}")
+                finally:
+                    self._db_writes.task_done()
+    
+    def _write_later(self, write, *args, key=None):
+        """Queue a database write for the background writer; a later write with the same key replaces it"""
+        self._db_writes.put((key, write, args))
+    
     def set_story_generator(self, story_generator: StoryGenerator):
         """Set the story generator instance"""
-        self.story_generator = story_generator
+        with self.lock:
+            self.story_generator = story_generator
+            self._generators.clear()
+    
+    def _generator_for(self, worker: int) -> StoryGenerator:
+        """The worker's own story generator, so concurrent items don't share a progress window or writer"""
+        with self.lock:
+            generator = self._generators.get(worker)
+            if generator is None:
+                generator = StoryGenerator(self.story_generator.ollama, self.db)
+                self._generators[worker] = generator
+            return generator
+    
+    def set_progress_window(self, queue_id: int, progress_window):
+        """Show a queue item's AI messages in progress_window (None to stop), starting now if it is running"""
+        with self.lock:
+            if progress_window is None:
+                self._progress_windows.pop(queue_id, None)
+            else:
+                self._progress_windows[queue_id] = progress_window
+            for worker, item in self.current_queue_items.items():
+                if item.get('id') == queue_id:
+                    self._generators[worker].set_progress_window(progress_window)
     
     def set_callbacks(self, progress_callback: Callable = None, 
                      completion_callback: Callable = None,
@@ -59,10 +156,8 @@ class StoryQueue:
     
     def update_config(self, **kwargs):
         """Update queue configuration"""
-        config_dict = asdict(self.config)
-        config_dict.update(kwargs)
-        self.config = QueueConfig(**config_dict)
-        self.db.update_queue_config(config_dict)
+        self.config = replace(self.config, **kwargs)
+        self.db.update_queue_config(kwargs)  # only the changed settings are written
     
     def add_to_queue(self, story_config: StoryConfig, priority: int = 5, 
                     continuous: bool = False) -> int:
@@ -73,6 +168,7 @@ class StoryQueue:
         # Start processing if not already running
         if not self.running:
             self.start_processing()
+        self._queue_changed()
         
         return queue_id
     
@@ -88,14 +184,16 @@ class StoryQueue:
         """Remove item from queue"""
         with self.lock:
             # Don't remove if currently processing
-            if self.current_queue_item and self.current_queue_item.get('id') == queue_id:
+            if any(item.get('id') == queue_id for item in self.current_queue_items.values()):
                 return False
         
         return self.db.remove_from_queue(queue_id)
     
     def reorder_queue_item(self, queue_id: int, new_position: int) -> bool:
         """Reorder queue item"""
-        return self.db.reorder_queue_item(queue_id, new_position)
+        reordered = self.db.reorder_queue_item(queue_id, new_position)
+        self._queue_changed()
+        return reordered
     
     def pause_queue(self):
         """Pause queue processing"""
@@ -104,107 +202,185 @@ class StoryQueue:
     def resume_queue(self):
         """Resume queue processing"""
         self.paused = False
+        self._wake_workers()
+    
+    def notify_render_progress(self):
+        """Let workers waiting for the render queue to drain check it again"""
+        self._wake_workers()
+    
+    def _wake_workers(self):
+        """Wake every idle worker to re-check the queue"""
+        with self._cv:
+            self._cv.notify_all()
+    
+    def _queue_changed(self):
+        """Reload the queued items before the next claim and wake idle workers"""
+        with self._cv:
+            self._queued_stale = True
+            self._cv.notify_all()
+    
+    def _pop_next_item(self) -> Optional[Dict]:
+        """Pop the highest priority queued item that isn't backing off (call with the lock held)"""
+        if self._queued_stale:
+            self._queued_heap = [(-item['priority'], item['queue_position'] or 0, item['id'], item)
+                                 for item in self.db.get_queue_items('queued')]
+            heapq.heapify(self._queued_heap)
+            self._queued_stale = False
+        
+        now = time.time()
+        backing_off = []
+        next_item = None
+        while self._queued_heap:
+            entry = heapq.heappop(self._queued_heap)
+            if (entry[-1].get('not_before') or 0) > now:
+                backing_off.append(entry)
+                continue
+            next_item = entry[-1]
+            break
+        
+        # Retries still backing off go back in for a later claim
+        for entry in backing_off:
+            heapq.heappush(self._queued_heap, entry)
+        self._next_retry_at = min((entry[-1]['not_before'] for entry in backing_off), default=None)
+        return next_item
+    
+    def _idle_wait(self, timeout: float) -> float:
+        """How long an idle worker waits: timeout, or less if a retry's backoff ends sooner"""
+        if self._next_retry_at is None:
+            return timeout
+        return min(timeout, max(0.0, self._next_retry_at - time.time()))
     
     def start_processing(self):
-        """Start queue processing thread"""
+        """Start one queue processing thread per allowed concurrent generation"""
         if not self.running and self.story_generator:
             self.running = True
-            self.worker_thread = threading.Thread(target=self._process_queue, daemon=True)
-            self.worker_thread.start()
+            self._queued_stale = True
+            self.worker_threads = [
+                threading.Thread(target=self._process_queue, args=(worker,), daemon=True)
+                for worker in range(max(1, self.config.max_concurrent_generations))
+            ]
+            for worker_thread in self.worker_threads:
+                worker_thread.start()
     
     def stop_processing(self):
         """Stop queue processing"""
         self.running = False
-        if self.worker_thread and self.worker_thread.is_alive():
-            self.worker_thread.join(timeout=5)
+        self._wake_workers()
+        for worker_thread in self.worker_threads:
+            if worker_thread.is_alive():
+                worker_thread.join(timeout=5)
     
-    def _process_queue(self):
-        """Main queue processing loop"""
+    def _process_queue(self, worker: int = 0):
+        """Main queue processing loop for one worker"""
+        cv, db, current_queue_items = self._cv, self.db, self.current_queue_items
         while self.running:
             try:
                 if self.paused:
-                    time.sleep(1)
+                    with cv:
+                        cv.wait(timeout=1)
                     continue
                 
                 # Check if we should wait for render queue to clear
                 if self._should_wait_for_render_queue():
-                    time.sleep(5)
+                    with cv:
+                        cv.wait(timeout=5)
                     continue
                 
-                # Get next queue item
-                with self.lock:
-                    next_item = self.db.get_next_queue_item()
+                # Take the next queue item off the shared heap, so no other worker picks it up
+                with cv:
+                    next_item = self._pop_next_item()
                     if not next_item:
                         # No items to process
-                        if self.config.continuous_enabled:
-                            self._maybe_add_continuous_story()
-                        time.sleep(2)
+                        if self.config.continuous_enabled and self._maybe_add_continuous_story():
+                            continue  # claim one of the new stories straight away
+                        cv.wait(timeout=self._idle_wait(2))  # releases the lock while waiting
                         continue
-                    
-                    self.current_queue_item = next_item
+                
+                # Mark it processing outside the lock, so other workers aren't held up by the
+                # write; items removed or started elsewhere since the heap was loaded are skipped
+                if not db.claim_queue_item(next_item['id']):
+                    continue
+                generator = self._generator_for(worker)
+                with cv:
+                    current_queue_items[worker] = next_item
+                    generator.set_progress_window(self._progress_windows.get(next_item['id']))
                 
                 # Process the item
-                self._process_queue_item(next_item)
+                try:
+                    self._process_queue_item(next_item, generator)
+                finally:
+                    with cv:
+                        current_queue_items.pop(worker, None)
+                        generator.set_progress_window(None)
                 
             except Exception as e:
                 print(f"Error in queue processing: {e}")
                 if self.error_callback:
                     self.error_callback(f"Queue processing error: {e}")
                 time.sleep(5)
-            finally:
-                with self.lock:
-                    self.current_queue_item = None
+    
+    def _get_render_stats(self) -> Dict:
+        """Get the render queue status, fetched at most once per RENDER_STATS_TTL"""
+        fetched_at, render_stats = self._render_stats_cache
+        now = time.monotonic()
+        if now - fetched_at >= RENDER_STATS_TTL:
+            render_stats = self.db.get_render_queue_status()
+            self._render_stats_cache = (now, render_stats)
+        return render_stats
     
     def _should_wait_for_render_queue(self) -> bool:
         """Check if we should wait for render queue to clear"""
-        if not self.config.continuous_enabled:
+        config = self.config  # one snapshot; update_config swaps in a new object
+        if not config.continuous_enabled:
             return False
         
-        render_stats = self.db.get_render_queue_status()
+        render_stats = self._get_render_stats()
         queued_renders = render_stats.get('queued', 0)
         
         # If render queue is above high threshold, wait
-        return queued_renders >= self.config.render_queue_high_threshold
+        return queued_renders >= config.render_queue_high_threshold
     
-    def _maybe_add_continuous_story(self):
-        """Add a new story for continuous generation if conditions are met"""
-        if not self.config.continuous_enabled:
-            return
+    def _maybe_add_continuous_story(self) -> bool:
+        """Add new stories for continuous generation if conditions are met; True if any were added"""
+        config = self.config
+        if not config.continuous_enabled:
+            return False
         
         # Check render queue level
-        render_stats = self.db.get_render_queue_status()
+        render_stats = self._get_render_stats()
         queued_renders = render_stats.get('queued', 0)
         
-        if queued_renders >= self.config.render_queue_low_threshold:
-            return  # Still too many in render queue
+        if queued_renders >= config.render_queue_low_threshold:
+            return False  # Still too many in render queue
         
         # Check if we already have enough queued items
         queue_stats = self.get_queue_statistics()
         if queue_stats.get('queued', 0) > 0:
-            return  # Already have items queued
+            return False  # Already have items queued
         
-        # Generate a random story config for continuous generation
-        from config import GENRE_PROMPTS
-        import random
+        # Queue enough stories to refill the render queue to the low threshold in one go
+        shots_per_story = self.db.get_average_shots_per_story() or DEFAULT_SHOTS_PER_STORY
+        deficit = config.render_queue_low_threshold - queued_renders
+        story_count = min(MAX_CONTINUOUS_BATCH, max(1, int(deficit // shots_per_story)))
         
-        genres = list(GENRE_PROMPTS.keys())
-        lengths = ["Short", "Medium", "Long"]
-        
-        random_config = StoryConfig(
+        # Generate random story configs for continuous generation
+        random_configs = [asdict(StoryConfig(
             prompt="Auto-generated story",
-            genre=random.choice(genres),
-            length=random.choice(lengths),
+            genre=random.choice(_GENRES),
+            length=random.choice(_LENGTHS),
             auto_prompt=True,
             auto_genre=True,
             auto_length=True,
             auto_style=True
-        )
+        )) for _ in range(story_count)]
         
         # Add to queue with continuous flag
-        self.add_to_queue(random_config, priority=3, continuous=True)
+        self.db.add_to_story_queue_bulk(random_configs, priority=3, continuous=True)
+        self._queue_changed()
+        return True
     
-    def _process_queue_item(self, queue_item: Dict):
-        """Process a single queue item"""
+    def _process_queue_item(self, queue_item: Dict, generator: StoryGenerator):
+        """Process a single queue item with the worker's story generator"""
         queue_id = queue_item['id']
         story_config_dict = queue_item['story_config']
         
@@ -212,23 +388,29 @@ class StoryQueue:
             # Convert dict back to StoryConfig
             story_config = StoryConfig(**story_config_dict)
             
-            # Update status to processing
-            self.db.update_queue_item_status(
-                queue_id, 'processing', 'story_generation'
-            )
-            
+            # Status was set to processing when the item was claimed
             if self.progress_callback:
                 self.progress_callback(queue_id, 'processing', 'story_generation', {})
             
+            # Step the story generator last reported, for labelling log messages
+            current_step = ['processing']
+            last_persisted = [float('-inf')]
+            
             # Set up progress callback for story generator
             def story_progress_callback(progress, text):
                 progress_data = {
                     'progress': progress,
                     'current_step': text
                 }
-                self.db.update_queue_item_status(
-                    queue_id, 'processing', text, progress_data
-                )
+                
+                # Every new step is saved; repeated ticks of one step only every PROGRESS_PERSIST_INTERVAL
+                now = time.monotonic()
+                if text != current_step[0] or now - last_persisted[0] >= PROGRESS_PERSIST_INTERVAL:
+                    self._write_later(self.db.update_queue_item_status, queue_id, 'processing', text, progress_data,
+                                      key=('progress', queue_id))
+                    last_persisted[0] = now
+                current_step[0] = text
+                
                 if self.progress_callback:
                     self.progress_callback(queue_id, 'processing', text, progress_data)
             
@@ -239,25 +421,29 @@ class StoryQueue:
                     # Send log messages as AI messages to the progress window
                     progress_data = {
                         'progress': 0,  # Will be updated by progress callback
-                        'current_step': text if 'text' in locals() else 'processing',
+                        'current_step': current_step[0],
                         'ai_message': {
                             'type': log_type.lower(),
                             'content': message,
-                            'step': text if 'text' in locals() else 'processing'
+                            'step': current_step[0]
                         }
                     }
                     self.progress_callback(queue_id, 'processing', 'ai_message', progress_data)
             
             # Generate the complete story (story + shots)
-            story_data, shots = self.story_generator.generate_complete_story(
-                story_config, progress_callback=story_progress_callback, log_callback=log_callback
-            )
+            cancel_event = threading.Event()
+            story_data, shots = self._await_generation(self._start_generation(
+                generator, queue_id, story_config, story_progress_callback, log_callback, cancel_event
+            ), cancel_event)
+            
+            # Progress writes must land before the final status
+            self._db_writes.join()
             
             if story_data and shots:
                 # Update with completion
                 self.db.update_queue_item_status(
                     queue_id, 'completed', 'completed', 
-                    {'story_data': story_data, 'shots': [shot.__dict__ for shot in shots]}, story_data.get('id')
+                    {'story_data': story_data, 'shots': [asdict(shot) for shot in shots]}, story_data.get('id')
                 )
                 
                 # Add shots to render queue
@@ -272,15 +458,22 @@ class StoryQueue:
                     error="Story generation returned no data"
                 )
                 
+        except _QueueStopped:
+            # Stopped mid-generation: the item runs again from the start next time
+            self._db_writes.join()
+            self.db.update_queue_item_status(queue_id, 'queued', 'interrupted')
+            self._queue_changed()
+        
         except Exception as e:
+            self._db_writes.join()
             error_msg = str(e)
             attempts = self.db.increment_queue_attempts(queue_id)
             
             if attempts < queue_item.get('max_attempts', 3) and self.config.retry_failed_items:
-                # Retry later
-                self.db.update_queue_item_status(
-                    queue_id, 'queued', 'retry_pending', error=error_msg
-                )
+                # Retry later, backing off exponentially so a persistent failure doesn't
+                # keep taking the worker from other items
+                self.db.schedule_queue_retry(queue_id, time.time() + min(RETRY_BACKOFF_MAX, 2 ** attempts), error_msg)
+                self._queue_changed()
             else:
                 # Max attempts reached
                 self.db.update_queue_item_status(
@@ -290,33 +483,62 @@ class StoryQueue:
             if self.error_callback:
                 self.error_callback(f"Queue item {queue_id} failed: {error_msg}")
     
+    def _start_generation(self, generator: StoryGenerator, queue_id: int, story_config: StoryConfig,
+                          progress_callback: Callable, log_callback: Callable,
+                          cancel_event: threading.Event) -> Future:
+        """Run a complete story generation on its own daemon thread"""
+        generation = Future()
+        
+        def generate():
+            try:
+                generation.set_result(generator.generate_complete_story(
+                    story_config, progress_callback=progress_callback, log_callback=log_callback,
+                    cancel_event=cancel_event
+                ))
+            except BaseException as e:
+                generation.set_exception(e)
+        
+        # A daemon thread, so an abandoned generation never holds up exiting the app
+        threading.Thread(target=generate, name=f"storygen-{queue_id}", daemon=True).start()
+        return generation
+    
+    def _await_generation(self, generation: Future, cancel_event: threading.Event):
+        """Wait for a generation's result, cancelling it if the queue stops or it passes GENERATION_TIMEOUT"""
+        deadline = time.monotonic() + GENERATION_TIMEOUT
+        while True:
+            try:
+                return generation.result(timeout=1)
+            except FutureTimeoutError:
+                if self.running and time.monotonic() < deadline:
+                    continue
+            
+            # The item is only requeued or retried once the generation thread has stopped, so it
+            # can't save the same story alongside its next run; until then the worker keeps it claimed
+            cancel_event.set()
+            try:
+                return generation.result()  # it may have finished before seeing the cancel
+            except GenerationCancelled:
+                if not self.running:
+                    raise _QueueStopped()
+                raise TimeoutError(f"Story generation took longer than {GENERATION_TIMEOUT} seconds")
+    
     def get_current_processing_item(self) -> Optional[Dict]:
-        """Get currently processing queue item"""
+        """Get the longest-running currently processing queue item"""
+        items = self.get_current_processing_items()
+        return items[0] if items else None
+    
+    def get_current_processing_items(self) -> List[Dict]:
+        """Get all currently processing queue items, oldest claim first"""
         with self.lock:
-            return self.current_queue_item.copy() if self.current_queue_item else None
+            return [item.copy() for item in self.current_queue_items.values()]
     
     def clear_completed_items(self, older_than_days: int = None):
-        """Clear completed queue items"""
-        if older_than_days is None:
-            # Clear all completed items immediately (for UI calls)
-            cursor = self.db.conn.cursor()
-            cursor.execute('''
-                DELETE FROM story_queue 
-                WHERE status IN ('completed', 'failed')
-            ''')
-            self.db.conn.commit()
-            return cursor.rowcount
-        else:
-            # Clear only old completed items (for maintenance)
-            return self.db.clear_completed_queue_items(older_than_days)
+        """Clear completed queue items (all of them for UI calls, only old ones for maintenance)"""
+        return self.db.clear_completed_queue_items(older_than_days)
     
     def get_queue_item_by_story_id(self, story_id: str) -> Optional[Dict]:
         """Get queue item by associated story ID"""
-        items = self.db.get_queue_items()
-        for item in items:
-            if item.get('story_id') == story_id:
-                return item
-        return None
+        return self.db.get_queue_item_by_story_id(story_id)
     
     def retry_failed_item(self, queue_id: int) -> bool:
         """Retry a failed queue item"""
@@ -325,6 +547,7 @@ class StoryQueue:
             self.db.update_queue_item_status(
                 queue_id, 'queued', 'retry_manual', error=None
             )
+            self._queue_changed()
             return True
         except Exception as e:
             print(f"Error retrying queue item {queue_id}: {e}")
@@ -339,6 +562,7 @@ class StoryQueue:
                 UPDATE story_queue SET priority = ? WHERE id = ?
             ''', (new_priority, queue_id))
             self.db.conn.commit()
+            self._queue_changed()
             return True
         except Exception as e:
             print(f"Error updating priority for queue item {queue_id}: {e}")
@@ -356,10 +580,8 @@ class StoryQueue:
             cursor.execute('SELECT id FROM shots WHERE story_id = ?', (story_id,))
             shot_rows = cursor.fetchall()
             
-            # Add each shot to render queue
-            for shot_row in shot_rows:
-                shot_id = shot_row[0]
-                self.db.add_to_render_queue(shot_id, priority=5)
+            # Add every shot to render queue in one transaction
+            self.db.add_shots_to_render_queue([shot_row[0] for shot_row in shot_rows], priority=5)
             
             print(f"Added {len(shot_rows)} shots to render queue for story {story_id}")
             
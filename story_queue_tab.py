@@ -3,16 +3,190 @@ Story Queue Tab GUI Component
 Provides interface for managing story generation queue
 """
 
+import math
+import queue
+import re
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from typing import Dict, List, Callable, Optional
 
 from story_queue import StoryQueue
 from data_models import StoryConfig, QueueConfig
 from generation_progress_popup import GenerationProgressWindow
 
+# Auto-refresh interval (ms) while the tab is shown and while it is hidden. While the queue is
+# active (progress, completions or list changes within ACTIVE_WINDOW_S) the shown tab refreshes
+# faster; after IDLE_AFTER_S without activity it slows down
+REFRESH_INTERVAL_MS = 2000
+ACTIVE_REFRESH_INTERVAL_MS = 500
+IDLE_REFRESH_INTERVAL_MS = 10000
+HIDDEN_REFRESH_INTERVAL_MS = 5000
+ACTIVE_WINDOW_S = 5
+IDLE_AFTER_S = 60
+
+# Worker-thread callbacks are drained on the Tk thread this often (ms); progress is applied at most once per drain
+EVENT_PUMP_MS = 100
+
+# Queue statistics younger than this (s) are reused rather than queried again
+STATS_MAX_AGE_S = 0.1
+
+# Delay (ms) over which requested refreshes are collapsed into one
+REFRESH_COALESCE_MS = 50
+
+# Queue errors reported within this delay (ms) share one dialog, which lists at most MAX_ERRORS_SHOWN
+ERROR_COALESCE_MS = 500
+MAX_ERRORS_SHOWN = 20
+
+# Row inserts/deletes in one refresh above which the tree's columns are hidden while it is rebuilt
+BULK_TREE_UPDATE_ROWS = 20
+
+# Rows formatted beyond each edge of the visible part of the queue tree
+ROW_OVERSCAN = 8
+
+# Queue tree columns (after the '#0' id column) and their initial widths
+QUEUE_COLUMNS = ('Position', 'Priority', 'Story Name', 'Genre', 'Length', 'Status', 'Current Step',
+                 'Progress', 'Actions', 'Created', 'Started', 'ETA')
+QUEUE_COLUMN_WIDTHS = {
+    'Position': 60, 'Priority': 60, 'Story Name': 150, 'Genre': 80, 'Length': 60,
+    'Status': 80, 'Current Step': 120, 'Progress': 100, 'Actions': 100,
+    'Created': 80, 'Started': 80, 'ETA': 80
+}
+_STATUS_COL = QUEUE_COLUMNS.index('Status')
+_STEP_COL = QUEUE_COLUMNS.index('Current Step')
+_PROGRESS_COL = QUEUE_COLUMNS.index('Progress')
+
+# Row background per queue item status
+QUEUE_STATUS_COLORS = {
+    'processing': 'lightblue',
+    'completed': 'lightgreen',
+    'failed': 'lightcoral',
+    'paused': 'lightyellow',
+}
+
+# story_queue columns compared between refreshes to tell whether the list needs redrawing
+_ID_FIELD = itemgetter('id')
+_STORY_ID_FIELD = itemgetter('story_id')
+_SNAPSHOT_FIELDS = tuple(map(itemgetter, (
+    'status', 'current_step', 'priority', 'queue_position', 'started_at', 'estimated_completion')))
+
+
+# Step description -> progress window step key, first match wins. Based on the actual
+# step descriptions from story_generator.py, then looser single-word fallbacks.
+_STEP_PATTERNS = tuple((re.compile(pattern), key) for pattern, key in (
+    (r'selecting optimal|optimal prompt', 'story'),  # Prompt selection is part of story generation
+    (r'generating story|story with ai', 'story'),
+    (r'breaking story|shot list|into shots', 'shots'),
+    (r'analyzing characters|characters and locations', 'characters'),
+    (r'processing style|style sheet', 'style'),
+    (r'processing shot|generating prompts|wan', 'prompts'),
+    (r'generating narration|elevenlabs', 'narration'),
+    (r'generating music|suno|music cue', 'music'),
+    (r'completed|finished', 'queue'),
+    (r'story', 'story'),
+    (r'shot', 'shots'),
+    (r'character', 'characters'),
+    (r'prompt', 'prompts'),
+    (r'narration', 'narration'),
+    (r'music', 'music'),
+    (r'queue|render|complet', 'queue'),
+))
+
+# Progress window steps in generation order
+_STEP_ORDER = ('story', 'shots', 'characters', 'style', 'prompts', 'narration', 'music', 'queue')
+_STEP_INDEX = {step: i for i, step in enumerate(_STEP_ORDER)}
+# Detail shown for a step once a later one has moved past it
+_STEP_COMPLETE_MSG = {step: f'{step.title()} completed' for step in _STEP_ORDER}
+
+# Global progress range of each step, based on actual story_generator.py values, for
+# scaling progress within the step
+_STEP_RANGES_CONVERT = {
+    'story': (0, 25),      # Prompt selection (10) + Story generation (15-25)
+    'shots': (25, 40),     # Shot list creation (30) + Character analysis starts (40)
+    'characters': (40, 45), # Character analysis (40-42) + ComfyUI prompts + Style (45)
+    'style': (45, 50),     # Style processing (45) + Shot processing starts
+    'prompts': (50, 95),   # Shot processing with prompts (50-95)
+    'narration': (95, 99), # Part of finalization (95)
+    'music': (99, 100),    # Part of completion (100)
+    'queue': (100, 100)    # Queue completion (100)
+}
+# ... as (start, end, width), with the fallback for unknown steps
+_STEP_SPANS = {step: (lo, hi, hi - lo) for step, (lo, hi) in _STEP_RANGES_CONVERT.items()}
+_DEFAULT_STEP_SPAN = (0, 100, 100)
+
+# ... and past whose end an earlier step is marked completed (the ends ascend in step order)
+_STEP_RANGES_AUTOCOMPLETE = {
+    'story': (0, 25),
+    'shots': (25, 30),
+    'characters': (30, 45),
+    'style': (45, 50),
+    'prompts': (50, 85),
+    'narration': (85, 95),
+    'music': (95, 98),
+    'queue': (98, 100)
+}
+
+
+@lru_cache(maxsize=256)
+def _step_key(step_name: str) -> str:
+    """Progress window step key for a step description"""
+    step_lower = step_name.lower()
+    for pattern, key in _STEP_PATTERNS:
+        if pattern.search(step_lower):
+            return key
+    return 'story'  # Default fallback
+
+
+# Step description keyword -> step_model_assignments key of the model running it. The lookaheads,
+# matched at the start, are tried in keyword priority order (not by position in the text), so the first
+# keyword present anywhere in the description wins
+_STEP_MODEL_RE = re.compile(
+    r'(?=.*(?P<story>story))|(?=.*(?P<shots>shot))|(?=.*(?P<characters>character))'
+    r'|(?=.*(?P<prompts>prompt))|(?=.*(?P<style>style))',
+    re.IGNORECASE | re.DOTALL)
+
+
+@lru_cache(maxsize=256)
+def _step_model_key(step_name: str) -> Optional[str]:
+    """Model assignment key for a step description, if it names one"""
+    match = _STEP_MODEL_RE.match(step_name)
+    return match.lastgroup if match else None
+
+
+@lru_cache(maxsize=512)
+def _format_clock_time(time_str: str) -> str:
+    """Format a stored timestamp as HH:MM"""
+    if not time_str:
+        return '-'
+    try:
+        dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
+        return dt.strftime('%H:%M')
+    except:
+        return '-'
+
+
+@lru_cache(maxsize=101)
+def _progress_bar(percent: int) -> str:
+    """Text progress bar for a whole percentage"""
+    bar_length = 15
+    filled_length = bar_length * percent // 100
+    bar = '█' * filled_length + '░' * (bar_length - filled_length)
+    return f"{bar} {percent}%"
+
+
+@dataclass(slots=True)
+class _QueueRow:
+    """A queue tree row's values and tags, and the item fields they were formatted from (if cached)"""
+    values: tuple
+    tags: tuple
+    key: Optional[tuple] = field(default=None, compare=False)
+
 
 class StoryQueueTab:
     """GUI component for story queue management"""
@@ -20,17 +194,58 @@ class StoryQueueTab:
     def __init__(self, parent_frame, story_queue: StoryQueue, 
                  story_generator=None, db_manager=None, main_app=None):
         self.parent_frame = parent_frame
+        self._toplevel = parent_frame.winfo_toplevel()
         self.story_queue = story_queue
         self.story_generator = story_generator
         self.db = db_manager
         self.main_app = main_app
         
-        # Progress windows for each queue item
+        # Progress windows for each queue item, and the StoryConfig each was opened with
         self.progress_windows = {}
+        self._story_configs: Dict[int, StoryConfig] = {}
+        # Per queue id: how many leading steps its progress window already shows as auto-completed
+        self._completed_steps: Dict[int, int] = {}
+        
+        # The add-story dialog, built on first use and then hidden / shown again
+        self._add_story_dialog: Optional['AddStoryDialog'] = None
         
         # Refresh timer
         self.refresh_timer = None
         
+        # Last (values, tags) written per queue id, and story titles already looked up
+        self._row_state: Dict[int, Optional[_QueueRow]] = {}
+        self._story_names: Dict[str, str] = {}
+        
+        # Per queue id: the row last formatted for it, keyed by the fields it was formatted from
+        self._row_render_cache: Dict[int, _QueueRow] = {}
+        self._last_stats: Optional[Dict] = None
+        self._stats_cache = (0.0, None)  # (monotonic time fetched, stats)
+        self._prev_columns: Optional[tuple] = None
+        
+        # Every queue item in display order; only rows near the viewport are formatted,
+        # the rest stay as blank placeholders (None in _row_state) until scrolled to
+        self._all_items: List[Dict] = []
+        self._items_by_id: Dict[int, Dict] = {}
+        self._row_order: List[int] = []
+        
+        # Refreshes skipped while the tab was hidden (replayed once it is shown), and whether one is already scheduled
+        self._dirty = False
+        self._pending_refresh_id = None
+        
+        # When the queue last showed signs of life, for picking the auto-refresh interval
+        self._last_activity = time.monotonic()
+        
+        # Queries from the Tk thread go over their own read-only connection
+        self._ro_conn = self.story_queue.db.open_read_only_connection()
+        
+        # Queue callbacks arrive on worker threads; they only enqueue here and _pump handles them on the Tk thread
+        self._event_q = queue.Queue()
+        self._pump_timer = None
+        
+        # Errors waiting to be shown together, and the pending after() that shows them
+        self._pending_errors: List[str] = []
+        self._error_flush_id = None
+        
         # Setup UI
         self.setup_ui()
         
@@ -41,13 +256,27 @@ class StoryQueueTab:
             error_callback=self.on_queue_error
         )
         
-        # Start auto-refresh
+        # Start auto-refresh and the callback pump
         self.start_auto_refresh()
+        self._pump()
+    
+    @property
+    def story_generator(self):
+        """The story generator whose Ollama nodes are shown in the progress windows"""
+        return self._story_generator
+    
+    @story_generator.setter
+    def story_generator(self, story_generator):
+        self._story_generator = story_generator
+        # Bound here, not per progress event: the Ollama manager lookup of the (instance, model) assigned to a step
+        self._get_step_model = getattr(getattr(story_generator, 'ollama', None), 'get_step_model', None)
     
     def setup_ui(self):
         """Setup the queue tab UI"""
         main_frame = ttk.Frame(self.parent_frame, padding="10")
         main_frame.pack(fill='both', expand=True)
+        main_frame.bind('<Visibility>', self._on_visibility)
+        main_frame.bind('<Destroy>', lambda event: self.destroy())
         
         # Title
         title_label = ttk.Label(main_frame, text="Story Generation Queue", 
@@ -75,30 +304,28 @@ class StoryQueueTab:
         left_frame = ttk.Frame(control_frame)
         left_frame.pack(side='left', fill='x', expand=True)
         
-        # Add to queue button
+        # Add to queue button, then queue management buttons
         ttk.Button(left_frame, text="➕ Add Story to Queue", 
                   command=self.add_story_to_queue,
                   style='Accent.TButton').pack(side='left', padx=(0, 5))
-        
-        # Queue management buttons
-        ttk.Button(left_frame, text="⏸️ Pause Queue", 
-                  command=self.pause_queue).pack(side='left', padx=2)
-        
-        ttk.Button(left_frame, text="▶️ Resume Queue", 
-                  command=self.resume_queue).pack(side='left', padx=2)
-        
-        ttk.Button(left_frame, text="🔄 Refresh", 
-                  command=self.refresh_queue_display).pack(side='left', padx=2)
+        self._pack_buttons(left_frame, (
+            ("⏸️ Pause Queue", self.pause_queue),
+            ("▶️ Resume Queue", self.resume_queue),
+            ("🔄 Refresh", self.refresh_queue_display),
+        ))
         
         # Right side - Cleanup controls
         right_frame = ttk.Frame(control_frame)
         right_frame.pack(side='right')
-        
-        ttk.Button(right_frame, text="🗑️ Clear Completed", 
-                  command=self.clear_completed_items).pack(side='left', padx=2)
-        
-        ttk.Button(right_frame, text="🗑️ Clear All", 
-                  command=self.clear_all_items).pack(side='left', padx=2)
+        self._pack_buttons(right_frame, (
+            ("🗑️ Clear Completed", self.clear_completed_items),
+            ("🗑️ Clear All", self.clear_all_items),
+        ))
+    
+    def _pack_buttons(self, parent, buttons):
+        """Pack a row of (text, command) buttons left to right"""
+        for text, command in buttons:
+            ttk.Button(parent, text=text, command=command).pack(side='left', padx=2)
     
     def setup_statistics_panel(self, parent):
         """Setup queue statistics display"""
@@ -142,29 +369,22 @@ class StoryQueueTab:
         queue_frame.pack(fill='both', expand=True, pady=(0, 10))
         
         # Create treeview for queue items
-        columns = ('Position', 'Priority', 'Story Name', 'Genre', 'Length', 'Status', 'Current Step', 
-                  'Progress', 'Actions', 'Created', 'Started', 'ETA')
-        
-        self.queue_tree = ttk.Treeview(queue_frame, columns=columns, show='tree headings', height=12)
+        self._columns = QUEUE_COLUMNS
+        self.queue_tree = ttk.Treeview(queue_frame, columns=self._columns, show='tree headings', height=12)
         
         # Configure columns
         self.queue_tree.heading('#0', text='ID')
         self.queue_tree.column('#0', width=50, minwidth=50)
         
-        column_widths = {
-            'Position': 60, 'Priority': 60, 'Story Name': 150, 'Genre': 80, 'Length': 60,
-            'Status': 80, 'Current Step': 120, 'Progress': 100, 'Actions': 100,
-            'Created': 80, 'Started': 80, 'ETA': 80
-        }
-        
-        for col in columns:
+        for col in self._columns:
             self.queue_tree.heading(col, text=col)
-            self.queue_tree.column(col, width=column_widths.get(col, 100), minwidth=50)
+            self.queue_tree.column(col, width=QUEUE_COLUMN_WIDTHS.get(col, 100), minwidth=50)
         
         # Scrollbars
         v_scrollbar = ttk.Scrollbar(queue_frame, orient='vertical', command=self.queue_tree.yview)
         h_scrollbar = ttk.Scrollbar(queue_frame, orient='horizontal', command=self.queue_tree.xview)
-        self.queue_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self._v_scrollbar = v_scrollbar
+        self.queue_tree.configure(yscrollcommand=self._on_yscroll, xscrollcommand=h_scrollbar.set)
         
         # Pack treeview and scrollbars
         self.queue_tree.grid(row=0, column=0, sticky='nsew')
@@ -181,6 +401,10 @@ class StoryQueueTab:
         self.queue_tree.bind('<Double-1>', self.on_queue_item_double_click)
         self.queue_tree.bind('<Button-3>', self.show_context_menu)
         self.queue_tree.bind('<Button-1>', self.on_queue_item_click)
+        
+        # Configure tag colors
+        for status, color in QUEUE_STATUS_COLORS.items():
+            self.queue_tree.tag_configure(status, background=color)
     
     def setup_context_menu(self):
         """Setup right-click context menu for queue items"""
@@ -238,8 +462,8 @@ class StoryQueueTab:
         ttk.Button(right_col, text="💾 Save Config", 
                   command=self.save_queue_config).pack(pady=10)
         
-        # Load current config
-        self.load_queue_config()
+        # Load current config once the tab has been drawn
+        config_frame.after_idle(self.load_queue_config)
     
     def load_queue_config(self):
         """Load current queue configuration"""
@@ -276,7 +500,11 @@ class StoryQueueTab:
     
     def add_story_to_queue(self):
         """Show dialog to add story to queue"""
-        AddStoryDialog(self.parent_frame, self.story_queue, self.refresh_queue_display)
+        dialog = self._add_story_dialog
+        if dialog is not None and dialog.dialog.winfo_exists():
+            dialog.show()
+        else:
+            self._add_story_dialog = AddStoryDialog(self.parent_frame, self.story_queue, self.refresh_queue_display)
     
     def pause_queue(self):
         """Pause queue processing"""
@@ -308,6 +536,7 @@ class StoryQueueTab:
                 cursor = self.story_queue.db.conn.cursor()
                 cursor.execute("DELETE FROM story_queue")
                 self.story_queue.db.conn.commit()
+                self._clear_queue_rows()
                 
                 # Restart queue processing
                 self.story_queue.start_processing()
@@ -321,10 +550,12 @@ class StoryQueueTab:
         """Refresh the queue display"""
         try:
             # Update statistics
-            stats = self.story_queue.get_queue_statistics()
-            for key, label in self.stats_labels.items():
-                count = stats.get(key, 0)
-                label.config(text=f"{key.title()}: {count}")
+            stats = self._get_stats_cached()
+            if stats != self._last_stats:
+                for key, label in self.stats_labels.items():
+                    count = stats.get(key, 0)
+                    label.config(text=f"{key.title()}: {count}")
+                self._last_stats = stats
             
             # Update current processing info
             current_item = self.story_queue.get_current_processing_item()
@@ -336,82 +567,179 @@ class StoryQueueTab:
             else:
                 self.current_processing_label.config(text="No items currently processing", foreground='gray')
             
-            # Update queue list
-            for item in self.queue_tree.get_children():
-                self.queue_tree.delete(item)
-            
+            # Update queue list in place: only touch rows that were added, removed, moved or changed
             queue_items = self.story_queue.get_queue_items()
-            for item in queue_items:
-                self._add_queue_item_to_tree(item)
+            ids = tuple(map(_ID_FIELD, queue_items))
+            new_by_id = dict(zip(ids, queue_items))
+            self._items_by_id = new_by_id
+            titles = self._get_story_titles(queue_items)
+            
+            # Nothing shown in the list changed since the last refresh: leave the tree alone.
+            # The snapshot is kept column by column so each field is gathered and compared in one pass
+            columns = (ids,) + tuple(tuple(map(field, queue_items)) for field in _SNAPSHOT_FIELDS) + (
+                tuple(item['progress_data'].get('progress') for item in queue_items),
+                tuple(map(titles.get, map(_STORY_ID_FIELD, queue_items))))
+            if columns == self._prev_columns:
+                return
+            self._last_activity = time.monotonic()
+            
+            removed = self._row_state.keys() - new_by_id.keys()
+            added = len(new_by_id.keys() - self._row_state.keys())
+            lo, hi = self._visible_range(len(queue_items))
+            with self._frozen_tree(len(removed) + added > BULK_TREE_UPDATE_ROWS):
+                for queue_id in removed:
+                    self.queue_tree.delete(str(queue_id))
+                    del self._row_state[queue_id]
+                    self._row_render_cache.pop(queue_id, None)
+                    self._story_configs.pop(queue_id, None)
+                
+                for index, item in enumerate(queue_items):
+                    if item['id'] not in self._row_state:
+                        self._add_queue_item_to_tree(item, titles, index, placeholder=not lo <= index < hi)
+                
+                # Reordered rows are put in place with one set_children call rather than a move per row
+                order = list(ids)
+                if order != self._row_order:
+                    self.queue_tree.set_children('', *map(str, order))
+                    self._row_order = order
+                
+                self._all_items = queue_items
+                self._render_rows(*self._visible_range(len(queue_items)))
+            self._prev_columns = columns
                 
         except Exception as e:
             print(f"Error refreshing queue display: {e}")
             import traceback
             traceback.print_exc()
     
-    def _add_queue_item_to_tree(self, item: Dict):
-        """Add a queue item to the treeview"""
+    def _visible_range(self, count: int) -> tuple:
+        """Indices of the rows in or near the tree's viewport"""
+        first, last = self.queue_tree.yview()
+        # yview fractions are of the rows currently in the tree, which may be about to change
+        shown = max(int(self.queue_tree.cget('height')), math.ceil((last - first) * len(self._row_state)))
+        lo = int(first * count)
+        return max(0, lo - ROW_OVERSCAN), min(count, lo + shown + ROW_OVERSCAN)
+    
+    def _render_rows(self, lo: int, hi: int):
+        """Format and write the rows in [lo, hi) that are placeholders or out of date"""
+        for item in self._all_items[lo:hi]:
+            queue_id = item['id']
+            row = self._queue_item_row(item, self._story_names)
+            if row != self._row_state.get(queue_id):
+                self.queue_tree.item(str(queue_id), values=row.values, tags=row.tags)
+                self._row_state[queue_id] = row
+    
+    def _on_yscroll(self, first, last):
+        """Keep the scrollbar in sync and fill in rows scrolled into view"""
+        self._v_scrollbar.set(first, last)
+        if self._all_items:
+            self._render_rows(*self._visible_range(len(self._all_items)))
+    
+    @contextmanager
+    def _frozen_tree(self, bulk: bool = True):
+        """Hide the tree's columns during a bulk update so Tk lays it out once, not per row"""
+        if not bulk:
+            yield
+            return
+        self.queue_tree.configure(displaycolumns=())
         try:
-            config = item['story_config']
-            
-            # Get story name if available
-            story_name = "Generating..."
-            if item.get('story_id'):
-                # Try to get the actual story title from the database
-                try:
-                    cursor = self.story_queue.db.conn.cursor()
-                    cursor.execute('SELECT title FROM stories WHERE id = ?', (item['story_id'],))
-                    result = cursor.fetchone()
-                    if result:
-                        story_name = result[0][:25] + "..." if len(result[0]) > 25 else result[0]
-                except:
-                    story_name = "Story Generated"
-            
-            # Format progress with bar
-            progress_data = item.get('progress_data', {})
-            progress_percent = progress_data.get('progress', 0)
-            progress_text = self._create_progress_bar(progress_percent)
-            
-            # Format times
-            created_time = self._format_time(item.get('created_at', ''))
-            started_time = self._format_time(item.get('started_at', '')) if item.get('started_at') else '-'
-            eta_time = self._format_time(item.get('estimated_completion', '')) if item.get('estimated_completion') else '-'
-            
-            # Determine row color based on status
-            tags = []
-            status = item['status']
-            if status == 'processing':
-                tags.append('processing')
-            elif status == 'completed':
-                tags.append('completed')
-            elif status == 'failed':
-                tags.append('failed')
-            elif status == 'paused':
-                tags.append('paused')
-            
-            item_id = self.queue_tree.insert('', 'end', 
-                                  text=str(item['id']),
-                                  values=(
-                                      item.get('queue_position', '-'),
-                                      item['priority'],
-                                      story_name,
-                                      config.get('genre', 'Unknown'),
-                                      config.get('length', 'Unknown'),
-                                      status.title(),
-                                      item.get('current_step', 'pending'),
-                                      progress_text,
-                                      "📊 View",  # Actions column
-                                      created_time,
-                                      started_time,
-                                      eta_time
-                                  ),
-                                  tags=tags)
-            
-            # Configure tag colors
-            self.queue_tree.tag_configure('processing', background='lightblue')
-            self.queue_tree.tag_configure('completed', background='lightgreen')
-            self.queue_tree.tag_configure('failed', background='lightcoral')
-            self.queue_tree.tag_configure('paused', background='lightyellow')
+            yield
+        finally:
+            self.queue_tree.configure(displaycolumns=self._columns)
+            self.queue_tree.update_idletasks()
+    
+    def _clear_queue_rows(self):
+        """Remove every row from the queue tree"""
+        with self._frozen_tree():
+            self.queue_tree.delete(*self.queue_tree.get_children())
+        self._row_state.clear()
+        self._row_render_cache.clear()
+        self._story_configs.clear()
+        self._all_items = []
+        self._items_by_id = {}
+        self._prev_columns = None
+        self._row_order = []
+    
+    def _get_stats_cached(self, max_age: float = STATS_MAX_AGE_S) -> Dict:
+        """Get queue statistics, reusing a snapshot taken within the last max_age seconds"""
+        now = time.monotonic()
+        fetched_at, stats = self._stats_cache
+        if stats is None or now - fetched_at >= max_age:
+            stats = self.story_queue.get_queue_statistics()
+            self._stats_cache = (now, stats)
+        return stats
+    
+    def _get_story_titles(self, queue_items: List[Dict]) -> Dict[str, str]:
+        """Get display titles for the items' stories, looking up any not seen yet in one query"""
+        missing = {item['story_id'] for item in queue_items
+                   if item.get('story_id') and item['story_id'] not in self._story_names}
+        if missing:
+            try:
+                for story_id, title in self.story_queue.db.get_story_titles(missing, self._ro_conn).items():
+                    if title:
+                        self._story_names[story_id] = title[:25] + "..." if len(title) > 25 else title
+            except Exception as e:
+                print(f"Error loading story titles: {e}")
+        return self._story_names
+    
+    def _queue_item_row(self, item: Dict, titles: Dict[str, str]) -> _QueueRow:
+        """Build the row shown for a queue item, reusing the last one if its fields are unchanged"""
+        config = item['story_config']
+        
+        # Get story name if available
+        story_name = "Generating..."
+        if item.get('story_id'):
+            story_name = titles.get(item['story_id'], story_name)
+        
+        progress_data = item.get('progress_data', {})
+        progress_percent = progress_data.get('progress', 0)
+        key = (item.get('queue_position'), item['priority'], story_name,
+               config.get('genre'), config.get('length'), item['status'], item.get('current_step'),
+               progress_percent, item.get('created_at'), item.get('started_at'), item.get('estimated_completion'))
+        cached = self._row_render_cache.get(item['id'])
+        if cached and cached.key == key:
+            return cached
+        
+        # Format progress with bar
+        progress_text = self._create_progress_bar(progress_percent)
+        
+        # Format times
+        created_time = self._format_time(item.get('created_at', ''))
+        started_time = self._format_time(item.get('started_at', '')) if item.get('started_at') else '-'
+        eta_time = self._format_time(item.get('estimated_completion', '')) if item.get('estimated_completion') else '-'
+        
+        # Determine row color based on status
+        status = item['status']
+        tags = (status,) if status in QUEUE_STATUS_COLORS else ()
+        
+        values = (
+            item.get('queue_position', '-'),
+            item['priority'],
+            story_name,
+            config.get('genre', 'Unknown'),
+            config.get('length', 'Unknown'),
+            status.title(),
+            item.get('current_step', 'pending'),
+            progress_text,
+            "📊 View",  # Actions column
+            created_time,
+            started_time,
+            eta_time
+        )
+        row = self._row_render_cache[item['id']] = _QueueRow(values, tags, key)
+        return row
+    
+    def _add_queue_item_to_tree(self, item: Dict, titles: Dict[str, str], index='end', placeholder: bool = False):
+        """Add a queue item to the treeview, as a blank placeholder row if it is off screen"""
+        try:
+            row = None if placeholder else self._queue_item_row(item, titles)
+            # The queue id doubles as the Tk iid so refreshes can address rows directly
+            self.queue_tree.insert('', index,
+                                   iid=str(item['id']),
+                                   text=str(item['id']),
+                                   values=row.values if row else (),
+                                   tags=row.tags if row else ())
+            self._row_state[item['id']] = row
             
         except Exception as e:
             print(f"Error adding queue item to tree: {e}")
@@ -420,13 +748,7 @@ class StoryQueueTab:
     
     def _format_time(self, time_str: str) -> str:
         """Format timestamp for display"""
-        if not time_str:
-            return '-'
-        try:
-            dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-            return dt.strftime('%H:%M')
-        except:
-            return '-'
+        return _format_clock_time(time_str) if isinstance(time_str, str) else '-'
     
     def _create_progress_bar(self, percent: float) -> str:
         """Create a text-based progress bar"""
@@ -434,19 +756,11 @@ class StoryQueueTab:
             percent = 0
         
         # Ensure percent is between 0 and 100
-        percent = max(0, min(100, percent))
-        
-        # Create progress bar (20 characters wide)
-        bar_length = 15
-        filled_length = int(bar_length * percent / 100)
-        bar = '█' * filled_length + '░' * (bar_length - filled_length)
-        
-        return f"{bar} {percent:.0f}%"
+        return _progress_bar(max(0, min(100, round(percent))))
     
     def on_queue_item_click(self, event):
         """Handle single click on queue item - check if Actions column clicked"""
-        item = self.queue_tree.selection()[0] if self.queue_tree.selection() else None
-        if not item:
+        if self._selected_item_id() is None:
             return
             
         # Get the column that was clicked
@@ -467,19 +781,14 @@ class StoryQueueTab:
     
     def view_item_progress(self):
         """View progress for selected queue item"""
-        selection = self.queue_tree.selection()
-        if not selection:
+        item_id = self._selected_item_id()
+        if item_id is None:
             return
         
-        item_id = int(self.queue_tree.item(selection[0], 'text'))
-        
-        # Find the queue item
-        queue_items = self.story_queue.get_queue_items()
-        queue_item = None
-        for item in queue_items:
-            if item['id'] == item_id:
-                queue_item = item
-                break
+        # Find the queue item, as of the last refresh if it was in it
+        queue_item = self._items_by_id.get(item_id)
+        if queue_item is None:
+            queue_item = next((item for item in self.story_queue.get_queue_items() if item['id'] == item_id), None)
         
         if not queue_item:
             messagebox.showerror("Error", "Queue item not found.")
@@ -499,34 +808,31 @@ class StoryQueueTab:
     def _create_progress_window(self, queue_item: Dict):
         """Create progress window for queue item"""
         try:
-            # Create a fake config from the queue item for the progress window
-            from data_models import StoryConfig
-            config = queue_item['story_config']
-            story_config = StoryConfig(**config) if isinstance(config, dict) else config
-            
-            # Get root window from parent frame
-            parent = self.parent_frame
-            while parent and not hasattr(parent, 'master'):
-                parent = parent.master if hasattr(parent, 'master') else None
-            if not parent:
-                parent = self.parent_frame.winfo_toplevel()
+            # Create a fake config from the queue item for the progress window, once per item
+            story_config = self._story_configs.get(queue_item['id'])
+            if story_config is None:
+                config = queue_item['story_config']
+                story_config = StoryConfig(**config) if isinstance(config, dict) else config
+                self._story_configs[queue_item['id']] = story_config
             
             # Create a new window for this queue item  
             def on_window_close():
                 # Remove reference when window closes
                 if item_id in self.progress_windows:
                     del self.progress_windows[item_id]
+                self._completed_steps.pop(item_id, None)
+                self.story_queue.set_progress_window(item_id, None)
             
             # The GenerationProgressWindow now creates the window automatically in __init__
-            progress_window = GenerationProgressWindow(parent, story_config, on_complete_callback=on_window_close, db_manager=self.db)
+            progress_window = GenerationProgressWindow(self._toplevel, story_config, on_complete_callback=on_window_close, db_manager=self.db)
             
             # Store reference
             item_id = queue_item['id']
             self.progress_windows[item_id] = progress_window
+            self._completed_steps.pop(item_id, None)
             
-            # Set the progress window on the story generator so AI messages are logged
-            if self.story_generator:
-                self.story_generator.progress_window = progress_window
+            # Route the AI messages of the generator running this item (and only this item) to the window
+            self.story_queue.set_progress_window(item_id, progress_window)
             
             # Set window title
             config = queue_item['story_config']
@@ -545,29 +851,26 @@ class StoryQueueTab:
     
     def _load_queue_item_data(self, progress_window, queue_item: Dict, title: str):
         """Load existing data for a queue item into the progress window"""
-        if queue_item.get('status') == 'completed' and queue_item.get('story_id'):
-            # Load story data from database
+        completed = queue_item.get('status') == 'completed' and queue_item.get('story_id')
+        
+        # Load story data from database (for completed and processing items alike)
+        story_dict, shots_dicts = None, []
+        if queue_item.get('story_id') and (completed or queue_item.get('current_step')):
             try:
-                cursor = self.db.conn.cursor()
-                cursor.execute('SELECT * FROM stories WHERE id = ?', (queue_item['story_id'],))
-                story_row = cursor.fetchone()
-                if story_row:
-                    # Convert row to dict (assuming we know the column order)
-                    story_dict = dict(zip([col[0] for col in cursor.description], story_row))
-                    progress_window.update_story_title(story_dict.get('title', title))
-                    progress_window.update_story_content(story_dict)
-                    # Mark all steps as completed
-                    for step in ['story', 'shots', 'characters', 'style', 'prompts', 'narration', 'music', 'queue']:
-                        progress_window.update_step(step, 100, 'completed', 'Generation completed')
-                    
-                    # Load shots if available
-                    cursor.execute('SELECT * FROM shots WHERE story_id = ?', (queue_item['story_id'],))
-                    shots_rows = cursor.fetchall()
-                    if shots_rows:
-                        shots_dicts = [dict(zip([col[0] for col in cursor.description], row)) for row in shots_rows]
-                        progress_window.update_shot_list(shots_dicts)
+                story_dict, shots_dicts = self._fetch_story_with_shots(queue_item['story_id'])
             except Exception as e:
-                print(f"Error loading completed story data: {e}")
+                print(f"Error loading story data: {e}")
+        
+        if completed:
+            if story_dict:
+                progress_window.update_story_title(story_dict.get('title', title))
+                progress_window.update_story_content(story_dict)
+                # Mark all steps as completed
+                progress_window.mark_all_completed('Generation completed')
+                
+                # Load shots if available
+                if shots_dicts:
+                    progress_window.update_shot_list(shots_dicts)
         
         elif queue_item.get('current_step'):
             # Update with current progress
@@ -580,151 +883,71 @@ class StoryQueueTab:
             progress_window.update_step(step_key, progress_value, status, step)
             
             # Auto-complete previous steps based on current progress
-            self._auto_complete_previous_steps(progress_window, progress_value, step_key)
+            self._auto_complete_previous_steps(queue_item['id'], progress_window, progress_value, step_key)
             
             # Update node information for current step
-            try:
-                step_models = {
-                    'story': 'story',
-                    'shot': 'shots',
-                    'character': 'characters',
-                    'style': 'style'
-                }
-                
-                for key, model_key in step_models.items():
-                    if key in step.lower():
-                        if hasattr(self.story_generator.ollama, 'step_model_assignments'):
-                            instance_key, model_name = self.story_generator.ollama.step_model_assignments.get(model_key, (None, None))
-                            if instance_key and model_name:
-                                progress_window.update_step_node_info(step_key, instance_key, 'OLLAMA', model_name)
-                        break
-            except Exception as e:
-                print(f"Error setting initial node info: {e}")
+            self._update_node_info(progress_window, step_key, step)
             
-            # Try to load existing story data if available (for processing items)
-            if queue_item.get('story_id'):
-                try:
-                    cursor = self.db.conn.cursor()
-                    cursor.execute('SELECT * FROM stories WHERE id = ?', (queue_item['story_id'],))
-                    story_row = cursor.fetchone()
-                    if story_row:
-                        story_dict = dict(zip([col[0] for col in cursor.description], story_row))
-                        if story_dict.get('title'):
-                            progress_window.update_story_title(story_dict['title'])
-                        if story_dict.get('content'):
-                            progress_window.update_story_content(story_dict)
-                        
-                        # Load shots if available
-                        cursor.execute('SELECT * FROM shots WHERE story_id = ?', (queue_item['story_id'],))
-                        shots_rows = cursor.fetchall()
-                        if shots_rows:
-                            shots_dicts = [dict(zip([col[0] for col in cursor.description], row)) for row in shots_rows]
-                            progress_window.update_shot_list(shots_dicts)
-                except Exception as e:
-                    print(f"Error loading processing story data: {e}")
+            # Show existing story data if available (for processing items)
+            if story_dict:
+                if story_dict.get('title'):
+                    progress_window.update_story_title(story_dict['title'])
+                if story_dict.get('content'):
+                    progress_window.update_story_content(story_dict)
+                
+                # Load shots if available
+                if shots_dicts:
+                    progress_window.update_shot_list(shots_dicts)
+    
+    def _fetch_story_with_shots(self, story_id: str) -> tuple:
+        """Get a story row and its shot rows as dicts, reading the shots only if the story exists"""
+        cursor = self._ro_conn.cursor()
+        cursor.execute('SELECT * FROM stories WHERE id = ?', (story_id,))
+        story_row = cursor.fetchone()
+        if not story_row:
+            return None, []
+        story_dict = dict(story_row)
+        cursor.execute('SELECT * FROM shots WHERE story_id = ? ORDER BY shot_number', (story_id,))
+        return story_dict, [dict(row) for row in cursor.fetchall()]
     
     def _map_step_to_key(self, step_name: str) -> str:
         """Map step name to progress window step key"""
-        step_lower = step_name.lower()
-        
-        # Map based on the actual step descriptions from story_generator.py
-        if 'selecting optimal' in step_lower or 'optimal prompt' in step_lower:
-            return 'story'  # Prompt selection is part of story generation
-        elif 'generating story' in step_lower or 'story with ai' in step_lower:
-            return 'story'
-        elif 'breaking story' in step_lower or 'shot list' in step_lower or 'into shots' in step_lower:
-            return 'shots'
-        elif 'analyzing characters' in step_lower or 'characters and locations' in step_lower:
-            return 'characters'
-        elif 'processing style' in step_lower or 'style sheet' in step_lower:
-            return 'style'
-        elif 'processing shot' in step_lower or 'generating prompts' in step_lower or 'wan' in step_lower:
-            return 'prompts'
-        elif 'generating narration' in step_lower or 'elevenlabs' in step_lower:
-            return 'narration'
-        elif 'generating music' in step_lower or 'suno' in step_lower or 'music cue' in step_lower:
-            return 'music'
-        elif 'completed' in step_lower or 'finished' in step_lower:
-            return 'queue'
-        else:
-            # Try fallback patterns
-            if 'story' in step_lower:
-                return 'story'
-            elif 'shot' in step_lower:
-                return 'shots' 
-            elif 'character' in step_lower:
-                return 'characters'
-            elif 'prompt' in step_lower:
-                return 'prompts'
-            elif 'narration' in step_lower:
-                return 'narration'
-            elif 'music' in step_lower:
-                return 'music'
-            elif 'queue' in step_lower or 'render' in step_lower or 'complet' in step_lower:
-                return 'queue'
-            else:
-                return 'story'  # Default fallback
+        return _step_key(step_name)
     
     def _convert_global_to_step_progress(self, global_progress: int, step_key: str, current_step: str) -> int:
         """Convert global progress percentage to step-specific progress (0-100)"""
-        # Define the global progress ranges for each step based on actual story_generator.py values
-        step_ranges = {
-            'story': (0, 25),      # Prompt selection (10) + Story generation (15-25)
-            'shots': (25, 40),     # Shot list creation (30) + Character analysis starts (40)
-            'characters': (40, 45), # Character analysis (40-42) + ComfyUI prompts + Style (45)
-            'style': (45, 50),     # Style processing (45) + Shot processing starts
-            'prompts': (50, 95),   # Shot processing with prompts (50-95)
-            'narration': (95, 99), # Part of finalization (95)
-            'music': (99, 100),    # Part of completion (100)
-            'queue': (100, 100)    # Queue completion (100)
-        }
-        
-        # Get the range for this step
-        step_range = step_ranges.get(step_key, (0, 100))
-        min_progress, max_progress = step_range
+        min_progress, max_progress, span = _STEP_SPANS.get(step_key, _DEFAULT_STEP_SPAN)
         
         # Special handling for steps that might be completed in one update
         if global_progress >= max_progress:
             return 100  # Step is complete
-        elif global_progress < min_progress:
+        if global_progress < min_progress:
             return 0    # Step hasn't started yet
-        else:
-            # Calculate progress within the step's range
-            range_size = max_progress - min_progress
-            if range_size <= 0:
-                return 100
-            progress_in_range = global_progress - min_progress
-            step_progress = (progress_in_range / range_size) * 100
-            return min(100, max(0, int(step_progress)))
-    
-    def _auto_complete_previous_steps(self, window, global_progress: int, current_step_key: str):
+        # Within the step's range, so span > 0 and the result is already 0-99
+        return int((global_progress - min_progress) * 100 // span)
+    
+    def _auto_complete_previous_steps(self, queue_id: int, window, global_progress: int, current_step_key: str):
         """Auto-complete previous steps when global progress moves past their ranges"""
-        step_order = ['story', 'shots', 'characters', 'style', 'prompts', 'narration', 'music', 'queue']
-        step_ranges = {
-            'story': (0, 25),
-            'shots': (25, 30),
-            'characters': (30, 45),
-            'style': (45, 50),
-            'prompts': (50, 85),
-            'narration': (85, 95),
-            'music': (95, 98),
-            'queue': (98, 100)
-        }
-        
         # Find current step index
-        try:
-            current_index = step_order.index(current_step_key)
-        except ValueError:
+        current_index = _STEP_INDEX.get(current_step_key)
+        if current_index is None:
             return  # Unknown step
         
-        # Complete all previous steps that should be done by now
-        for i in range(current_index):
-            prev_step = step_order[i]
-            prev_range = step_ranges.get(prev_step, (0, 100))
-            
+        # Steps complete in order, so only the ones after those already marked need checking;
+        # a step that is processing again (e.g. a retry) and everything after it are unmarked
+        done = min(self._completed_steps.get(queue_id, 0), current_index)
+        for prev_step in _STEP_ORDER[done:current_index]:
             # If global progress is past this step's range, mark it complete
-            if global_progress > prev_range[1]:
-                window.update_step(prev_step, 100, 'completed', f'{prev_step.title()} completed')
+            if global_progress <= _STEP_RANGES_AUTOCOMPLETE[prev_step][1]:
+                break
+            window.update_step(prev_step, 100, 'completed', _STEP_COMPLETE_MSG[prev_step])
+            done += 1
+        self._completed_steps[queue_id] = done
+    
+    def _selected_item_id(self) -> Optional[int]:
+        """Queue id of the selected row (rows use the queue id as their iid)"""
+        selection = self.queue_tree.selection()
+        return int(selection[0]) if selection else None
     
     def increase_priority(self):
         """Increase priority of selected item"""
@@ -736,25 +959,22 @@ class StoryQueueTab:
     
     def _change_priority(self, delta: int):
         """Change priority of selected item"""
-        selection = self.queue_tree.selection()
-        if not selection:
+        queue_item = self._items_by_id.get(self._selected_item_id())
+        if not queue_item:
             return
         
-        item_id = int(self.queue_tree.item(selection[0], 'text'))
-        current_priority = int(self.queue_tree.item(selection[0], 'values')[1])
-        new_priority = max(1, min(10, current_priority + delta))
+        item_id = queue_item['id']
+        new_priority = max(1, min(10, queue_item['priority'] + delta))
         
         if self.story_queue.update_item_priority(item_id, new_priority):
             self.refresh_queue_display()
     
     def retry_item(self):
         """Retry failed item"""
-        selection = self.queue_tree.selection()
-        if not selection:
+        item_id = self._selected_item_id()
+        if item_id is None:
             return
         
-        item_id = int(self.queue_tree.item(selection[0], 'text'))
-        
         if self.story_queue.retry_failed_item(item_id):
             messagebox.showinfo("Success", "Item queued for retry.")
             self.refresh_queue_display()
@@ -767,12 +987,10 @@ class StoryQueueTab:
     
     def remove_item(self):
         """Remove item from queue"""
-        selection = self.queue_tree.selection()
-        if not selection:
+        item_id = self._selected_item_id()
+        if item_id is None:
             return
         
-        item_id = int(self.queue_tree.item(selection[0], 'text'))
-        
         if messagebox.askyesno("Remove Item", "Remove this item from the queue?"):
             if self.story_queue.remove_from_queue(item_id):
                 self.refresh_queue_display()
@@ -781,6 +999,70 @@ class StoryQueueTab:
     
     def on_queue_progress(self, queue_id: int, status: str, current_step: str, progress_data: Dict):
         """Handle queue progress updates"""
+        self._last_activity = time.monotonic()
+        self._event_q.put(('progress', (queue_id, status, current_step, progress_data)))
+    
+    def on_queue_completion(self, queue_id: int, story_data: Dict):
+        """Handle queue item completion"""
+        self._last_activity = time.monotonic()
+        self._event_q.put(('completion', (queue_id, story_data)))
+    
+    def on_queue_error(self, error_message: str):
+        """Handle queue errors"""
+        self._event_q.put(('error', (error_message,)))
+    
+    def _pump(self):
+        """Drain callbacks queued by worker threads and handle them on the Tk thread"""
+        # AI messages are all kept in order; step progress only needs the latest per item
+        updates = {}
+        try:
+            while True:
+                kind, args = self._event_q.get_nowait()
+                if kind == 'progress':
+                    queue_id, status, current_step, progress_data = args
+                    if current_step == 'ai_message':
+                        self._apply_progress(queue_id, current_step, progress_data)
+                    else:
+                        updates[queue_id] = (status, current_step, progress_data)
+                    continue
+                
+                # Progress reported before a completion or error must not land after it
+                self._apply_updates(updates)
+                updates = {}
+                if kind == 'completion':
+                    self._handle_completion(*args)
+                else:
+                    self._handle_error(*args)
+        except queue.Empty:
+            pass
+        except Exception as e:
+            print(f"Error handling queue callback: {e}")
+        finally:
+            self._pump_timer = self.parent_frame.after(EVENT_PUMP_MS, self._pump)
+            self._apply_updates(updates)
+    
+    def _apply_updates(self, updates: Dict[int, tuple]):
+        """Apply coalesced progress updates to the progress windows and queue rows"""
+        for queue_id, (status, current_step, progress_data) in updates.items():
+            self._apply_progress(queue_id, current_step, progress_data)
+            self._update_queue_row(queue_id, status, current_step, progress_data)
+    
+    def _update_queue_row(self, queue_id: int, status: str, current_step: str, progress_data: Dict):
+        """Patch the status, step and progress columns of a row already in the tree"""
+        row = self._row_state.get(queue_id)
+        if row is None:
+            return
+        values = list(row.values)
+        values[_STATUS_COL] = status.title()
+        values[_STEP_COL] = current_step
+        values[_PROGRESS_COL] = self._create_progress_bar(progress_data.get('progress', 0))
+        row = _QueueRow(tuple(values), (status,) if status in QUEUE_STATUS_COLORS else ())
+        if row != self._row_state[queue_id]:
+            self.queue_tree.item(str(queue_id), values=row.values, tags=row.tags)
+            self._row_state[queue_id] = row
+    
+    def _apply_progress(self, queue_id: int, current_step: str, progress_data: Dict):
+        """Forward a progress update to the item's progress window"""
         # Update progress window if it exists
         if queue_id in self.progress_windows:
             window = self.progress_windows[queue_id]
@@ -802,42 +1084,28 @@ class StoryQueueTab:
                 step_progress = self._convert_global_to_step_progress(progress_value, step_key, current_step)
                 
                 # Auto-complete previous steps based on global progress
-                self._auto_complete_previous_steps(window, progress_value, step_key)
+                self._auto_complete_previous_steps(queue_id, window, progress_value, step_key)
                 
                 window.update_step(step_key, step_progress, 'processing', current_step)
                 
                 # Update node info if we can determine the node
-                try:
-                    if hasattr(self.story_generator, 'ollama') and hasattr(self.story_generator.ollama, 'step_model_assignments'):
-                        # Determine which step we're on and show appropriate node
-                        step_models = {
-                            'story': 'story',
-                            'shot': 'shots', 
-                            'character': 'characters',
-                            'prompt': 'prompts',
-                            'style': 'style'
-                        }
-                        
-                        for key, model_key in step_models.items():
-                            if key in current_step.lower():
-                                instance_key, model_name = self.story_generator.ollama.step_model_assignments.get(model_key, (None, None))
-                                if instance_key and model_name:
-                                    window.update_step_node_info(step_key, instance_key, 'OLLAMA', model_name)
-                                break
-                except:
-                    pass  # Ignore node info errors
-        
-        # Schedule immediate refresh of main display to show progress updates
-        self.parent_frame.after(10, self.refresh_queue_display)
+                self._update_node_info(window, step_key, current_step)
     
-    def on_queue_completion(self, queue_id: int, story_data: Dict):
-        """Handle queue item completion"""
+    def _update_node_info(self, window, step_key: str, step: str):
+        """Show which Ollama node and model run a step, if the step names one with an assignment"""
+        model_key = _step_model_key(step)
+        if model_key and self._get_step_model:
+            instance_key, model_name = self._get_step_model(model_key)
+            if instance_key and model_name:
+                window.update_step_node_info(step_key, instance_key, 'OLLAMA', model_name)
+    
+    def _handle_completion(self, queue_id: int, story_data: Dict):
+        """Show a finished queue item in its progress window and the queue list"""
         # Update progress window
         if queue_id in self.progress_windows:
             window = self.progress_windows[queue_id]
             # Mark all steps as completed
-            for step in ['story', 'shots', 'characters', 'style', 'prompts', 'narration', 'music', 'queue']:
-                window.update_step(step, 100, 'completed', 'Generation completed')
+            window.mark_all_completed('Generation completed')
             
             # Add completion message
             window.add_ai_message('success', 'Story generation completed successfully!', 'completion')
@@ -854,8 +1122,8 @@ class StoryQueueTab:
                 window.update_shot_list(shots)
                 window.add_ai_message('success', f"Created {len(shots)} shots for the story", 'shots')
         
-        # Refresh display immediately
-        self.parent_frame.after(10, self.refresh_queue_display)
+        # Refresh display promptly
+        self._schedule_refresh()
         
         # Check if this was the last item in queue and auto-randomize for next generation
         self.parent_frame.after(50, self._maybe_auto_randomize_after_completion)
@@ -864,7 +1132,7 @@ class StoryQueueTab:
         """Auto-randomize inputs if queue is now empty"""
         try:
             # Check if there are any more queued items
-            queue_stats = self.story_queue.get_queue_statistics()
+            queue_stats = self._get_stats_cached()
             queued_count = queue_stats.get('queued', 0)
             processing_count = queue_stats.get('processing', 0)
             
@@ -876,15 +1144,73 @@ class StoryQueueTab:
         except Exception as e:
             print(f"Error in auto-randomization: {e}")
     
-    def on_queue_error(self, error_message: str):
-        """Handle queue errors"""
-        # Show error in a non-blocking way
-        self.parent_frame.after(100, lambda: messagebox.showerror("Queue Error", error_message))
+    def _handle_error(self, error_message: str):
+        """Report a queue error, together with any others that arrive shortly after it"""
+        self._pending_errors.append(error_message)
+        if self._error_flush_id is None:
+            self._error_flush_id = self.parent_frame.after(ERROR_COALESCE_MS, self._flush_errors)
+    
+    def _flush_errors(self):
+        """Show the collected queue errors in one dialog"""
+        errors, self._pending_errors = self._pending_errors, []
+        self._error_flush_id = None
+        if len(errors) == 1:
+            messagebox.showerror("Queue Error", errors[0])
+            return
+        message = "\n".join(errors[:MAX_ERRORS_SHOWN])
+        if len(errors) > MAX_ERRORS_SHOWN:
+            message += f"\n... and {len(errors) - MAX_ERRORS_SHOWN} more"
+        messagebox.showerror("Queue Errors", message)
     
     def start_auto_refresh(self):
         """Start automatic refresh timer"""
+        visible = self._refresh_if_visible()
+        idle = time.monotonic() - self._last_activity
+        if idle < ACTIVE_WINDOW_S:
+            interval = ACTIVE_REFRESH_INTERVAL_MS
+        elif idle < IDLE_AFTER_S:
+            interval = REFRESH_INTERVAL_MS
+        else:
+            interval = IDLE_REFRESH_INTERVAL_MS
+        if not visible:
+            interval = max(interval, HIDDEN_REFRESH_INTERVAL_MS)
+        self.refresh_timer = self.parent_frame.after(interval, self.start_auto_refresh)
+    
+    def _schedule_refresh(self):
+        """Refresh soon, folding any other requests made in the meantime into the same refresh"""
+        if self._pending_refresh_id:
+            return
+        self._pending_refresh_id = self.parent_frame.after(REFRESH_COALESCE_MS, self._do_refresh)
+    
+    def _do_refresh(self):
+        """Run a refresh requested through _schedule_refresh"""
+        self._pending_refresh_id = None
+        self._refresh_if_visible()
+    
+    def _refresh_if_visible(self) -> bool:
+        """Refresh now if the tab is shown, otherwise defer it until it is; returns visibility"""
+        if not self.parent_frame.winfo_viewable():
+            self._dirty = True
+            return False
+        self._dirty = False
         self.refresh_queue_display()
-        self.refresh_timer = self.parent_frame.after(2000, self.start_auto_refresh)  # Refresh every 2 seconds for better responsiveness
+        return True
+    
+    def _on_visibility(self, event):
+        """Catch up on refreshes skipped while the tab was hidden"""
+        if self._dirty:
+            self._refresh_if_visible()
+    
+    def destroy(self):
+        """Cancel every pending Tk callback and release the tab's database connection"""
+        for after_id in (self.refresh_timer, self._pending_refresh_id, self._pump_timer, self._error_flush_id):
+            if after_id:
+                try:
+                    self.parent_frame.after_cancel(after_id)
+                except tk.TclError:
+                    pass
+        self.refresh_timer = self._pending_refresh_id = self._pump_timer = self._error_flush_id = None
+        self._ro_conn.close()
     
     def stop_auto_refresh(self):
         """Stop automatic refresh timer"""
@@ -900,20 +1226,43 @@ class AddStoryDialog:
         self.story_queue = story_queue
         self.refresh_callback = refresh_callback
         
-        # Create dialog window
+        self.parent = parent
+        
+        # Create dialog window; closing it only hides it so the next "Add" reuses the widgets
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Add Story to Queue")
         self.dialog.geometry("500x600")
         self.dialog.transient(parent)
-        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.hide)
         
         self.setup_dialog()
+        self.show()
+    
+    def show(self):
+        """Reset the fields and show the dialog centered on its parent"""
+        self.prompt_text.delete("1.0", tk.END)
+        self.genre_var.set("Drama")
+        self.length_var.set("Medium")
+        for var in (self.auto_prompt_var, self.auto_genre_var, self.auto_length_var,
+                    self.auto_style_var, self.continuous_var):
+            var.set(False)
+        self.priority_var.set("5")
+        
+        self.dialog.deiconify()
+        self.dialog.grab_set()
         
         # Center on parent
         self.dialog.update_idletasks()
+        parent = self.parent
         x = parent.winfo_rootx() + (parent.winfo_width() // 2) - (self.dialog.winfo_width() // 2)
         y = parent.winfo_rooty() + (parent.winfo_height() // 2) - (self.dialog.winfo_height() // 2)
         self.dialog.geometry(f"+{x}+{y}")
+        self.prompt_text.focus_set()
+    
+    def hide(self):
+        """Hide the dialog, keeping its widgets for the next time it is shown"""
+        self.dialog.grab_release()
+        self.dialog.withdraw()
     
     def setup_dialog(self):
         """Setup the dialog UI"""
@@ -992,7 +1341,7 @@ class AddStoryDialog:
         button_frame.pack(fill='x')
         
         ttk.Button(button_frame, text="Cancel", 
-                  command=self.dialog.destroy).pack(side='right', padx=(10, 0))
+                  command=self.hide).pack(side='right', padx=(10, 0))
         ttk.Button(button_frame, text="Add to Queue", 
                   command=self.add_to_queue,
                   style='Accent.TButton').pack(side='right')
@@ -1026,7 +1375,7 @@ class AddStoryDialog:
             
             messagebox.showinfo("Success", f"Story added to queue (ID: {queue_id})")
             self.refresh_callback()
-            self.dialog.destroy()
+            self.hide()
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add story to queue: {e}")
\ No newline at end of file
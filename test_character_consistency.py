@@ -3,6 +3,7 @@ Test script for character consistency pipeline
 """
 
 import json
+from concurrent.futures import ThreadPoolExecutor
 from database import DatabaseManager
 from comfyui_manager import ComfyUIManager
 
@@ -85,8 +86,13 @@ def test_character_consistency_pipeline():
             "Close-up of coffee cups on the wooden table"
         ]
         
-        for i, shot_desc in enumerate(test_shot_descriptions, 1):
-            consistency_prompts = comfyui.get_shot_consistency_prompts(test_story_id, shot_desc)
+        # Shots are independent lookups, so fetch their prompts concurrently (each worker thread gets its own connection)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            shot_prompts = list(executor.map(
+                lambda shot_desc: comfyui.get_shot_consistency_prompts(test_story_id, shot_desc),
+                test_shot_descriptions))
+        
+        for i, (shot_desc, consistency_prompts) in enumerate(zip(test_shot_descriptions, shot_prompts), 1):
             print(f"   Shot {i}: '{shot_desc}'")
             print(f"   Character consistency: {consistency_prompts['character_consistency'][:50]}...")
             print(f"   Location consistency: {consistency_prompts['location_consistency'][:50]}...")
@@ -6,6 +6,9 @@ Tests all components with plain ASCII output
 import sys
 import os
 import traceback
+import io
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
 from datetime import date
 
 # Add current directory to path
@@ -25,63 +28,65 @@ def test_database_extensions():
         # Test database manager research methods
         db = DatabaseManager()
         
-        # Test create research session
-        session_id = db.create_research_session(['tiktok', 'instagram', 'youtube'])
-        print(f"  [OK] Created research session: {session_id}")
-        
-        # Test save trending content
-        sample_content = {
-            'platform': 'tiktok',
-            'content_url': 'https://test.com/video1',
-            'title': 'Test AI Comedy Video',
-            'description': 'Funny AI-generated comedy sketch',
-            'hashtags': ['#ai', '#comedy', '#funny'],
-            'view_count': 50000,
-            'like_count': 5000,
-            'comment_count': 500,
-            'share_count': 200,
-            'engagement_rate': 0.08,
-            'ai_keywords': ['ai', 'comedy', 'generated'],
-            'content_type': 'comedy',
-            'genre': 'Comedy',
-            'duration': 30,
-            'created_date': date.today()
-        }
-        
-        content_id = db.save_trending_content(session_id, sample_content)
-        print(f"  [OK] Saved trending content: {content_id}")
-        
-        # Test trend analysis
-        trend_data = {
-            'category': 'ai-comedy',
-            'trend_score': 0.85,
-            'growth_rate': 15.5,
-            'platforms': ['tiktok', 'youtube'],
-            'total_occurrences': 10,
-            'avg_engagement': 0.08
-        }
-        
-        db.save_trend_analysis('ai comedy', trend_data)
-        print("  [OK] Saved trend analysis")
-        
-        # Test research prompt
-        prompt_data = {
-            'keyword': 'ai comedy',
-            'genre': 'Comedy',
-            'expected_performance': 0.85
-        }
-        
-        prompt_id = db.save_research_prompt('An AI comedian tells jokes but gets everything wrong', prompt_data)
-        print(f"  [OK] Saved research prompt: {prompt_id}")
-        
-        # Update session
-        stats = {
-            'total_found': 1,
-            'ai_found': 1,
-            'keywords': ['ai comedy']
-        }
-        db.update_research_session(session_id, 'completed', stats)
-        print("  [OK] Updated research session")
+        # Write the sample data in one transaction so it is committed once
+        with db.transaction():
+            # Test create research session
+            session_id = db.create_research_session(['tiktok', 'instagram', 'youtube'])
+            print(f"  [OK] Created research session: {session_id}")
+            
+            # Test save trending content
+            sample_content = {
+                'platform': 'tiktok',
+                'content_url': 'https://test.com/video1',
+                'title': 'Test AI Comedy Video',
+                'description': 'Funny AI-generated comedy sketch',
+                'hashtags': ['#ai', '#comedy', '#funny'],
+                'view_count': 50000,
+                'like_count': 5000,
+                'comment_count': 500,
+                'share_count': 200,
+                'engagement_rate': 0.08,
+                'ai_keywords': ['ai', 'comedy', 'generated'],
+                'content_type': 'comedy',
+                'genre': 'Comedy',
+                'duration': 30,
+                'created_date': date.today()
+            }
+            
+            content_id = db.save_trending_content(session_id, sample_content)
+            print(f"  [OK] Saved trending content: {content_id}")
+            
+            # Test trend analysis
+            trend_data = {
+                'category': 'ai-comedy',
+                'trend_score': 0.85,
+                'growth_rate': 15.5,
+                'platforms': ['tiktok', 'youtube'],
+                'total_occurrences': 10,
+                'avg_engagement': 0.08
+            }
+            
+            db.save_trend_analysis('ai comedy', trend_data)
+            print("  [OK] Saved trend analysis")
+            
+            # Test research prompt
+            prompt_data = {
+                'keyword': 'ai comedy',
+                'genre': 'Comedy',
+                'expected_performance': 0.85
+            }
+            
+            prompt_id = db.save_research_prompt('An AI comedian tells jokes but gets everything wrong', prompt_data)
+            print(f"  [OK] Saved research prompt: {prompt_id}")
+            
+            # Update session
+            stats = {
+                'total_found': 1,
+                'ai_found': 1,
+                'keywords': ['ai comedy']
+            }
+            db.update_research_session(session_id, 'completed', stats)
+            print("  [OK] Updated research session")
         
         db.close()
         return True
@@ -152,6 +157,45 @@ def test_gui_integration():
         print(f"  [ERROR] GUI integration failed: {e}")
         return False
 
+def test_youtube_fallback_on_api_error():
+    """Test that YouTube search and stats failures fall back to sample data"""
+    print("Testing YouTube API error fallback...")
+    
+    import requests
+    from social_media_apis import YouTubeAPI
+    
+    class FailingSession:
+        """Answers searches with one video (unless search fails too) and fails every stats request"""
+        def __init__(self, fail_search):
+            self.fail_search = fail_search
+        
+        def get(self, url, params=None, timeout=None):
+            if self.fail_search or url.endswith('/videos'):
+                raise requests.ConnectionError("API unavailable")
+            response = requests.Response()
+            response.status_code = 200
+            response._content = b'{"items": [{"id": {"videoId": "abc"}, "snippet": {}}]}'
+            return response
+    
+    for fail_search, failing in ((True, "search"), (False, "stats")):
+        youtube = YouTubeAPI(api_key='test-key', session=FailingSession(fail_search))
+        results = youtube.search_videos_batch(['comedy', 'drama'], 5)
+        assert set(results) == {'comedy', 'drama'}, "Missing query results"
+        assert all(results.values()), f"No fallback data after a {failing} error"
+        print(f"  [OK] Fallback data returned after a {failing} error")
+    
+    return True
+
+def _run_captured(test_func):
+    """Run one test stage in a worker process, returning its result and printed output"""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        try:
+            success = test_func()
+        except Exception as e:
+            return None, output.getvalue() + f"  Result: CRASH - {e}\n"
+    return success, output.getvalue()
+
 def run_tests():
     """Run all tests"""
     print("Research System Integration Test")
@@ -161,25 +205,34 @@ def run_tests():
         ("Database Extensions", test_database_extensions),
         ("API Modules", test_api_modules), 
         ("Story Integration", test_story_integration),
-        ("GUI Integration", test_gui_integration)
+        ("GUI Integration", test_gui_integration),
+        ("YouTube Fallback", test_youtube_fallback_on_api_error)
     ]
     
     passed = 0
     total = len(tests)
     
-    for test_name, test_func in tests:
+    # The stages are independent, so run each in its own process and report them in order once done
+    results = {}
+    with ProcessPoolExecutor(max_workers=total) as executor:
+        futures = {executor.submit(_run_captured, test_func): test_name for test_name, test_func in tests}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = (None, f"  Result: CRASH - {e}\n")
+    
+    for test_name, _ in tests:
         print(f"\n{test_name}")
         print("-" * 30)
         
-        try:
-            success = test_func()
-            if success:
-                passed += 1
-                print(f"  Result: PASS")
-            else:
-                print(f"  Result: FAIL")
-        except Exception as e:
-            print(f"  Result: CRASH - {e}")
+        success, output = results[test_name]
+        print(output, end="")
+        if success:
+            passed += 1
+            print(f"  Result: PASS")
+        elif success is not None:
+            print(f"  Result: FAIL")
     
     print("\n" + "=" * 50)
     print("SUMMARY")